@@ -0,0 +1,269 @@
+"""
+Backtest walk-forward de los portafolios optimizados.
+
+En cada fecha de rebalanceo se estiman los momentos con la ventana de
+historia anterior (momentos_moviles), se llama al optimizador elegido
+arrancando desde los pesos previos y, entre rebalanceos, los pesos derivan
+con los precios. El resultado incluye la historia de pesos y la serie de
+rendimientos diarios fuera de muestra, lista para compute_portfolio_metrics.
+
+Uso:
+    import backtest as bt
+    res = bt.backtest_walk_forward(df, metodo="max_sharpe", ventana=252,
+                                   frecuencia="M", params={"rf": 0.0})
+    bt.metricas_backtest(res)
+"""
+
+import inspect
+
+import numpy as np
+import pandas as pd
+
+import sf_library as sfl
+from instrumentation import contar, timed, timer
+
+FRECUENCIAS = ("W", "M", "Q", "Y")
+
+
+# ============================================
+# CALENDARIO DE REBALANCEO
+# ============================================
+
+def fechas_rebalanceo(fechas, frecuencia="M", ventana=252):
+    """
+    Índices (filas) de las fechas de rebalanceo.
+
+    Se rebalancea al cierre del último día hábil de cada periodo, usando solo
+    información hasta ese día; los pesos nuevos aplican desde el día siguiente.
+    No se rebalancea antes de tener `ventana` filas de historia.
+
+    Parámetros
+    ----------
+    fechas : pd.DatetimeIndex
+        Fechas del panel de rendimientos (longitud T).
+    frecuencia : {'W', 'M', 'Q', 'Y'}, int o lista de fechas
+        Periodo calendario, cada cuántas filas, o fechas explícitas (se toma
+        el último día del panel en o antes de cada una).
+    ventana : int
+        Filas de historia requeridas para estimar los momentos.
+
+    Retorna
+    -------
+    np.ndarray de int
+    """
+    fechas = pd.DatetimeIndex(fechas)
+    T = len(fechas)
+
+    if isinstance(frecuencia, str):
+        if frecuencia not in FRECUENCIAS:
+            raise ValueError("frecuencia debe ser 'W', 'M', 'Q', 'Y', un entero o fechas.")
+        periodos = fechas.to_period(frecuencia).asi8
+        # Última fila de cada periodo
+        filas = np.flatnonzero(np.r_[periodos[1:] != periodos[:-1], True])
+    elif np.isscalar(frecuencia):
+        paso = int(frecuencia)
+        if paso < 1:
+            raise ValueError("frecuencia entera debe ser >= 1.")
+        filas = np.arange(ventana - 1, T, paso)
+    else:
+        objetivo = pd.DatetimeIndex(frecuencia)
+        filas = fechas.searchsorted(objetivo, side="right") - 1
+        filas = np.unique(filas[filas >= 0])
+
+    # La última fila no tiene días fuera de muestra
+    return filas[(filas >= ventana - 1) & (filas < T - 1)]
+
+
+# ============================================
+# DERIVA ENTRE REBALANCEOS
+# ============================================
+
+def rendimientos_con_deriva(R, filas, pesos, costo=0.0):
+    """
+    Rendimientos diarios de un portafolio que se rebalancea en `filas` y cuyos
+    pesos derivan con los precios entre rebalanceos.
+
+    Con L = cumsum(log(1 + R)), el crecimiento de cada activo desde el
+    rebalanceo k hasta el día t es G = exp(L_t - L_k), así que el valor del
+    portafolio es V_t = G_t · w_k y el rendimiento diario V_t / V_{t-1} - 1.
+    Todo se calcula sin ciclos sobre los periodos.
+
+    Parámetros
+    ----------
+    R : np.ndarray
+        Rendimientos diarios (T × n).
+    filas : np.ndarray de int
+        Filas de rebalanceo (crecientes); los pesos de `filas[k]` aplican
+        desde filas[k] + 1.
+    pesos : np.ndarray
+        Pesos objetivo de cada rebalanceo (K × n).
+    costo : float
+        Costo proporcional por unidad de rotación, cobrado el día siguiente
+        a cada rebalanceo.
+
+    Retorna
+    -------
+    r : np.ndarray
+        Rendimientos del portafolio para las filas filas[0] + 1 .. T - 1.
+    rotacion : np.ndarray
+        Rotación sum|w_k - w_deriva| de cada rebalanceo (K,). La primera se
+        mide desde efectivo.
+    """
+    R = np.asarray(R, dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+    T = R.shape[0]
+
+    L = np.zeros((T + 1, R.shape[1]))
+    with np.errstate(divide="ignore"):
+        np.cumsum(np.log1p(R), axis=0, out=L[1:])
+    # L[t + 1] es el log-crecimiento acumulado al cierre de la fila t
+
+    dias = np.arange(filas[0] + 1, T)
+    k = np.searchsorted(filas, dias, side="left") - 1
+    base = L[filas + 1][k]
+    Wd = pesos[k]
+
+    V = (np.exp(L[dias + 1] - base) * Wd).sum(axis=1)
+    V_prev = (np.exp(L[dias] - base) * Wd).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = V / V_prev - 1.0
+
+    # Pesos derivados justo antes de cada rebalanceo (desde el segundo)
+    rotacion = np.empty(len(filas))
+    rotacion[0] = np.abs(pesos[0]).sum()
+    if len(filas) > 1:
+        G = np.exp(L[filas[1:] + 1] - L[filas[:-1] + 1]) * pesos[:-1]
+        deriva = G / G.sum(axis=1, keepdims=True)
+        rotacion[1:] = np.abs(pesos[1:] - deriva).sum(axis=1)
+
+    if costo:
+        r[filas - filas[0]] -= costo * rotacion
+
+    return r, rotacion
+
+
+# ============================================
+# BACKTEST WALK-FORWARD
+# ============================================
+
+def _como_panel(returns_df):
+    """Fechas, matriz de rendimientos y tickers desde un DataFrame."""
+    if "date" in returns_df.columns:
+        fechas = pd.DatetimeIndex(returns_df["date"])
+        datos = returns_df.drop(columns="date")
+    else:
+        fechas = pd.DatetimeIndex(returns_df.index)
+        datos = returns_df
+    R = datos.to_numpy(dtype=float)
+    if np.isnan(R).any():
+        raise ValueError("El panel de rendimientos no debe tener NaN.")
+    return fechas, np.ascontiguousarray(R), list(datos.columns)
+
+
+@timed("backtest_walk_forward")
+def backtest_walk_forward(returns_df, metodo="min_variance", ventana=252, frecuencia="M",
+                          params=None, anualizar=252, costo=0.0, activos=None,
+                          max_bytes=64 * 1024 ** 2):
+    """
+    Backtest walk-forward de un optimizador.
+
+    Parámetros
+    ----------
+    returns_df : pd.DataFrame
+        Rendimientos diarios sin NaN: columna 'date' y una columna por ticker
+        (como sync_timeseries) o índice de fechas.
+    metodo : str o callable
+        'min_variance', 'max_sharpe', 'markowitz_target' o 'BL_target', o una
+        función f(mu, Sigma, **params) -> (w, res).
+    ventana : int
+        Días de historia para estimar mu y Σ en cada rebalanceo.
+    frecuencia : {'W', 'M', 'Q', 'Y'}, int o lista de fechas
+        Calendario de rebalanceo (ver fechas_rebalanceo).
+    params : dict, opcional
+        Argumentos extra del optimizador (rf, r_target, short, engine, ...).
+    anualizar : int
+        Factor con que se anualizan mu y Σ antes de optimizar (igual que en
+        la app); los parámetros como rf y r_target van en esas unidades.
+    costo : float
+        Costo proporcional por unidad de rotación.
+    activos : list[str], opcional
+        Subconjunto de columnas a invertir; las demás (p. ej. el mercado)
+        solo se conservan para las métricas.
+    max_bytes : int
+        Memoria por bloque para momentos_moviles.
+
+    Retorna
+    -------
+    dict con:
+        "pesos" : pd.DataFrame (fechas de rebalanceo × activos)
+        "rendimientos" : pd.Series de rendimientos diarios fuera de muestra
+        "returns_df" : pd.DataFrame con columna 'Portafolio' y las columnas
+                       originales en el periodo fuera de muestra
+        "rotacion", "exito" : pd.Series por fecha de rebalanceo
+    """
+    import optimization as opt
+
+    params = dict(params or {})
+    fechas, R_todo, columnas = _como_panel(returns_df)
+    activos = list(activos) if activos is not None else columnas
+    R = R_todo[:, [columnas.index(a) for a in activos]]
+    n = len(activos)
+
+    func = metodo if callable(metodo) else opt.optimizador(metodo)
+    arranque = "w0" in inspect.signature(func).parameters
+
+    filas = fechas_rebalanceo(fechas, frecuencia, ventana)
+    if filas.size == 0:
+        raise ValueError("No hay historia suficiente para ninguna fecha de rebalanceo.")
+
+    pesos = np.empty((filas.size, n))
+    exito = np.zeros(filas.size, dtype=bool)
+    w_prev = None
+    k = 0
+    with timer("backtest_optimizaciones"):
+        for _, salida in sfl.momentos_moviles(R, ventana, fines=filas, max_bytes=max_bytes):
+            mus, Sigmas = salida[ventana]
+            for mu, Sigma in zip(mus, Sigmas):
+                extra = {"w0": w_prev} if arranque and w_prev is not None else {}
+                try:
+                    w, res = func(mu * anualizar, Sigma * anualizar, **params, **extra)
+                    ok = bool(res.success) and np.all(np.isfinite(w))
+                except (ValueError, np.linalg.LinAlgError):
+                    ok = False
+                if ok:
+                    w = np.asarray(w, dtype=float)
+                else:
+                    # Se conservan los pesos anteriores (o iguales al inicio)
+                    contar("backtest_walk_forward", "fallos_optimizador")
+                    w = w_prev if w_prev is not None else np.ones(n) / n
+                pesos[k], exito[k] = w, ok
+                w_prev = w
+                k += 1
+
+    r, rotacion = rendimientos_con_deriva(R, filas, pesos, costo=costo)
+
+    fechas_reb = fechas[filas]
+    fechas_oos = fechas[filas[0] + 1:]
+    rendimientos = pd.Series(r, index=fechas_oos, name="Portafolio")
+    panel = pd.DataFrame(R_todo[filas[0] + 1:], index=fechas_oos, columns=columnas)
+    panel.insert(0, "Portafolio", r)
+
+    return {
+        "pesos": pd.DataFrame(pesos, index=fechas_reb, columns=activos),
+        "rendimientos": rendimientos,
+        "returns_df": panel,
+        "rotacion": pd.Series(rotacion, index=fechas_reb, name="rotacion"),
+        "exito": pd.Series(exito, index=fechas_reb, name="exito"),
+    }
+
+
+def metricas_backtest(resultado, rf=0.0, market_col="SPLG"):
+    """
+    Métricas de compute_portfolio_metrics sobre los rendimientos realizados
+    del backtest (el mercado, si está en el panel, se usa para la beta).
+    """
+    panel = resultado["returns_df"]
+    columnas = ["Portafolio"] + ([market_col] if market_col in panel.columns else [])
+    pesos = np.zeros(len(columnas))
+    pesos[0] = 1.0
+    return sfl.compute_portfolio_metrics(panel[columnas], pesos, rf=rf, market_col=market_col)
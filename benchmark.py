@@ -0,0 +1,396 @@
+"""
+Benchmark reproducible del pipeline con datos sintéticos.
+
+Genera historias de precios sintéticas (número de activos, años, estructura
+de correlación y días faltantes configurables) con el mismo formato que lee
+daily_return, y mide cada etapa: lectura, sync_timeseries, momentos, cada
+optimize_* y compute_portfolio_metrics. Los resultados se escriben en un
+JSON que se puede comparar contra otra corrida.
+
+También mide el tiempo de importación de los módulos en un intérprete
+nuevo (lo que paga cada arranque en frío de la app).
+
+Uso:
+    python benchmark.py --activos 5 50 500 --anios 1 10 30 --salida bench.json
+    python benchmark.py --comparar base.json bench.json
+    python benchmark.py --importacion
+    python benchmark.py --verificar
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import sf_library as sfl
+
+FECHA_FINAL = "2024-12-31"
+
+
+# ============================================
+# GENERADOR DE MERCADO SINTÉTICO
+# ============================================
+
+def generar_mercado_sintetico(n_activos=5, anios=10, carpeta="MarketData",
+                              correlacion=0.3, prob_faltante=0.0, formato="panel",
+                              seed=0, fecha_final=FECHA_FINAL):
+    """
+    Escribe precios sintéticos en `carpeta` con el formato que lee daily_return.
+
+    Parámetros
+    ----------
+    n_activos : int
+        Número de tickers (se llaman S0000, S0001, ...).
+    anios : float
+        Años de historia en días hábiles.
+    carpeta : str
+        Carpeta de datos destino.
+    correlacion : float o np.ndarray
+        Correlación común entre activos (modelo de un factor) o una matriz de
+        correlación completa (n × n).
+    prob_faltante : float
+        Probabilidad de que falte el precio de un ticker en un día dado.
+    formato : {'panel', 'csv'}
+        Panel columnar (guardar_panel) o un CSV Date/Close por ticker.
+    seed : int
+        Semilla para reproducibilidad.
+
+    Retorna
+    -------
+    list[str]
+        Tickers generados.
+    """
+    rng = np.random.default_rng(seed)
+    fechas = pd.bdate_range(end=fecha_final, periods=max(2, int(round(anios * 252))))
+    T = len(fechas)
+    tickers = [f"S{i:04d}" for i in range(n_activos)]
+
+    vol = rng.uniform(0.008, 0.025, n_activos)
+    drift = rng.normal(0.0003, 0.0002, n_activos)
+
+    if np.isscalar(correlacion):
+        rho = float(correlacion)
+        z = np.sqrt(rho) * rng.standard_normal((T, 1)) \
+            + np.sqrt(1.0 - rho) * rng.standard_normal((T, n_activos))
+    else:
+        L = np.linalg.cholesky(np.asarray(correlacion, dtype=float))
+        z = rng.standard_normal((T, n_activos)) @ L.T
+
+    precios = 100.0 * np.cumprod(1.0 + drift + vol * z, axis=0)
+
+    if prob_faltante > 0:
+        faltan = rng.random((T, n_activos)) < prob_faltante
+        faltan[0] = False
+        precios[faltan] = np.nan
+
+    panel = pd.DataFrame(precios, index=pd.DatetimeIndex(fechas, name="Date"), columns=tickers)
+
+    os.makedirs(carpeta, exist_ok=True)
+    if formato == "panel":
+        sfl.guardar_panel(panel, carpeta=carpeta)
+    elif formato == "csv":
+        for tic in tickers:
+            s = panel[tic].dropna()
+            pd.DataFrame({"Date": s.index, "Close": s.values}).to_csv(
+                os.path.join(carpeta, f"{tic}.csv"), index=False
+            )
+    else:
+        raise ValueError("formato debe ser 'panel' o 'csv'.")
+
+    return tickers
+
+
+# ============================================
+# MEDICIÓN
+# ============================================
+
+def _medir(func, repeticiones, calentar=True):
+    """
+    Mejor tiempo (s) de `repeticiones` llamadas y el último resultado.
+
+    Con `calentar` se hace antes una llamada sin medir, para que las
+    importaciones perezosas (p. ej. scipy.optimize en el primer optimizador)
+    y otros costos de primera vez no se cuenten como tiempo de la etapa;
+    esos costos se miden aparte con medir_importacion.
+    """
+    mejor, salida = float("inf"), None
+    if calentar:
+        salida = func()
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        salida = func()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, salida
+
+
+def medir_pipeline(n_activos, anios, formato="panel", repeticiones=3,
+                   correlacion=0.3, prob_faltante=0.0, seed=0, optimizadores=True):
+    """
+    Mide cada etapa del pipeline para un tamaño de problema.
+
+    Retorna
+    -------
+    list[dict]
+        Un registro {n_activos, anios, formato, etapa, segundos} por etapa.
+    """
+    import optimization as opt
+
+    carpeta = tempfile.mkdtemp(prefix="sf_bench_")
+    try:
+        tickers = generar_mercado_sintetico(
+            n_activos, anios, carpeta=carpeta, correlacion=correlacion,
+            prob_faltante=prob_faltante, formato=formato, seed=seed,
+        )
+
+        etapas = {}
+        etapas["daily_return"], _ = _medir(
+            lambda: [sfl.daily_return(t, data_dir=carpeta) for t in tickers], repeticiones
+        )
+        etapas["construir_panel_alineado"], _ = _medir(
+            lambda: sfl.construir_panel_alineado(tickers, data_dir=carpeta), repeticiones
+        )
+        etapas["sync_timeseries"], _ = _medir(
+            lambda: sfl.sync_timeseries(tickers, data_dir=carpeta), repeticiones
+        )
+        etapas["obtener_momentos_desde_csv"], (df, mu, Sigma, _) = _medir(
+            lambda: sfl.obtener_momentos_desde_csv(tickers, data_dir=carpeta, usar_cache=False),
+            repeticiones,
+        )
+
+        mu_vals = mu.values * 252
+        Sigma_vals = Sigma.values * 252
+        returns = df.drop(columns="date")
+
+        if optimizadores:
+            r_target = float(np.mean(mu_vals))
+            P = np.zeros((1, n_activos))
+            P[0, 0] = 1.0
+            Q = np.array([0.05])
+            Omega = np.array([[0.25]])
+
+            casos = {
+                "optimize_min_variance": lambda: opt.optimize_min_variance(mu_vals, Sigma_vals),
+                "optimize_max_sharpe": lambda: opt.optimize_max_sharpe(mu_vals, Sigma_vals),
+                "optimize_markowitz_target": lambda: opt.optimize_markowitz_target(
+                    mu_vals, Sigma_vals, r_target),
+                "optimize_BL_target": lambda: opt.optimize_BL_target(
+                    mu_vals, Sigma_vals, r_target, P, Q, Omega),
+            }
+            for nombre, func in casos.items():
+                etapas[nombre], _ = _medir(func, repeticiones)
+
+        w = np.ones(n_activos) / n_activos
+        etapas["compute_portfolio_metrics"], _ = _medir(
+            lambda: sfl.compute_portfolio_metrics(returns, w), repeticiones
+        )
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    return [
+        {"n_activos": n_activos, "anios": anios, "formato": formato,
+         "etapa": etapa, "segundos": seg}
+        for etapa, seg in etapas.items()
+    ]
+
+
+MODULOS_IMPORTACION = ("sf_library", "optimization", "backtest", "montecarlo")
+MODULOS_PESADOS = ("scipy.optimize", "matplotlib", "seaborn", "yfinance")
+
+_SCRIPT_IMPORTACION = """
+import json, sys, time
+t0 = time.perf_counter()
+import {modulo}
+t = time.perf_counter() - t0
+print(json.dumps({{"segundos": t, "cargados": [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+
+def medir_importacion(modulos=MODULOS_IMPORTACION, repeticiones=3):
+    """
+    Tiempo de `import modulo` en un intérprete nuevo (mejor de `repeticiones`)
+    y qué dependencias pesadas quedaron cargadas al importar.
+
+    Retorna
+    -------
+    list[dict]
+        Un registro {modulo, etapa, segundos, pesados_cargados} por módulo.
+    """
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    registros = []
+    for modulo in modulos:
+        codigo = _SCRIPT_IMPORTACION.format(modulo=modulo, pesados=MODULOS_PESADOS)
+        mejor, cargados = float("inf"), []
+        for _ in range(repeticiones):
+            salida = subprocess.run(
+                [sys.executable, "-c", codigo], capture_output=True, text=True,
+                cwd=raiz, check=True,
+            )
+            medicion = json.loads(salida.stdout.strip().splitlines()[-1])
+            if medicion["segundos"] < mejor:
+                mejor, cargados = medicion["segundos"], medicion["cargados"]
+        registros.append({"modulo": modulo, "etapa": f"import {modulo}",
+                          "segundos": mejor, "pesados_cargados": cargados})
+    return registros
+
+
+# ============================================
+# VERIFICACIÓN CONTRA PANDAS
+# ============================================
+
+def verificar_momentos(tamanos=(1, 2, 5), anios=1, seed=0, tol=1e-12):
+    """
+    Compara sync_timeseries y obtener_momentos_desde_csv contra el cálculo
+    directo con pandas (cov/corr/mean) en universos sintéticos, incluido el
+    caso de un solo ticker.
+
+    Lanza AssertionError si alguna matriz difiere más de `tol`; regresa la
+    lista de tamaños verificados.
+    """
+    verificados = []
+    for n in tamanos:
+        carpeta = tempfile.mkdtemp(prefix="sf_verif_")
+        try:
+            tickers = generar_mercado_sintetico(n, anios, carpeta=carpeta, seed=seed)
+            df, cov, corr = sfl.sync_timeseries(tickers, data_dir=carpeta)
+            _, mu, Sigma, corr_df = sfl.obtener_momentos_desde_csv(
+                tickers, data_dir=carpeta, usar_cache=False)
+
+            ref = df.drop(columns="date")
+            for nombre, calculado, esperado in (
+                ("cov", cov, ref.cov().values),
+                ("corr", corr, ref.corr().values),
+                ("Sigma", Sigma.values, ref.cov().values),
+                ("corr_df", corr_df.values, ref.corr().values),
+                ("mu", mu.values, ref.mean().values),
+            ):
+                assert calculado.shape == esperado.shape, (n, nombre, calculado.shape)
+                assert np.allclose(calculado, esperado, rtol=0, atol=tol), (n, nombre)
+        finally:
+            shutil.rmtree(carpeta, ignore_errors=True)
+        verificados.append(n)
+    return verificados
+
+
+def _metadatos():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "plataforma": platform.platform(),
+    }
+
+
+def correr_benchmark(activos=(5, 50, 500), anios=(1, 10, 30), formato="panel",
+                     repeticiones=3, salida=None, optimizadores=True, **kwargs):
+    """
+    Corre medir_pipeline sobre la malla activos × años.
+
+    Retorna el reporte (dict con "metadatos" y "resultados") y, si se da
+    `salida`, lo escribe como JSON.
+    """
+    resultados = []
+    for n in activos:
+        for a in anios:
+            print(f"Midiendo {n} activos × {a} años...")
+            resultados.extend(medir_pipeline(
+                n, a, formato=formato, repeticiones=repeticiones,
+                optimizadores=optimizadores, **kwargs,
+            ))
+
+    reporte = {"metadatos": _metadatos(), "resultados": resultados}
+    if salida is not None:
+        with open(salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+    return reporte
+
+
+def comparar(ruta_base, ruta_nueva):
+    """
+    Compara dos reportes de benchmark.
+
+    Retorna un DataFrame con los segundos de cada corrida y la aceleración
+    (base / nueva) por (n_activos, anios, formato, etapa).
+    """
+    llaves = ["n_activos", "anios", "formato", "etapa"]
+    with open(ruta_base, encoding="utf-8") as f:
+        base = pd.DataFrame(json.load(f)["resultados"])
+    with open(ruta_nueva, encoding="utf-8") as f:
+        nueva = pd.DataFrame(json.load(f)["resultados"])
+
+    tabla = base.merge(nueva, on=llaves, suffixes=("_base", "_nueva"))
+    tabla["aceleracion"] = tabla["segundos_base"] / tabla["segundos_nueva"]
+    return tabla.sort_values(llaves).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline con datos sintéticos.")
+    parser.add_argument("--activos", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--anios", type=float, nargs="+", default=[1, 10, 30])
+    parser.add_argument("--formato", choices=["panel", "csv"], default="panel")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--correlacion", type=float, default=0.3)
+    parser.add_argument("--faltantes", type=float, default=0.0,
+                        help="Probabilidad de día faltante por ticker.")
+    parser.add_argument("--sin-optimizadores", action="store_true")
+    parser.add_argument("--salida", default=None,
+                        help="Archivo del reporte (por defecto bench_output.json, o "
+                             "bench_importacion.json con --importacion).")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVA"))
+    parser.add_argument("--importacion", action="store_true",
+                        help="Solo mide el tiempo de importación de los módulos.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Compara los momentos contra pandas (incluye un solo ticker).")
+    args = parser.parse_args(argv)
+
+    if args.verificar:
+        print(f"Momentos verificados para {verificar_momentos()} tickers.")
+        return
+
+    if args.comparar:
+        print(comparar(*args.comparar).to_string(index=False))
+        return
+
+    if args.salida is None:
+        args.salida = "bench_importacion.json" if args.importacion else "bench_output.json"
+
+    if args.importacion:
+        registros = medir_importacion(repeticiones=args.repeticiones)
+        print(pd.DataFrame(registros).to_string(index=False))
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"metadatos": _metadatos(), "importacion": registros}, f,
+                      indent=2, ensure_ascii=False)
+        print(f"\nReporte escrito en {args.salida}")
+        return
+
+    reporte = correr_benchmark(
+        activos=args.activos, anios=args.anios, formato=args.formato,
+        repeticiones=args.repeticiones, salida=args.salida,
+        optimizadores=not args.sin_optimizadores,
+        correlacion=args.correlacion, prob_faltante=args.faltantes,
+    )
+    tabla = pd.DataFrame(reporte["resultados"])
+    print(tabla.pivot_table(index=["n_activos", "anios"], columns="etapa",
+                            values="segundos").to_string())
+    print(f"\nReporte escrito en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# PROVEEDORES DE DATOS
+# ============================================
+
+class DataProvider:
+    """
+    Interfaz de un proveedor de precios.
+
+    Un proveedor recibe un lote de tickers y regresa los cierres de los que
+    sí tuvo datos:
+
+        download(tickers, start, end) -> dict[str, pd.Series]
+
+    Cada Serie tiene índice de fechas (sin zona horaria). Los tickers sin
+    datos simplemente no aparecen en el diccionario; un error de red o del
+    servicio se reporta lanzando una excepción. Si el error solo afecta a
+    algunos tickers del lote, se lanza DescargaParcial con lo que sí llegó.
+    """
+
+    def download(self, tickers, start, end):
+        raise NotImplementedError
+
+
+class DescargaParcial(Exception):
+    """
+    Algunos tickers del lote fallaron: `series` trae los que sí llegaron y
+    `errores` el mensaje de cada ticker que falló.
+    """
+
+    def __init__(self, series, errores):
+        super().__init__(f"fallaron {sorted(errores)}")
+        self.series = series
+        self.errores = errores
+
+
+class YFinanceProvider(DataProvider):
+    """
+    Proveedor basado en yfinance; pide todo el lote en una sola llamada.
+
+    yf.download no lanza excepciones por los tickers que fallan dentro de un
+    lote: los regresa como columnas vacías o con NaN. Esos tickers se
+    reportan con DescargaParcial para que pasen por los reintentos.
+    """
+
+    def download(self, tickers, start, end):
+        import yfinance as yf
+
+        data = yf.download(
+            list(tickers), start=start, end=end,
+            progress=False, threads=False, group_by="column",
+        )
+        if data is None or data.empty:
+            raise DescargaParcial({}, {tic: "yfinance no regresó datos" for tic in tickers})
+
+        close = data["Close"]
+        if isinstance(close, pd.Series):
+            close = close.to_frame(tickers[0])
+
+        series, errores = {}, {}
+        for tic in tickers:
+            if tic not in close.columns:
+                errores[tic] = "yfinance no regresó la columna del ticker"
+                continue
+            s = close[tic].dropna().astype(float)
+            if s.empty:
+                errores[tic] = "yfinance regresó solo NaN"
+                continue
+            s.index = pd.DatetimeIndex(s.index).tz_localize(None)
+            s.index.name = "Date"
+            series[tic] = s
+        if errores:
+            raise DescargaParcial(series, errores)
+        return series
+
+
+class CallableProvider(DataProvider):
+    """
+    Adapta una función fuente(ticker, start, end) -> DataFrame con columna
+    'Close' (formato de yf.download) a la interfaz de proveedor.
+    """
+
+    def __init__(self, fuente):
+        self.fuente = fuente
+
+    def download(self, tickers, start, end):
+        series, errores = {}, {}
+        for tic in tickers:
+            try:
+                data = self.fuente(tic, start, end)
+            except Exception as e:
+                errores[tic] = f"{type(e).__name__}: {e}"
+                continue
+            if data is None or data.empty:
+                continue
+            close = data["Close"]
+            if isinstance(close, pd.DataFrame):
+                close = close.iloc[:, 0]
+            close = close.dropna().astype(float)
+            close.index = pd.DatetimeIndex(close.index).tz_localize(None)
+            close.index.name = "Date"
+            series[tic] = close
+        if errores:
+            raise DescargaParcial(series, errores)
+        return series
+
+
+class LocalProvider(DataProvider):
+    """
+    Proveedor sintético y local, pensado para pruebas y benchmarks sin red.
+
+    Genera caminatas aleatorias geométricas en días hábiles. El precio de un
+    ticker en una fecha dada es determinista (depende solo de `seed`, del
+    ticker y de la fecha), así que descargas parciales o incrementales son
+    consistentes entre sí.
+
+    Parámetros
+    ----------
+    seed : int
+        Semilla base.
+    latencia : float
+        Segundos de espera simulados por llamada (por lote).
+    prob_fallo : float
+        Probabilidad de que una llamada falle con ConnectionError.
+    fallos : dict[str, int], opcional
+        Número de llamadas iniciales que fallan cuando el lote contiene
+        ese ticker (para probar reintentos).
+    sin_datos : iterable[str], opcional
+        Tickers para los que nunca hay datos.
+    inicio_historia : str
+        Fecha desde la que existe historia sintética.
+    dividendos : dict[str, list[tuple[str, float]]], opcional
+        Fechas ex-dividendo y tasa por ticker. Como el Close ajustado de
+        yfinance, toda la historia anterior a cada fecha ex-dividendo menor
+        que `end` se multiplica por (1 - tasa).
+    """
+
+    def __init__(self, seed=0, latencia=0.0, prob_fallo=0.0, fallos=None,
+                 sin_datos=(), inicio_historia="2000-01-01", dividendos=None):
+        self.seed = seed
+        self.latencia = latencia
+        self.prob_fallo = prob_fallo
+        self.fallos = dict(fallos or {})
+        self.sin_datos = set(sin_datos)
+        self.inicio_historia = pd.Timestamp(inicio_historia)
+        self.dividendos = {tic: [(pd.Timestamp(f), float(t)) for f, t in divs]
+                           for tic, divs in (dividendos or {}).items()}
+        self.llamadas = 0
+        self._rng = np.random.default_rng(seed)
+        # download se llama desde varios hilos del pool
+        self._lock = threading.Lock()
+
+    def _serie(self, ticker, start, end):
+        fechas = pd.bdate_range(self.inicio_historia, pd.Timestamp(end) - pd.Timedelta(days=1))
+        semilla = (self.seed, zlib.crc32(ticker.encode()))
+        rng = np.random.default_rng(semilla)
+        r = rng.normal(0.0003, 0.012, len(fechas))
+        precios = 100.0 * np.cumprod(1.0 + r)
+        for fecha, tasa in self.dividendos.get(ticker, ()):
+            if fecha < pd.Timestamp(end):
+                precios[fechas < fecha] *= 1.0 - tasa
+        s = pd.Series(precios, index=pd.DatetimeIndex(fechas, name="Date"))
+        return s[s.index >= pd.Timestamp(start)]
+
+    def download(self, tickers, start, end):
+        with self._lock:
+            self.llamadas += 1
+            fallido = next((tic for tic in tickers if self.fallos.get(tic, 0) > 0), None)
+            if fallido is not None:
+                self.fallos[fallido] -= 1
+            aleatorio = bool(self.prob_fallo) and self._rng.random() < self.prob_fallo
+
+        if self.latencia:
+            time.sleep(self.latencia)
+        if fallido is not None:
+            raise ConnectionError(f"fallo simulado para {fallido}")
+        if aleatorio:
+            raise ConnectionError("fallo aleatorio simulado")
+
+        series = {}
+        for tic in tickers:
+            if tic in self.sin_datos:
+                continue
+            s = self._serie(tic, start, end)
+            if not s.empty:
+                series[tic] = s
+        return series
+
+
+def como_proveedor(fuente):
+    """Regresa `fuente` como DataProvider (por defecto yfinance)."""
+    if fuente is None:
+        return YFinanceProvider()
+    if isinstance(fuente, DataProvider):
+        return fuente
+    if callable(fuente):
+        return CallableProvider(fuente)
+    raise TypeError("fuente debe ser un DataProvider o una función (ticker, start, end).")
+
+
+# ============================================
+# DESCARGA CONCURRENTE POR LOTES
+# ============================================
+
+def _descargar_lote(proveedor, tickers, start, end, reintentos, backoff):
+    """
+    Descarga un lote con reintentos y backoff exponencial.
+
+    - Si el proveedor lanza DescargaParcial, se guardan las series que sí
+      llegaron y solo se reintentan los tickers que fallaron.
+    - Si falla el lote completo y tiene varios tickers, no se sabe cuál
+      causó el error: se parte en tickers individuales y cada uno se
+      descarga (con sus propios reintentos) por separado.
+    - Los tickers que simplemente no traen datos no se reintentan.
+
+    Regresa (series, errores) con el mensaje propio de cada ticker.
+    """
+    pendientes = list(tickers)
+    series, errores = {}, {}
+
+    for intento in range(reintentos + 1):
+        if intento > 0:
+            espera = backoff * 2 ** (intento - 1)
+            logger.info("Reintento %d de %s en %.2fs", intento, pendientes, espera)
+            time.sleep(espera)
+        try:
+            recibidas, fallidos = proveedor.download(pendientes, start, end), {}
+        except DescargaParcial as e:
+            recibidas, fallidos = e.series, e.errores
+        except Exception as e:
+            mensaje = f"{type(e).__name__}: {e}"
+            logger.warning("Error descargando lote %s: %s", pendientes, mensaje)
+            if len(pendientes) > 1:
+                for tic in pendientes:
+                    s, err = _descargar_lote(proveedor, [tic], start, end, reintentos, backoff)
+                    series.update(s)
+                    errores.update(err)
+                return series, errores
+            recibidas, fallidos = {}, {pendientes[0]: mensaje}
+
+        series.update(recibidas)
+        for tic in pendientes:
+            if tic in recibidas:
+                errores.pop(tic, None)
+            elif tic in fallidos:
+                errores[tic] = fallidos[tic]
+            else:
+                errores[tic] = "sin datos"
+
+        pendientes = [t for t in pendientes if t in fallidos]
+        if not pendientes:
+            break
+
+    return series, errores
+
+
+def descargar_concurrente(tickers, proveedor=None, start="2000-01-01", end=None,
+                          starts=None, tam_lote=8, max_workers=4,
+                          reintentos=2, backoff=0.5):
+    """
+    Descarga cierres de muchos tickers en lotes, en paralelo.
+
+    Parámetros
+    ----------
+    tickers : list[str]
+        Símbolos a descargar.
+    proveedor : DataProvider o función, opcional
+        Fuente de datos (ver `como_proveedor`). Por defecto yfinance.
+    start, end : str
+        Rango de fechas por defecto (end exclusivo, como en yfinance).
+    starts : dict[str, str], opcional
+        Fecha de inicio por ticker (p. ej. descarga incremental). Los tickers
+        con la misma fecha de inicio se agrupan en los mismos lotes.
+    tam_lote : int
+        Máximo de tickers por llamada al proveedor.
+    max_workers : int
+        Tamaño del pool de hilos (llamadas simultáneas al proveedor).
+    reintentos : int
+        Reintentos por lote tras un fallo o tickers faltantes.
+    backoff : float
+        Espera base en segundos; se duplica en cada reintento.
+
+    Retorna
+    -------
+    series : dict[str, pd.Series]
+        Cierres descargados por ticker.
+    errores : dict[str, str]
+        Mensaje de error por cada ticker que no se pudo descargar.
+    """
+    proveedor = como_proveedor(proveedor)
+    starts = starts or {}
+
+    # Agrupar por fecha de inicio y partir en lotes
+    grupos = {}
+    for tic in dict.fromkeys(tickers):
+        grupos.setdefault(starts.get(tic, start), []).append(tic)
+
+    lotes = []
+    for inicio, grupo in grupos.items():
+        for i in range(0, len(grupo), tam_lote):
+            lotes.append((grupo[i:i + tam_lote], inicio))
+
+    series, errores = {}, {}
+    if not lotes:
+        return series, errores
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(lotes)))) as pool:
+        futuros = [
+            pool.submit(_descargar_lote, proveedor, lote, inicio, end, reintentos, backoff)
+            for lote, inicio in lotes
+        ]
+        for fut in futuros:
+            s, e = fut.result()
+            series.update(s)
+            errores.update(e)
+
+    for tic, msg in errores.items():
+        logger.warning("No se pudo descargar %s: %s", tic, msg)
+
+    return series, errores
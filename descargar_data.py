@@ -1,5 +1,9 @@
+import logging
+
 import sf_library as sfl
 
+logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
 sectores = [
     'XLK', 'XLF', 'XLV', 'XLP', 'XLY', 'XLE', 
     'XLI', 'XLC', 'XLB', 'XLU', 'XLRE'
@@ -9,4 +13,6 @@ regiones = ['EWJ', 'SPLG', 'EEM', 'IEUR', 'EWC']
 
 tickers = sectores + regiones
 
-sfl.descargar_tickers(tickers)
+errores = sfl.descargar_tickers(tickers)
+for tic, msg in errores.items():
+    print(f"Error descargando {tic}: {msg}")
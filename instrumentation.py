@@ -0,0 +1,235 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# ============================================
+# REGISTRO DE TIEMPOS Y CONTADORES
+# ============================================
+#
+# Cada etapa del pipeline (lectura, alineación, momentos, optimización,
+# métricas) registra su tiempo de pared bajo un nombre. Además se pueden
+# acumular contadores arbitrarios por nombre (iteraciones del optimizador,
+# evaluaciones de función, hits de caché...).
+#
+# El perfilado con cProfile es opcional: se activa con activar_perfilado()
+# o con la variable de entorno SF_PROFILE=1. La profundidad de anidamiento es
+# por hilo y el profiler lo usa un solo hilo a la vez (el primero que entra a
+# una llamada instrumentada externa); los demás hilos solo miden tiempos.
+
+_lock = threading.Lock()
+_registro = {}
+_perfil = {"activo": os.environ.get("SF_PROFILE", "") not in ("", "0"),
+           "profiler": None, "hilo": None}
+_local = threading.local()
+
+
+def _entrada(nombre):
+    e = _registro.get(nombre)
+    if e is None:
+        e = _registro[nombre] = {
+            "llamadas": 0,
+            "total_s": 0.0,
+            "min_s": float("inf"),
+            "max_s": 0.0,
+            "ultimo_s": 0.0,
+            "contadores": {},
+        }
+    return e
+
+
+def registrar_tiempo(nombre, segundos):
+    """Agrega una medición de `segundos` a la etapa `nombre`."""
+    with _lock:
+        e = _entrada(nombre)
+        e["llamadas"] += 1
+        e["total_s"] += segundos
+        e["min_s"] = min(e["min_s"], segundos)
+        e["max_s"] = max(e["max_s"], segundos)
+        e["ultimo_s"] = segundos
+
+
+def contar(nombre, clave, valor=1):
+    """Suma `valor` al contador `clave` de la etapa `nombre`."""
+    with _lock:
+        c = _entrada(nombre)["contadores"]
+        c[clave] = c.get(clave, 0) + valor
+
+
+def registrar_resultado(nombre, res):
+    """
+    Registra los diagnósticos de un resultado de scipy.optimize
+    (iteraciones, evaluaciones de función/gradiente y éxito).
+    """
+    for attr, clave in (("nit", "iteraciones"), ("nfev", "evaluaciones_f"),
+                        ("njev", "evaluaciones_jac")):
+        valor = getattr(res, attr, None)
+        if valor is not None:
+            contar(nombre, clave, int(valor))
+    if getattr(res, "success", None) is not None:
+        contar(nombre, "exitos" if res.success else "fallos")
+
+
+@contextmanager
+def _perfilando():
+    """
+    Activa el profiler global en la llamada instrumentada más externa del
+    hilo, si ningún otro hilo lo está usando.
+    """
+    profundidad = getattr(_local, "profundidad", 0)
+    if not _perfil["activo"] or profundidad > 0:
+        _local.profundidad = profundidad + 1
+        try:
+            yield
+        finally:
+            _local.profundidad -= 1
+        return
+
+    with _lock:
+        propio = _perfil["hilo"] is None
+        if propio:
+            _perfil["hilo"] = threading.get_ident()
+            if _perfil["profiler"] is None:
+                _perfil["profiler"] = cProfile.Profile()
+        prof = _perfil["profiler"]
+
+    _local.profundidad = 1
+    try:
+        if propio:
+            prof.enable()
+        yield
+    finally:
+        if propio:
+            prof.disable()
+            with _lock:
+                _perfil["hilo"] = None
+        _local.profundidad = 0
+
+
+@contextmanager
+def timer(nombre):
+    """
+    Context manager que mide el tiempo de pared del bloque.
+
+        with timer("carga"):
+            ...
+    """
+    t0 = time.perf_counter()
+    try:
+        with _perfilando():
+            yield
+    finally:
+        registrar_tiempo(nombre, time.perf_counter() - t0)
+
+
+def timed(nombre=None, con_resultado=False):
+    """
+    Decorador que mide cada llamada de la función.
+
+    Parámetros
+    ----------
+    nombre : str, opcional
+        Nombre de la etapa; por defecto el nombre de la función.
+    con_resultado : bool
+        Si es True, la función regresa (x, res) como los optimize_* y se
+        registran los diagnósticos de `res` (ver registrar_resultado).
+    """
+    def decorador(func):
+        etiqueta = nombre or func.__name__
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            with timer(etiqueta):
+                salida = func(*args, **kwargs)
+            if con_resultado and isinstance(salida, tuple) and len(salida) == 2:
+                registrar_resultado(etiqueta, salida[1])
+            return salida
+
+        return envoltura
+
+    return decorador
+
+
+# ============================================
+# PERFILADO Y REPORTES
+# ============================================
+
+def activar_perfilado(activo=True):
+    """Activa/desactiva el perfilado con cProfile de las llamadas instrumentadas."""
+    _perfil["activo"] = activo
+
+
+def _top_perfil(n=25, orden="cumulative"):
+    prof = _perfil["profiler"]
+    if prof is None:
+        return []
+    try:
+        stats = pstats.Stats(prof, stream=io.StringIO())
+    except TypeError:
+        # Profiler sin datos todavía
+        return []
+    stats.sort_stats(orden)
+
+    filas = []
+    for (archivo, linea, func) in stats.fcn_list[:n]:
+        cc, nc, tt, ct, _ = stats.stats[(archivo, linea, func)]
+        filas.append({
+            "funcion": f"{os.path.basename(archivo)}:{linea}({func})",
+            "llamadas": nc,
+            "tottime_s": tt,
+            "cumtime_s": ct,
+        })
+    return filas
+
+
+def guardar_perfil(ruta):
+    """Vuelca el perfil acumulado a un archivo .prof (para snakeviz/pstats)."""
+    if _perfil["profiler"] is not None:
+        _perfil["profiler"].dump_stats(ruta)
+
+
+def reporte(top_perfil=25):
+    """
+    Reporte de todas las etapas instrumentadas.
+
+    Retorna
+    -------
+    dict con llaves "timers" ({nombre: llamadas, total_s, media_s, min_s,
+    max_s, ultimo_s, contadores}) y "perfil" (funciones más costosas si el perfilado
+    está activo).
+    """
+    with _lock:
+        timers = {}
+        for nombre, e in sorted(_registro.items()):
+            llamadas = e["llamadas"]
+            timers[nombre] = {
+                "llamadas": llamadas,
+                "total_s": e["total_s"],
+                "media_s": e["total_s"] / llamadas if llamadas else 0.0,
+                "min_s": e["min_s"] if llamadas else 0.0,
+                "max_s": e["max_s"],
+                "ultimo_s": e["ultimo_s"],
+                "contadores": dict(e["contadores"]),
+            }
+    return {"timers": timers, "perfil": _top_perfil(top_perfil)}
+
+
+def reporte_json(ruta=None, top_perfil=25):
+    """Reporte en JSON; si se da `ruta` también se escribe a archivo."""
+    texto = json.dumps(reporte(top_perfil), indent=2, ensure_ascii=False)
+    if ruta is not None:
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(texto)
+    return texto
+
+
+def reiniciar():
+    """Borra todas las mediciones y el perfil acumulado."""
+    with _lock:
+        _registro.clear()
+        _perfil["profiler"] = None
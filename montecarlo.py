@@ -0,0 +1,217 @@
+"""
+Simulación Monte Carlo del riesgo de un portafolio.
+
+Simula trayectorias de rendimientos de los activos a partir de mu y Σ
+(normal multivariada vía Cholesky o t de Student multivariada) o remuestreando
+bloques de la historia, y resume el rendimiento a horizonte (VaR/CVaR) y el
+máximo drawdown de cada trayectoria. Las trayectorias se procesan por bloques
+de tamaño fijo, así que la memoria no crece con el número de caminos: de cada
+camino solo se guardan su rendimiento final y su máximo drawdown.
+
+Cada bloque usa su propia semilla derivada con np.random.SeedSequence, de modo
+que el resultado es el mismo en serie o con varios procesos.
+
+Uso:
+    import montecarlo as mc
+    sim = mc.simular_montecarlo(w, mu_diario, Sigma_diaria, horizonte=21,
+                                n_caminos=1_000_000, modelo="t", n_jobs=4)
+    sim["VaR"], sim["CVaR"], sim["drawdown"]
+"""
+
+import numpy as np
+
+from instrumentation import timed
+
+MODELOS = ("normal", "t", "bootstrap")
+
+# Contexto de cada proceso trabajador (se fija una vez en el inicializador)
+_contexto = {}
+
+
+# ============================================
+# GENERADORES DE RENDIMIENTOS
+# ============================================
+
+def _raiz_cov(Sigma):
+    """Factor L con L L' = Σ (Cholesky; si Σ es singular, vía eigen)."""
+    Sigma = np.asarray(Sigma, dtype=float)
+    try:
+        return np.linalg.cholesky(Sigma)
+    except np.linalg.LinAlgError:
+        vals, vecs = np.linalg.eigh(Sigma)
+        return vecs * np.sqrt(np.clip(vals, 0.0, None))
+
+
+def _rendimientos_normal(rng, c, h, mu, L):
+    Z = rng.standard_normal((c, h, L.shape[0]))
+    return mu + Z @ L.T
+
+
+def _rendimientos_t(rng, c, h, mu, L, gl):
+    # t multivariada con la misma covarianza Σ: escala sqrt((gl - 2) / χ²)
+    Z = rng.standard_normal((c, h, L.shape[0]))
+    escala = np.sqrt((gl - 2.0) / rng.chisquare(gl, size=(c, h, 1)))
+    return mu + (Z @ L.T) * escala
+
+
+def _rendimientos_bootstrap(rng, c, h, R, bloque):
+    # Bootstrap circular por bloques: conserva la dependencia de corto plazo
+    T = R.shape[0]
+    n_bloques = -(-h // bloque)
+    inicios = rng.integers(0, T, size=(c, n_bloques))
+    idx = (inicios[:, :, None] + np.arange(bloque)) % T
+    return R[idx.reshape(c, -1)[:, :h]]
+
+
+# ============================================
+# SIMULACIÓN POR BLOQUES
+# ============================================
+
+def _simular_bloque(semilla, c, ctx):
+    """
+    Simula `c` caminos y regresa (rendimiento a horizonte, máximo drawdown)
+    de cada uno. Los pesos derivan con los precios (comprar y mantener).
+    """
+    rng = np.random.default_rng(semilla)
+    h = ctx["horizonte"]
+
+    if ctx["modelo"] == "normal":
+        X = _rendimientos_normal(rng, c, h, ctx["mu"], ctx["L"])
+    elif ctx["modelo"] == "t":
+        X = _rendimientos_t(rng, c, h, ctx["mu"], ctx["L"], ctx["gl"])
+    else:
+        X = _rendimientos_bootstrap(rng, c, h, ctx["R"], ctx["bloque"])
+
+    X += 1.0
+    np.cumprod(X, axis=1, out=X)
+    V = X @ ctx["w"]                      # (c × h) valor del portafolio
+
+    pico = np.maximum.accumulate(V, axis=1)
+    np.maximum(pico, 1.0, out=pico)       # el valor inicial también es pico
+    max_dd = np.minimum((V / pico - 1.0).min(axis=1), 0.0)
+    return V[:, -1] - 1.0, max_dd
+
+
+def _iniciar_trabajador(ctx):
+    _contexto.clear()
+    _contexto.update(ctx)
+
+
+def _simular_bloque_trabajador(args):
+    semilla, c = args
+    return _simular_bloque(semilla, c, _contexto)
+
+
+def resumen_riesgo(rendimientos, max_drawdown, niveles=(0.95, 0.99),
+                   cuantiles_dd=(0.5, 0.05, 0.01)):
+    """
+    VaR/CVaR a horizonte y distribución del máximo drawdown.
+
+    Usa las mismas convenciones que compute_portfolio_metrics: el VaR y el
+    CVaR se reportan como pérdidas positivas.
+
+    Retorna
+    -------
+    dict con "VaR" y "CVaR" ({nivel: valor}) y "drawdown" (media y
+    cuantiles {q: valor} del máximo drawdown).
+    """
+    var, cvar = {}, {}
+    for nivel in niveles:
+        q = np.quantile(rendimientos, 1.0 - nivel)
+        var[nivel] = float(-q)
+        cvar[nivel] = float(-rendimientos[rendimientos <= q].mean())
+
+    drawdown = {"media": float(max_drawdown.mean())}
+    for q in cuantiles_dd:
+        drawdown[q] = float(np.quantile(max_drawdown, q))
+
+    return {"VaR": var, "CVaR": cvar, "drawdown": drawdown}
+
+
+@timed("simular_montecarlo")
+def simular_montecarlo(w, mu=None, Sigma=None, horizonte=21, n_caminos=100_000,
+                       modelo="normal", gl=5, R=None, bloque=5, seed=0,
+                       max_bytes=64 * 1024 ** 2, n_jobs=1, niveles=(0.95, 0.99)):
+    """
+    Monte Carlo de trayectorias del portafolio.
+
+    Parámetros
+    ----------
+    w : array-like
+        Pesos del portafolio (n,).
+    mu, Sigma : array-like
+        Media (n,) y covarianza (n × n) POR PERIODO (p. ej. diarias, sin
+        anualizar). Requeridos para los modelos 'normal' y 't'.
+    horizonte : int
+        Periodos simulados por camino (21 ≈ un mes de días hábiles).
+    n_caminos : int
+        Número de trayectorias.
+    modelo : {'normal', 't', 'bootstrap'}
+        Normal multivariada (Cholesky), t de Student multivariada con `gl`
+        grados de libertad y covarianza Σ, o bootstrap por bloques de la
+        historia `R`.
+    gl : float
+        Grados de libertad del modelo 't' (> 2).
+    R : array-like o pd.DataFrame, opcional
+        Historia de rendimientos (T × n) para el modelo 'bootstrap'.
+    bloque : int
+        Largo de los bloques del bootstrap.
+    seed : int
+        Semilla; el resultado no depende de n_jobs.
+    max_bytes : int
+        Memoria aproximada por bloque de caminos.
+    n_jobs : int
+        Procesos; con 1 se simula en el proceso actual.
+    niveles : tuple[float]
+        Niveles de confianza del VaR/CVaR.
+
+    Retorna
+    -------
+    dict con "rendimientos" y "max_drawdown" (np.ndarray por camino) y las
+    llaves de resumen_riesgo ("VaR", "CVaR", "drawdown").
+    """
+    if modelo not in MODELOS:
+        raise ValueError("modelo debe ser 'normal', 't' o 'bootstrap'.")
+
+    w = np.asarray(w, dtype=float).reshape(-1)
+    w = w / w.sum()
+    n = w.shape[0]
+    ctx = {"modelo": modelo, "horizonte": int(horizonte), "w": w}
+
+    if modelo == "bootstrap":
+        if R is None:
+            raise ValueError("El modelo 'bootstrap' requiere la historia R.")
+        if hasattr(R, "drop"):
+            R = R.drop(columns="date", errors="ignore").to_numpy(dtype=float)
+        ctx["R"] = np.ascontiguousarray(R, dtype=float)
+        ctx["bloque"] = max(1, int(bloque))
+    else:
+        if mu is None or Sigma is None:
+            raise ValueError("Los modelos 'normal' y 't' requieren mu y Sigma.")
+        if modelo == "t" and gl <= 2:
+            raise ValueError("gl debe ser mayor que 2.")
+        ctx["mu"] = np.asarray(mu, dtype=float).reshape(-1)
+        ctx["L"] = _raiz_cov(Sigma)
+        ctx["gl"] = float(gl)
+
+    # Caminos por bloque: las matrices c × h × n (varias copias) caben en max_bytes
+    c = max(1, int(max_bytes // (8 * 3 * ctx["horizonte"] * n)))
+    tamanos = [min(c, n_caminos - i) for i in range(0, n_caminos, c)]
+    semillas = np.random.SeedSequence(seed).spawn(len(tamanos))
+    tareas = list(zip(semillas, tamanos))
+
+    if n_jobs <= 1 or len(tareas) == 1:
+        partes = [_simular_bloque(s, k, ctx) for s, k in tareas]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_iniciar_trabajador,
+                                 initargs=(ctx,)) as pool:
+            partes = list(pool.map(_simular_bloque_trabajador, tareas))
+
+    rendimientos = np.concatenate([p[0] for p in partes])
+    max_dd = np.concatenate([p[1] for p in partes])
+
+    salida = {"rendimientos": rendimientos, "max_drawdown": max_dd}
+    salida.update(resumen_riesgo(rendimientos, max_dd, niveles=niveles))
+    return salida
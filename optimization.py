@@ -1,72 +1,31 @@
-import pandas as pd
+import importlib
+import os
+import threading
+import time
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import sf_library as sfl
-import scipy.optimize as op
-
-sectores = [
-    'XLK',  # Tecnología
-    'XLF',  # Finanzas
-    'XLV',  # Salud
-    'XLP',  # Consumo básico
-    'XLY',  # Consumo discrecional
-    'XLE',  # Energía
-    'XLI',  # Industrial
-    'XLC',  # Comunicaciones
-    'XLB',  # Materiales
-    'XLU',  # Servicios públicos
-    'XLRE', # Bienes raíces
-]
-
-Regiones=[
-    'EWJ',  # Japón
-    'SPLG',  # Global
-    'EEM',  # Mercados emergentes
-    'IEUR',  # Europa
-    'EWC',  # Canadá
-]
-
-tickers = sectores + Regiones
-
-#Descargando la iforamación de los tickers
-sfl.descargar_tickers(tickers)
-
-
-#Matriz de correlación entre sectores
-
-all_returns = []
-
-for ticker in tickers:
-    t = sfl.daily_return(ticker, data_dir="MarketData")
-    t = t[['date', 'return']].rename(columns={'return': ticker})
-    all_returns.append(t)
-
-df = all_returns[0]
-for t in all_returns[1:]:
-    df = pd.merge(df, t, on='date', how='inner')
-
-df = df.dropna().sort_values('date').reset_index(drop=True)
-df = df[df['date']<'2019-01-01']
-df
-
-returns_only = df.drop(columns='date')
-mtx_var_covar = returns_only.cov().values
-mtx_correl = returns_only.corr().values
-
-plt.figure(figsize=(18, 16))
-sns.heatmap(
-    mtx_correl,
-    annot=True,        # imprime el valor de correlación en cada celda
-    fmt=".2f",         # 2 decimales
-    cmap="coolwarm",   
-    vmin=0, vmax=1
-)
-plt.title("Matriz de Correlaciones de Tickers")
-plt.tight_layout()
-plt.show()
+import hashlib
+from collections import OrderedDict
+from instrumentation import timed
 
 
+class _ModuloPerezoso:
+    """Importa el módulo `nombre` hasta el primer acceso a un atributo."""
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+
+    def __getattr__(self, attr):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nombre)
+        return getattr(self._modulo, attr)
+
+
+# scipy.optimize tarda más en importarse que el resto del módulo; solo se
+# carga cuando se usa SLSQP, linprog o OptimizeResult
+op = _ModuloPerezoso("scipy.optimize")
+
 # ============================================
 # FUNCIONES DE OPTIMIZACIÓN (MARKOWITZ)
 # ============================================
@@ -75,10 +34,12 @@ def _check_inputs(mu, Sigma):
     """
     Convierte mu y Sigma a numpy y valida dimensiones.
     mu: iterable de medias (por ejemplo, mu_universo de pandas)
-    Sigma: matriz varianza-covarianza (DataFrame o array)
+    Sigma: matriz varianza-covarianza (DataFrame, array o
+           sfl.CovarianzaFactorial, que se deja sin densificar)
     """
     mu = np.asarray(mu).reshape(-1)
-    Sigma = np.asarray(Sigma)
+    if not isinstance(Sigma, sfl.CovarianzaFactorial):
+        Sigma = np.asarray(Sigma)
     n = mu.shape[0]
 
     if Sigma.shape != (n, n):
@@ -116,83 +77,447 @@ def portfolio_performance(weights, mean_returns, cov_matrix):
     return ret, vol
 
 
+# =====================================================================
+# Gradientes analíticos (para jac= en SLSQP)
+# =====================================================================
+def _var_y_grad(w, Sigma):
+    """
+    Varianza del portafolio y su gradiente:
+        f(w) = w' Σ w,   ∇f = 2 Σ w
+    """
+    Sw = Sigma @ w
+    return float(w @ Sw), 2.0 * Sw
+
+
+def _neg_sharpe_y_grad(w, mu, Sigma, rf):
+    """
+    Sharpe negativo y su gradiente:
+        f(w) = -(w'μ - rf) / σ,   σ = sqrt(w' Σ w)
+        ∇f   = -μ / σ + (w'μ - rf) Σ w / σ³
+    """
+    Sw = Sigma @ w
+    var = float(w @ Sw)
+    if var <= 0:
+        return 1e6, np.zeros_like(w)
+    vol = np.sqrt(var)
+    exceso = float(w @ mu) - rf
+    return -exceso / vol, -mu / vol + exceso * Sw / vol ** 3
+
+
+def _restricciones(n, mu=None, r_target=None):
+    """
+    Restricciones de igualdad con su jacobiano analítico:
+        sum(w) = 1            (jac = 1')
+        w' mu = r_target      (jac = mu', solo si se da r_target)
+    """
+    unos = np.ones(n)
+    cons = [{"type": "eq", "fun": lambda w: np.sum(w) - 1, "jac": lambda w: unos}]
+    if r_target is not None:
+        cons.append({"type": "eq", "fun": lambda w: np.dot(w, mu) - r_target,
+                     "jac": lambda w: mu})
+    return cons
+
+
+def verificar_gradientes(mu, Sigma, rf=0.0, n_puntos=5, seed=0, eps=1e-7):
+    """
+    Compara los gradientes analíticos contra diferencias finitas en puntos
+    aleatorios del simplex.
+
+    Regresa
+    -------
+    dict {nombre: error relativo máximo} para la varianza, el Sharpe negativo
+    y las restricciones.
+    """
+    mu, Sigma, n = _check_inputs(mu, Sigma)
+    rng = np.random.default_rng(seed)
+
+    funciones = {
+        "varianza": lambda w: _var_y_grad(w, Sigma),
+        "neg_sharpe": lambda w: _neg_sharpe_y_grad(w, mu, Sigma, rf),
+    }
+    for i, c in enumerate(_restricciones(n, mu, r_target=0.0)):
+        funciones[f"restriccion_{i}"] = lambda w, c=c: (c["fun"](w), c["jac"](w))
+
+    errores = {}
+    for nombre, f in funciones.items():
+        peor = 0.0
+        for w in rng.dirichlet(np.ones(n), n_puntos):
+            analitico = f(w)[1]
+            numerico = op.approx_fprime(w, lambda x: f(x)[0], eps)
+            escala = max(np.linalg.norm(numerico), 1e-12)
+            peor = max(peor, np.linalg.norm(analitico - numerico) / escala)
+        errores[nombre] = float(peor)
+    return errores
+
+
+# =====================================================================
+# Solver QP (mínima varianza / Markowitz)
+# =====================================================================
+#
+# Problemas de la forma
+#     min  ½ w' H w + c' w
+#     s.a. A w = b
+#          w >= 0            (solo si short = False)
+# Con cortos se resuelve directo el sistema KKT; sin cortos se usa un método
+# de conjunto activo primal sobre las cotas w_i >= 0 (con sum(w) = 1 la cota
+# superior w_i <= 1 se cumple sola).
+
+def _resolver_kkt(H, c, A, b):
+    """Resuelve [[H, A'], [A, 0]] [w; y] = [-c; b]. Regresa (w, y)."""
+    n, m = H.shape[0], A.shape[0]
+    K = np.zeros((n + m, n + m))
+    K[:n, :n] = H
+    K[:n, n:] = A.T
+    K[n:, :n] = A
+    rhs = np.concatenate([-c, b])
+    try:
+        sol = np.linalg.solve(K, rhs)
+    except np.linalg.LinAlgError:
+        # A con filas dependientes (p. ej. todos los mu iguales)
+        sol = np.linalg.lstsq(K, rhs, rcond=None)[0]
+    return sol[:n], sol[n:]
+
+
+def _cumple_igualdades(A, w, b, tol=1e-8):
+    """
+    True si w es finito y ‖A w - b‖∞ <= tol (relativa a b). Cuando el
+    sistema KKT es singular o inconsistente, lstsq regresa un w de mínimos
+    cuadrados que no cumple las restricciones.
+    """
+    if not np.all(np.isfinite(w)):
+        return False
+    return float(np.abs(A @ w - b).max()) <= tol * max(1.0, float(np.abs(b).max()))
+
+
+def _punto_factible(A, b, w0=None, tol=1e-9):
+    """
+    Punto w >= 0 con A w = b. Usa w0 si ya es factible; si no, un vértice
+    con dos activos (cuando A = [1'; mu']) o un programa lineal.
+    """
+    n = A.shape[1]
+    escala = max(1.0, np.abs(b).max())
+    if w0 is not None:
+        w0 = np.asarray(w0, dtype=float)
+        if w0.min() >= -tol and np.abs(A @ w0 - b).max() <= tol * escala:
+            return np.clip(w0, 0.0, None)
+
+        # Arranque en caliente para Markowitz: w0 suma 1 pero tiene otro
+        # rendimiento; se mezcla con el activo de mayor (o menor) mu hasta
+        # alcanzar el objetivo, conservando casi todo el soporte de w0
+        if (A.shape[0] == 2 and np.allclose(A[0], 1.0) and w0.min() >= -tol
+                and abs(w0.sum() - b[0]) <= tol * escala):
+            mu, r = A[1], b[1]
+            r0 = float(mu @ w0)
+            k = int(np.argmax(mu)) if r > r0 else int(np.argmin(mu))
+            if abs(mu[k] - r0) > tol and min(r0, mu[k]) <= r <= max(r0, mu[k]):
+                t = (r - r0) / (mu[k] - r0)
+                w = (1 - t) * np.clip(w0, 0.0, None)
+                w[k] += t * b[0]
+                return w
+
+    if A.shape[0] == 1:
+        a = A[0]
+        if a.sum() > 0:
+            return np.full(n, b[0] / a.sum())
+        if a.max() > 0:
+            w = np.zeros(n)
+            w[int(np.argmax(a))] = b[0] / a.max()
+            return w
+        return None
+
+    if A.shape[0] == 2 and np.allclose(A[0], 1.0):
+        mu, r = A[1], b[1] / b[0]
+        i, j = int(np.argmin(mu)), int(np.argmax(mu))
+        w = np.zeros(n)
+        if mu[j] - mu[i] <= tol * max(1.0, abs(mu[j])):
+            w[i] = b[0]
+        else:
+            t = (r - mu[i]) / (mu[j] - mu[i])
+            w[i], w[j] = b[0] * (1 - t), b[0] * t
+        return w
+
+    lp = op.linprog(np.zeros(n), A_eq=A, b_eq=b, bounds=(0, None), method="highs")
+    return lp.x if lp.success else None
+
+
+def _submatriz(Sigma, libres):
+    """Σ restringida a los activos `libres`; si es factorial sigue siéndolo."""
+    if isinstance(Sigma, sfl.CovarianzaFactorial):
+        return sfl.CovarianzaFactorial(Sigma.B[libres], Sigma.F, Sigma.D[libres])
+    return Sigma[np.ix_(libres, libres)]
+
+
+def _kkt(Sigma, c, A, b):
+    """
+    Solución KKT de min w'Σw + c'w s.a. Aw = b. Regresa (w, y) con la
+    convención de _resolver_kkt (H = 2Σ). Con Σ densa se resuelve el sistema
+    [[Σ, A'], [A, 0]] con c/2, que da y/2, para no formar 2Σ.
+    """
+    if isinstance(Sigma, sfl.CovarianzaFactorial):
+        return _kkt_factorial(Sigma, c, A, b)
+    w, y = _resolver_kkt(Sigma, 0.5 * c, A, b)
+    return w, 2.0 * y
+
+
+def _qp_conjunto_activo(Sigma, c, A, b, w0=None, max_iter=None, tol=1e-10):
+    """
+    Método de conjunto activo primal para min w'Σw + c'w s.a. Aw = b, w >= 0.
+
+    Σ puede ser densa o sfl.CovarianzaFactorial: cada subproblema usa la
+    submatriz de los activos libres (factorial también, resuelta por
+    Woodbury) y el gradiente solo necesita el producto Σw.
+
+    Regresa (w, nit, exito, mensaje).
+    """
+    n = Sigma.shape[0]
+    w = _punto_factible(A, b, w0)
+    if w is None:
+        return np.full(n, np.nan), 0, False, "Restricciones infactibles."
+
+    if max_iter is None:
+        max_iter = 10 * n + 100
+
+    # Conjunto de trabajo: activos fijos en cero
+    activos = w <= tol
+    for nit in range(1, max_iter + 1):
+        libres = ~activos
+        wF, y = _kkt(_submatriz(Sigma, libres), c[libres], A[:, libres], b)
+        w_nuevo = np.zeros(n)
+        w_nuevo[libres] = wF
+        p = w_nuevo - w
+
+        if np.abs(p).max() <= tol * max(1.0, np.abs(w).max()):
+            # Multiplicadores de las cotas activas: λ = ∇f + A'y
+            g = 2.0 * (Sigma @ w) + c
+            lam = g + A.T @ y
+            lam[libres] = np.inf
+            k = int(np.argmin(lam))
+            if not activos.any() or lam[k] >= -tol * max(1.0, np.abs(g).max()):
+                if not _cumple_igualdades(A, w, b):
+                    return w, nit, False, "El punto final no cumple A w = b (sistema singular)."
+                return w, nit, True, "Óptimo encontrado (conjunto activo)."
+            activos[k] = False
+            continue
+
+        # Paso máximo sin violar w >= 0
+        bloqueo = libres & (p < 0)
+        alpha, k = 1.0, None
+        if bloqueo.any():
+            cocientes = np.full(n, np.inf)
+            cocientes[bloqueo] = -w[bloqueo] / p[bloqueo]
+            k = int(np.argmin(cocientes))
+            if cocientes[k] < 1.0:
+                alpha = max(cocientes[k], 0.0)
+            else:
+                k = None
+
+        w = w + alpha * p
+        if k is not None:
+            w[k] = 0.0
+            activos[k] = True
+        w[w < 0] = 0.0
+
+    return w, max_iter, False, "Se alcanzó el máximo de iteraciones."
+
+
+def _kkt_factorial(Sigma, c, A, b):
+    """
+    Solución KKT de min w'Σw + c'w s.a. Aw = b con Σ factorial, usando
+    Σ⁻¹ por Woodbury (O(n·k²)) en vez del sistema denso:
+        w = ½ Σ⁻¹ (-c - A'y),   (A Σ⁻¹ A') y = -A Σ⁻¹ c - 2b
+    Regresa (w, y).
+    """
+    Sinv_At = Sigma.resolver(A.T)
+    Sinv_c = Sigma.resolver(c)
+    y = np.linalg.lstsq(A @ Sinv_At, -A @ Sinv_c - 2.0 * b, rcond=None)[0]
+    return 0.5 * (-Sinv_c - Sinv_At @ y), y
+
+
+def _resolver_qp(Sigma, A, b, short, w0=None, c=None):
+    """
+    Minimiza w'Σw (+ c'w) con A w = b y regresa (w, res) con res tipo
+    scipy.optimize.OptimizeResult para que sea intercambiable con SLSQP.
+
+    Con Σ factorial nunca se forma la matriz n × n: con cortos se resuelve
+    en O(n·k²) y sin cortos el conjunto activo usa submatrices factoriales.
+    """
+    n = Sigma.shape[0]
+    c = np.zeros(n) if c is None else np.asarray(c, dtype=float)
+
+    if short:
+        w, _ = _kkt(Sigma, c, A, b)
+        nit, exito = 1, _cumple_igualdades(A, w, b)
+        if not exito:
+            mensaje = "Restricciones inconsistentes: la solución KKT no cumple A w = b."
+        elif isinstance(Sigma, sfl.CovarianzaFactorial):
+            mensaje = "Solución cerrada KKT (Woodbury)."
+        else:
+            mensaje = "Solución cerrada KKT."
+    else:
+        w, nit, exito, mensaje = _qp_conjunto_activo(Sigma, c, A, b, w0=w0)
+
+    res = op.OptimizeResult(
+        x=w,
+        fun=float(w @ (Sigma @ w) + c @ w) if exito else np.nan,
+        success=exito,
+        status=0 if exito else 1,
+        message=mensaje,
+        nit=nit,
+    )
+    return w, res
+
+
 #Funciones de Optimización#
 
 #############Minima Volatilidad##############
 
-def optimize_min_variance(mu, Sigma, short=False):
+@timed(con_resultado=True)
+def optimize_min_variance(mu, Sigma, short=False, engine="slsqp", w0=None):
     """
     Portafolio de MÍNIMA VARIANZA:
         min  w' Σ w
         s.a. sum(w) = 1
              (y w >= 0 si short = False)
+
+    engine: "slsqp" (scipy.optimize) o "qp" (solución KKT con cortos,
+            conjunto activo sin cortos).
+    w0: punto inicial opcional (arranque en caliente); por defecto pesos iguales.
     """
     mu, Sigma, n = _check_inputs(mu, Sigma)
 
+    if engine == "qp":
+        return _resolver_qp(Sigma, np.ones((1, n)), np.array([1.0]), short, w0=w0)
+    if engine != "slsqp":
+        raise ValueError("engine debe ser 'slsqp' o 'qp'.")
+
     def obj(w):
-        return w @ Sigma @ w.T
+        return _var_y_grad(w, Sigma) # w' Σ w y su gradiente
 
 
-    bounds = tuple((0,1) for _ in range(n)) # Pesos entre 0 y 1 (no short)
-    cons = [{'type':'eq','fun':lambda w: np.sum(w) - 1}] # Suma de pesos = 1
-    w0 = np.ones(n) / n # Condición inicial: pesos iguales
+    bounds = tuple((0,1) for _ in range(n)) if not short else None # Pesos entre 0 y 1 (no short)
+    cons = _restricciones(n) # Suma de pesos = 1
+    if w0 is None:
+        w0 = np.ones(n) / n # Condición inicial: pesos iguales
 
     res = op.minimize(
         obj, 
-        w0, method="SLSQP", bounds=bounds, constraints=cons
+        w0, method="SLSQP", jac=True, bounds=bounds, constraints=cons
     )
 
     return res.x, res
 
 
 #############Maximo Sharpe##############
-def optimize_max_sharpe(mu, Sigma, rf=0.0, short=False):
+def _max_sharpe_convexo(mu, Sigma, rf, short, w0=None):
+    """
+    Máximo Sharpe por homogeneización: con y = w / κ, κ > 0, el problema
+    equivale al QP convexo
+        min  y' Σ y
+        s.a. (mu - rf)' y = 1
+             (y >= 0 si short = False)
+    y luego w = y / sum(y).
+
+    Regresa (w, res) o None si el truco no aplica (ningún activo supera rf,
+    o con cortos la solución cae en la rama de Sharpe negativo).
+    """
+    n = mu.shape[0]
+    exceso = mu - rf
+    if not short and exceso.max() <= 0:
+        return None
+
+    y0 = None
+    if w0 is not None:
+        w0 = np.asarray(w0, dtype=float)
+        e0 = float(exceso @ w0)
+        if e0 > 0:
+            y0 = w0 / e0
+
+    y, res = _resolver_qp(Sigma, exceso.reshape(1, -1), np.array([1.0]), short, w0=y0)
+    if not res.success or not np.all(np.isfinite(y)) or y.sum() <= 0:
+        return None
+
+    w = y / y.sum()
+    res.x = w
+    res.fun = _neg_sharpe_y_grad(w, mu, Sigma, rf)[0]
+    res.message = "Máximo Sharpe por QP homogeneizado. " + res.message
+    return w, res
+
+
+@timed(con_resultado=True)
+def optimize_max_sharpe(mu, Sigma, rf=0.0, short=False, w0=None, engine="slsqp"):
     """
     Portafolio de MÁXIMO SHARPE:
         max (w' mu - rf) / sqrt(w' Σ w)
         s.a. sum(w) = 1
              (y w >= 0 si short = False)
+
+    w0: punto inicial opcional (arranque en caliente); por defecto pesos iguales.
+    engine: "slsqp" (Sharpe negativo con scipy.optimize) o "qp" (reformulación
+            convexa; si no aplica se usa SLSQP).
     """
     mu, Sigma, n = _check_inputs(mu, Sigma)
 
+    if engine == "qp":
+        salida = _max_sharpe_convexo(mu, Sigma, rf, short, w0=w0)
+        if salida is not None:
+            return salida
+    elif engine != "slsqp":
+        raise ValueError("engine debe ser 'slsqp' o 'qp'.")
+
     def neg_sharpe(w):
-        r = port_return(w, mu)
-        v = port_vol(w, Sigma)
-        if v == 0:
-            return 1e6
-        return -(r - rf) / v   # negativo porque minimizamos
+        # negativo porque minimizamos; regresa también el gradiente
+        return _neg_sharpe_y_grad(w, mu, Sigma, rf)
 
-    bounds = tuple((0,1) for _ in range(n)) # Pesos entre 0 y 1 (no short)
-    cons = [{'type':'eq','fun':lambda w: np.sum(w) - 1}] # Suma de pesos = 1
-    w0 = np.ones(n) / n # Condición inicial: pesos iguales
+    bounds = tuple((0,1) for _ in range(n)) if not short else None # Pesos entre 0 y 1 (no short)
+    cons = _restricciones(n) # Suma de pesos = 1
+    if w0 is None:
+        w0 = np.ones(n) / n # Condición inicial: pesos iguales
 
-    res = op.minimize(neg_sharpe, w0, method="SLSQP", bounds=bounds, constraints=cons)
+    res = op.minimize(neg_sharpe, w0, method="SLSQP", jac=True, bounds=bounds, constraints=cons)
 
     return res.x, res
 
 
-def optimize_markowitz_target(mu, Sigma, r_target, short=False):
+@timed(con_resultado=True)
+def optimize_markowitz_target(mu, Sigma, r_target, short=False, engine="slsqp", w0=None):
     """
     Portafolio de Markowitz con RENDIMIENTO OBJETIVO:
         min  w' Σ w
         s.a. sum(w) = 1
              w' mu = r_target
              (y w >= 0 si short = False)
+
+    engine: "slsqp" (scipy.optimize) o "qp" (solución KKT con cortos,
+            conjunto activo sin cortos).
+    w0: punto inicial opcional (arranque en caliente); por defecto pesos iguales.
     """
     mu, Sigma, n = _check_inputs(mu, Sigma)
 
+    if engine == "qp":
+        A = np.vstack([np.ones(n), mu])
+        b = np.array([1.0, r_target])
+        if not short and not (mu.min() <= r_target <= mu.max()):
+            # Ningún portafolio sin cortos alcanza ese rendimiento
+            res = op.OptimizeResult(
+                x=np.full(n, np.nan), fun=np.nan, success=False, status=2, nit=0,
+                message="Rendimiento objetivo fuera de [min(mu), max(mu)].",
+            )
+            return res.x, res
+        return _resolver_qp(Sigma, A, b, short, w0=w0)
+    if engine != "slsqp":
+        raise ValueError("engine debe ser 'slsqp' o 'qp'.")
+
     def obj(w):
-        return w @ Sigma @ w.T
+        return _var_y_grad(w, Sigma) # w' Σ w y su gradiente
 
-    cons = [
-        {"type": "eq", "fun": lambda w: np.sum(w) - 1}, # Suma de pesos = 1
-        {"type": "eq", "fun": lambda w: np.dot(w, mu) - r_target}, #rendimiento esperado
-    ]
+    # Suma de pesos = 1 y rendimiento esperado = r_target
+    cons = _restricciones(n, mu, r_target)
 
-    bounds = tuple((0,1) for _ in range(n)) # Pesos entre 0 y 1 (no short)
-    w0 = np.ones(n) / n # Condición inicial: pesos iguales
+    bounds = tuple((0,1) for _ in range(n)) if not short else None # Pesos entre 0 y 1 (no short)
+    if w0 is None:
+        w0 = np.ones(n) / n # Condición inicial: pesos iguales
 
-    res = op.minimize(obj, w0, method="SLSQP", bounds=bounds, constraints=cons)
+    res = op.minimize(obj, w0, method="SLSQP", jac=True, bounds=bounds, constraints=cons)
 
     return res.x, res
 
@@ -200,6 +525,187 @@ def optimize_markowitz_target(mu, Sigma, r_target, short=False):
 
 #############Black-Litterman##############
 
+class PosteriorBlackLitterman:
+    """
+    Posterior de Black–Litterman reutilizable para un mismo prior.
+
+    El prior (Σ, τ, δ, w_mkt) se procesa una sola vez: retornos implícitos
+    π = δ Σ w_mkt, τΣ y su factor de Cholesky. Cada conjunto de vistas
+    (P, Q, Ω) se resuelve con factorizaciones de Cholesky, sin inversas
+    explícitas:
+
+        S    = P τΣ P' + Ω = L L'
+        Z    = L⁻¹ P τΣ
+        μ_BL = π + Z' L⁻¹ (Q - P π)
+        M    = τΣ - Z' Z            ( = [(τΣ)⁻¹ + P' Ω⁻¹ P]⁻¹ )
+
+    Cuando hay más vistas que activos se usa la forma de precisión con el
+    Cholesky del prior, que resuelve sistemas n × n en vez de k × k.
+
+    Σ puede ser sfl.CovarianzaFactorial: π y la forma de Woodbury solo usan
+    productos con Σ, así que la matriz densa se forma únicamente si se pide
+    la covarianza posterior M o si se usa la forma de precisión.
+    """
+
+    def __init__(self, Sigma, tau=0.05, delta=2.5, w_mkt=None):
+        # Copia propia: la instancia puede vivir en el caché de posterior_bl
+        if isinstance(Sigma, sfl.CovarianzaFactorial):
+            Sigma = sfl.CovarianzaFactorial(np.array(Sigma.B, dtype=float),
+                                            np.array(Sigma.F, dtype=float),
+                                            np.array(Sigma.D, dtype=float),
+                                            tickers=Sigma.tickers)
+        else:
+            Sigma = np.array(Sigma, dtype=float)
+        n = Sigma.shape[0]
+        self.n = n
+        self.tau = tau
+        self.delta = delta
+        self.Sigma = Sigma
+        self.w_mkt = np.ones(n) / n if w_mkt is None else np.asarray(w_mkt, dtype=float)
+
+        # Retornos implícitos
+        self.pi = delta * (Sigma @ self.w_mkt)
+        self.tau_Sigma = tau * Sigma
+        self._L_prior = None
+
+    @property
+    def L_prior(self):
+        """Cholesky de τΣ (densa); se calcula al primer uso."""
+        if self._L_prior is None:
+            self._L_prior = np.linalg.cholesky(np.asarray(self.tau_Sigma))
+        return self._L_prior
+
+    def posterior_batch(self, P, Q, Omega, covarianza=True):
+        """
+        Evalúa muchos escenarios de vistas a la vez.
+
+        Parámetros
+        ----------
+        P : array (s × k × n) o (k × n)
+        Q : array (s × k) o (k,)
+        Omega : array (s × k × k) o (k × k)
+            Los argumentos sin dimensión de escenario se comparten entre todos.
+        covarianza : bool
+            Si es False no se calcula M (con Σ factorial evita densificar).
+
+        Regresa
+        -------
+        mu_bl : np.ndarray (s × n)
+            Medias posteriores.
+        M : np.ndarray (s × n × n) o None
+            Covarianzas posteriores de la media.
+        """
+        P = np.asarray(P, dtype=float)
+        Q = np.asarray(Q, dtype=float)
+        Omega = np.asarray(Omega, dtype=float)
+        if P.ndim == 2:
+            P = P[None]
+        if Q.ndim == 1:
+            Q = Q[None]
+        if Omega.ndim == 2:
+            Omega = Omega[None]
+
+        s = max(P.shape[0], Q.shape[0], Omega.shape[0])
+        k = P.shape[1]
+        P = np.broadcast_to(P, (s, k, self.n))
+        Q = np.broadcast_to(Q, (s, k))
+        Omega = np.broadcast_to(Omega, (s, k, k))
+
+        if k <= self.n:
+            return self._woodbury(P, Q, Omega, covarianza)
+        return self._precision(P, Q, Omega)
+
+    def _woodbury(self, P, Q, Omega, covarianza=True):
+        # P τΣ fila por fila (funciona también con Σ factorial)
+        PtS = (P.reshape(-1, self.n) @ self.tau_Sigma).reshape(P.shape)   # (s, k, n)
+        S = PtS @ np.swapaxes(P, 1, 2) + Omega                # (s, k, k)
+        L = np.linalg.cholesky(S)
+        Z = np.linalg.solve(L, PtS)                           # L⁻¹ P τΣ
+        sesgo = (Q - P @ self.pi)[..., None]                  # Q - P π
+        u = np.linalg.solve(L, sesgo)[..., 0]                 # L⁻¹ (Q - P π)
+
+        mu_bl = self.pi + np.einsum("skn,sk->sn", Z, u)
+        if not covarianza:
+            return mu_bl, None
+        M = np.asarray(self.tau_Sigma) - np.swapaxes(Z, 1, 2) @ Z
+        return mu_bl, M
+
+    def _precision(self, P, Q, Omega):
+        # Prec = (τΣ)⁻¹ + P'Ω⁻¹P con (τΣ)⁻¹ = G'G, G = L_prior⁻¹
+        G = np.linalg.solve(self.L_prior, np.eye(self.n))
+        Lo = np.linalg.cholesky(Omega)
+        A = np.linalg.solve(Lo, P)                            # Lo⁻¹ P
+        b = np.linalg.solve(Lo, Q[..., None])                 # Lo⁻¹ Q
+        Prec = G.T @ G + np.swapaxes(A, 1, 2) @ A
+        rhs = (G.T @ (G @ self.pi))[None, :, None] + np.swapaxes(A, 1, 2) @ b
+
+        Lp = np.linalg.cholesky(Prec)
+        Lp_inv = np.linalg.solve(Lp, np.broadcast_to(np.eye(self.n), Prec.shape))
+        M = np.swapaxes(Lp_inv, 1, 2) @ Lp_inv
+        mu_bl = (M @ rhs)[..., 0]
+        return mu_bl, M
+
+    def posterior(self, P, Q, Omega, covarianza=True):
+        """Media (n,) y covarianza (n × n) posteriores para un solo juego de vistas."""
+        mu_bl, M = self.posterior_batch(np.atleast_2d(P), np.reshape(Q, -1), np.atleast_2d(Omega),
+                                        covarianza=covarianza)
+        return mu_bl[0], None if M is None else M[0]
+
+
+# Las sesiones de la app llaman a posterior_bl desde hilos distintos
+_cache_posterior_bl = OrderedDict()
+_cache_posterior_bl_lock = threading.Lock()
+_CACHE_POSTERIOR_BL_MAX = 16
+
+
+def posterior_bl(Sigma, tau=0.05, delta=2.5, w_mkt=None):
+    """
+    Regresa el PosteriorBlackLitterman del prior dado, reutilizando el que
+    ya exista para los mismos (Σ, τ, δ, w_mkt). Una Σ factorial se
+    identifica por sus factores y no se densifica.
+    """
+    if isinstance(Sigma, sfl.CovarianzaFactorial):
+        huella = tuple(hashlib.sha1(np.ascontiguousarray(x, dtype=float).tobytes()).hexdigest()
+                       for x in (Sigma.B, Sigma.F, Sigma.D))
+    else:
+        Sigma = np.ascontiguousarray(Sigma, dtype=float)
+        huella = hashlib.sha1(Sigma.tobytes()).hexdigest()
+    n = Sigma.shape[0]
+    w_mkt = np.ones(n) / n if w_mkt is None else np.ascontiguousarray(w_mkt, dtype=float)
+    llave = (
+        huella, Sigma.shape,
+        float(tau), float(delta), hashlib.sha1(w_mkt.tobytes()).hexdigest(),
+    )
+
+    with _cache_posterior_bl_lock:
+        post = _cache_posterior_bl.get(llave)
+        if post is not None:
+            _cache_posterior_bl.move_to_end(llave)
+            return post
+
+    # El prior se procesa fuera del lock; si otro hilo ganó, se usa el suyo
+    post = PosteriorBlackLitterman(Sigma, tau=tau, delta=delta, w_mkt=w_mkt)
+    with _cache_posterior_bl_lock:
+        post = _cache_posterior_bl.setdefault(llave, post)
+        _cache_posterior_bl.move_to_end(llave)
+        while len(_cache_posterior_bl) > _CACHE_POSTERIOR_BL_MAX:
+            _cache_posterior_bl.popitem(last=False)
+    return post
+
+
+def black_litterman_batch(Sigma, P, Q, Omega, tau=0.05, delta=2.5, w_mkt=None, eps=1e-6):
+    """
+    Medias y covarianzas posteriores de Black–Litterman para muchos
+    escenarios de vistas (ver PosteriorBlackLitterman.posterior_batch).
+
+    Se suma eps·I a cada Ω, igual que en optimize_BL_target.
+    """
+    Omega = np.asarray(Omega, dtype=float)
+    Omega = Omega + eps * np.eye(Omega.shape[-1])
+    return posterior_bl(Sigma, tau=tau, delta=delta, w_mkt=w_mkt).posterior_batch(P, Q, Omega)
+
+
+@timed(con_resultado=True)
 def optimize_BL_target(mu, Sigma, r_target, P, Q, Omega, short=False):
     """
     Portafolio Black–Litterman con rendimiento objetivo
@@ -230,32 +736,18 @@ def optimize_BL_target(mu, Sigma, r_target, P, Q, Omega, short=False):
     Omega = Omega + eps * np.eye(Omega.shape[0])
 
     # --------------------------
-    # Retornos implícitos
+    # Black–Litterman (prior en caché, vistas por Cholesky)
     # --------------------------
-    pi = delta * Sigma @ w_mkt
-
-    # --------------------------
-    # Black–Litterman
-    # --------------------------
-    middle = np.linalg.inv(
-        np.linalg.inv(tau * Sigma) + P.T @ np.linalg.inv(Omega) @ P
-    )
-
-    mu_bl = middle @ (
-        np.linalg.inv(tau * Sigma) @ pi +
-        P.T @ np.linalg.inv(Omega) @ Q
-    )
+    mu_bl, _ = posterior_bl(Sigma, tau=tau, delta=delta, w_mkt=w_mkt).posterior(
+        P, Q, Omega, covarianza=False)
 
     # --------------------------
     # Optimización
     # --------------------------
     def obj(w):
-        return w.T @ Sigma @ w
+        return _var_y_grad(w, Sigma)
 
-    cons = [
-        {"type": "eq", "fun": lambda w: np.sum(w) - 1},
-        {"type": "eq", "fun": lambda w: w @ mu_bl - r_target},
-    ]
+    cons = _restricciones(n, mu_bl, r_target)
 
     bounds = tuple((0, 1) for _ in range(n)) if not short else None
 
@@ -263,8 +755,439 @@ def optimize_BL_target(mu, Sigma, r_target, P, Q, Omega, short=False):
         obj,
         w_mkt,
         method="SLSQP",
+        jac=True,
         bounds=bounds,
         constraints=cons
     )
 
-    return res.x, res
\ No newline at end of file
+    return res.x, res
+
+#############Frontera eficiente##############
+
+def _frontera_tramo(mu, Sigma, puntos, modo, short, engine, w_inicial=None):
+    """
+    Resuelve en orden una lista de puntos de la frontera, usando la solución
+    anterior como arranque en caliente. Regresa (pesos, exitos, iteraciones).
+    """
+    n = mu.shape[0]
+    pesos = np.full((len(puntos), n), np.nan)
+    exitos = np.zeros(len(puntos), dtype=bool)
+    iteraciones = np.zeros(len(puntos), dtype=int)
+
+    w_prev = w_inicial
+    for k, valor in enumerate(puntos):
+        if modo == "objetivo":
+            w, res = optimize_markowitz_target(
+                mu, Sigma, valor, short=short, engine=engine, w0=w_prev
+            )
+        else:
+            # max w'mu - (λ/2) w'Σw  <=>  min w'Σw - (2/λ) w'mu
+            c = -(2.0 / valor) * mu
+            if engine == "qp":
+                w, res = _resolver_qp(Sigma, np.ones((1, n)), np.array([1.0]), short,
+                                      w0=w_prev, c=c)
+            else:
+                bounds = tuple((0, 1) for _ in range(n)) if not short else None
+                res = op.minimize(
+                    lambda w: (w @ Sigma @ w + c @ w, 2.0 * Sigma @ w + c),
+                    np.ones(n) / n if w_prev is None else w_prev,
+                    method="SLSQP", jac=True, bounds=bounds, constraints=_restricciones(n),
+                )
+                w = res.x
+
+        pesos[k] = w
+        exitos[k] = bool(res.success)
+        iteraciones[k] = getattr(res, "nit", 0)
+        if res.success:
+            w_prev = w
+
+    return pesos, exitos, iteraciones
+
+
+def _frontera_tramo_args(args):
+    return _frontera_tramo(*args)
+
+
+@timed()
+def efficient_frontier(mu, Sigma, targets=None, n_puntos=50, aversiones=None,
+                       short=False, engine="qp", n_jobs=1):
+    """
+    Frontera eficiente de Markowitz resuelta con arranque en caliente.
+
+    Los puntos se resuelven en orden (rendimiento objetivo creciente o
+    aversión al riesgo decreciente) y cada uno arranca desde la solución del
+    anterior.
+
+    Parámetros
+    ----------
+    mu, Sigma : array-like
+        Rendimientos esperados y matriz de varianza-covarianza.
+    targets : array-like, opcional
+        Rendimientos objetivo. Por defecto `n_puntos` equiespaciados entre el
+        rendimiento de mínima varianza y max(mu).
+    aversiones : array-like, opcional
+        En lugar de objetivos, valores de aversión al riesgo λ > 0
+        (max w'mu - λ/2 w'Σw).
+    short : bool
+        Permitir ventas en corto.
+    engine : {"qp", "slsqp"}
+        Motor de optimización de cada punto.
+    n_jobs : int
+        Procesos para repartir la malla en tramos contiguos (1 = serial).
+
+    Regresa
+    -------
+    dict con:
+        "targets" (o "aversiones"): valores de la malla, en el orden dado
+        "weights": matriz (m × n) de pesos (NaN si el punto es infactible)
+        "returns", "vols": rendimiento y volatilidad de cada punto
+        "success": bool por punto
+        "r_min", "r_max": rango de rendimientos alcanzables en la frontera
+    """
+    mu, Sigma, n = _check_inputs(mu, Sigma)
+
+    # Extremo inferior: portafolio de mínima varianza
+    w_mv, res_mv = optimize_min_variance(mu, Sigma, short=short, engine=engine)
+    r_min = float(w_mv @ mu)
+    r_max = float(mu.max()) if not short else np.inf
+
+    if aversiones is not None:
+        modo = "aversion"
+        valores = np.asarray(aversiones, dtype=float).reshape(-1)
+        if np.any(valores <= 0):
+            raise ValueError("Las aversiones al riesgo deben ser positivas.")
+        factibles = np.ones(valores.size, dtype=bool)
+        # λ grande ≈ mínima varianza: se resuelve de mayor a menor
+        orden = np.argsort(-valores)
+    else:
+        modo = "objetivo"
+        if targets is None:
+            hi = r_max if np.isfinite(r_max) else r_min + 2 * (mu.max() - r_min)
+            targets = np.linspace(r_min, hi, n_puntos)
+        valores = np.asarray(targets, dtype=float).reshape(-1)
+        # Objetivos fuera de [r_min, r_max] se descartan sin resolver
+        tol = 1e-12 * max(1.0, abs(r_max) if np.isfinite(r_max) else abs(r_min))
+        factibles = (valores >= r_min - tol) & (valores <= r_max + tol)
+        valores_resolver = np.clip(valores, r_min, r_max)
+        orden = np.argsort(valores)
+
+    orden = orden[factibles[orden]]
+    puntos = (valores if modo == "aversion" else valores_resolver)[orden]
+
+    pesos = np.full((valores.size, n), np.nan)
+    exitos = np.zeros(valores.size, dtype=bool)
+    iteraciones = np.zeros(valores.size, dtype=int)
+
+    if puntos.size:
+        w_inicial = w_mv if res_mv.success else None
+        if n_jobs > 1 and puntos.size >= 2 * n_jobs:
+            from concurrent.futures import ProcessPoolExecutor
+
+            tramos = np.array_split(np.arange(puntos.size), n_jobs)
+            args = [(mu, Sigma, puntos[t], modo, short, engine, w_inicial) for t in tramos]
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                partes = list(pool.map(_frontera_tramo_args, args))
+            W = np.vstack([p[0] for p in partes])
+            ok = np.concatenate([p[1] for p in partes])
+            nit = np.concatenate([p[2] for p in partes])
+        else:
+            W, ok, nit = _frontera_tramo(mu, Sigma, puntos, modo, short, engine, w_inicial)
+
+        pesos[orden], exitos[orden], iteraciones[orden] = W, ok, nit
+
+    rets = pesos @ mu
+    vols = np.sqrt(((pesos @ Sigma) * pesos).sum(axis=1))
+
+    salida = {
+        "weights": pesos,
+        "returns": rets,
+        "vols": vols,
+        "success": exitos,
+        "nit": iteraciones,
+        "r_min": r_min,
+        "r_max": r_max,
+    }
+    salida["aversiones" if modo == "aversion" else "targets"] = valores
+    return salida
+
+
+#############Portafolios aleatorios##############
+
+def _muestrear_pesos(rng, c, n, alpha, lo, hi):
+    """
+    `c` vectores de pesos que suman 1. Sin límites son Dirichlet(alpha);
+    con límites [lo, hi] se reparte 1 - sum(lo) con pesos Dirichlet y el
+    exceso sobre `hi` se redistribuye en proporción a la holgura restante.
+    """
+    if alpha == 1.0:
+        G = rng.standard_exponential((c, n))
+    else:
+        G = rng.standard_gamma(alpha, (c, n))
+    D = G / G.sum(axis=1, keepdims=True)
+    if lo is None:
+        return D
+
+    W = lo + (1.0 - lo.sum()) * D
+    exceso = np.clip(W - hi, 0.0, None).sum(axis=1, keepdims=True)
+    if exceso.any():
+        np.minimum(W, hi, out=W)
+        holgura = hi - W
+        # La holgura total alcanza para el exceso porque sum(hi) >= 1
+        W += holgura / holgura.sum(axis=1, keepdims=True) * exceso
+    return W
+
+
+def portafolios_aleatorios(mu, Sigma, n_portafolios=100_000, alpha=1.0, limites=None,
+                           seed=0, max_bytes=16 * 1024 ** 2):
+    """
+    Generador de portafolios aleatorios factibles, por bloques.
+
+    Parámetros
+    ----------
+    mu, Sigma : array-like
+        Rendimientos esperados y matriz de varianza-covarianza (también
+        acepta CovarianzaFactorial).
+    n_portafolios : int
+        Total de portafolios a generar.
+    alpha : float
+        Concentración de la Dirichlet (1 = uniforme en el simplex; valores
+        menores dan portafolios más concentrados).
+    limites : tuple, opcional
+        (lo, hi) escalares o arrays (n,) con límites por activo. Por defecto
+        solo largos (pesos en el simplex).
+    seed : int
+        Semilla para reproducibilidad.
+    max_bytes : int
+        Memoria aproximada por bloque.
+
+    Genera
+    ------
+    (W, rets, vols) por bloque: pesos (c × n), rendimiento y volatilidad de
+    cada portafolio. Las volatilidades salen de ((W Σ) ∘ W) sumado por filas.
+    """
+    mu, Sigma, n = _check_inputs(mu, Sigma)
+
+    lo = hi = None
+    if limites is not None:
+        lo = np.broadcast_to(np.asarray(limites[0], dtype=float), (n,))
+        hi = np.broadcast_to(np.asarray(limites[1], dtype=float), (n,))
+        if np.any(lo > hi) or lo.sum() > 1.0 or hi.sum() < 1.0:
+            raise ValueError("Límites infactibles: se requiere lo <= hi y sum(lo) <= 1 <= sum(hi).")
+
+    rng = np.random.default_rng(seed)
+    c = max(1, int(max_bytes // (8 * 4 * n)))
+    for i in range(0, n_portafolios, c):
+        W = _muestrear_pesos(rng, min(c, n_portafolios - i), n, alpha, lo, hi)
+        rets = W @ mu
+        vols = np.sqrt(((W @ Sigma) * W).sum(axis=1))
+        yield W, rets, vols
+
+
+@timed()
+def nube_portafolios(mu, Sigma, n_portafolios=100_000, alpha=1.0, limites=None, rf=0.0,
+                     seed=0, guardar_pesos=False):
+    """
+    Nube de portafolios aleatorios para el diagrama riesgo/rendimiento.
+
+    Junta los bloques de portafolios_aleatorios. Regresa un dict con
+    "returns", "vols" y "sharpe" ((r - rf) / vol) y, si `guardar_pesos`,
+    también "weights" (n_portafolios × n).
+    """
+    partes = list(portafolios_aleatorios(mu, Sigma, n_portafolios=n_portafolios,
+                                         alpha=alpha, limites=limites, seed=seed))
+    rets = np.concatenate([p[1] for p in partes])
+    vols = np.concatenate([p[2] for p in partes])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = (rets - rf) / vols
+
+    salida = {"returns": rets, "vols": vols, "sharpe": sharpe}
+    if guardar_pesos:
+        salida["weights"] = np.vstack([p[0] for p in partes])
+    return salida
+
+
+#############Optimización por lotes##############
+
+_METODOS = {
+    "min_variance": "optimize_min_variance",
+    "max_sharpe": "optimize_max_sharpe",
+    "markowitz_target": "optimize_markowitz_target",
+    "BL_target": "optimize_BL_target",
+}
+
+METODOS = tuple(_METODOS)
+
+
+def optimizador(metodo):
+    """
+    Función optimize_* correspondiente al nombre `metodo` (uno de METODOS).
+    Lanza ValueError si el método no existe.
+    """
+    if metodo not in _METODOS:
+        raise ValueError(f"Método desconocido: {metodo}")
+    return globals()[_METODOS[metodo]]
+
+
+def _resolver_problema(metodo, mu, Sigma, params):
+    """Resuelve un problema y regresa (pesos, diagnósticos)."""
+    func = optimizador(metodo)
+    t0 = time.perf_counter()
+    try:
+        w, res = func(mu, Sigma, **params)
+    except Exception as e:
+        n = np.asarray(mu).reshape(-1).shape[0]
+        return np.full(n, np.nan), {
+            "success": False, "message": f"{type(e).__name__}: {e}",
+            "nit": 0, "nfev": 0, "fun": np.nan, "tiempo_s": time.perf_counter() - t0,
+        }
+
+    return np.asarray(w, dtype=float), {
+        "success": bool(res.success),
+        "message": str(getattr(res, "message", "")),
+        "nit": int(getattr(res, "nit", 0) or 0),
+        "nfev": int(getattr(res, "nfev", 0) or 0),
+        "fun": float(res.fun) if getattr(res, "fun", None) is not None else np.nan,
+        "tiempo_s": time.perf_counter() - t0,
+    }
+
+
+def _resolver_tramo_compartido(args):
+    """
+    Trabajador del pool: se conecta a los bloques de memoria compartida con
+    las matrices Σ y resuelve los problemas de su tramo. Las Σ factoriales
+    llegan tal cual en la tarea (en lugar de la llave del bloque).
+    """
+    from multiprocessing import shared_memory
+
+    bloques, tareas = args
+    abiertos, vistas = [], {}
+    try:
+        for nombre_shm, forma in bloques:
+            try:
+                shm = shared_memory.SharedMemory(name=nombre_shm, track=False)
+            except TypeError:
+                # Python < 3.13 no tiene track=
+                shm = shared_memory.SharedMemory(name=nombre_shm)
+            abiertos.append(shm)
+            vistas[nombre_shm] = np.ndarray(forma, dtype=np.float64, buffer=shm.buf)
+
+        # Cada Σ se copia una vez por tramo: los solvers (y cachés como el de
+        # posterior_bl) no deben quedarse con vistas de un bloque que se cierra
+        copias = {}
+        salida = []
+        for idx, metodo, mu, fuente, params in tareas:
+            if isinstance(fuente, sfl.CovarianzaFactorial):
+                Sigma = fuente
+            else:
+                if fuente not in copias:
+                    nombre_shm, k = fuente
+                    copias[fuente] = vistas[nombre_shm][k].copy()
+                Sigma = copias[fuente]
+            w, diag = _resolver_problema(metodo, mu, Sigma, params)
+            salida.append((idx, w, diag))
+        return salida
+    finally:
+        vistas.clear()
+        for shm in abiertos:
+            shm.close()
+
+
+def optimize_batch(problemas, n_jobs=None, min_paralelo=32):
+    """
+    Resuelve muchos problemas de optimización en paralelo.
+
+    Parámetros
+    ----------
+    problemas : list[dict]
+        Cada problema es un dict con:
+            "metodo": "min_variance" | "max_sharpe" | "markowitz_target" | "BL_target"
+            "mu", "Sigma": momentos del problema
+        y el resto de llaves se pasan como argumentos al optimize_* respectivo
+        (rf, r_target, short, engine, P, Q, Omega, w0...).
+    n_jobs : int, opcional
+        Procesos del pool; por defecto os.cpu_count().
+    min_paralelo : int
+        Con menos problemas que esto (o n_jobs = 1) se resuelve en serie.
+
+    Las matrices Σ se copian una sola vez a memoria compartida (agrupadas por
+    dimensión; una misma Σ usada en varios problemas se copia una vez) y los
+    procesos las leen sin recibir copias serializadas. Las Σ factoriales
+    (sfl.CovarianzaFactorial) no se densifican: sus factores B, F, D son
+    O(n·k) y viajan serializados con cada tarea.
+
+    Regresa
+    -------
+    pesos : list[np.ndarray]
+        Pesos de cada problema, en el orden original (NaN si falló).
+    diagnosticos : list[dict]
+        success, message, nit, nfev, fun y tiempo_s de cada problema.
+    """
+    problemas = list(problemas)
+    m = len(problemas)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+
+    preparados = []
+    for p in problemas:
+        p = dict(p)
+        metodo = p.pop("metodo")
+        if metodo not in _METODOS:
+            raise ValueError(f"Método desconocido: {metodo}")
+        mu = np.asarray(p.pop("mu"), dtype=float).reshape(-1)
+        preparados.append((metodo, mu, p.pop("Sigma"), p))
+
+    if m < min_paralelo or n_jobs <= 1:
+        salida = [_resolver_problema(metodo, mu, Sigma, params)
+                  for metodo, mu, Sigma, params in preparados]
+        return [s[0] for s in salida], [s[1] for s in salida]
+
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    # Matrices únicas agrupadas por dimensión
+    grupos = {}      # n -> lista de matrices
+    ubicacion = {}   # id(Sigma) -> (n, posición)
+    for _, _, Sigma, _ in preparados:
+        if id(Sigma) in ubicacion or isinstance(Sigma, sfl.CovarianzaFactorial):
+            continue
+        arr = np.asarray(Sigma, dtype=np.float64)
+        lista = grupos.setdefault(arr.shape[0], [])
+        ubicacion[id(Sigma)] = (arr.shape[0], len(lista))
+        lista.append(arr)
+
+    bloques = {}
+    try:
+        for n, lista in grupos.items():
+            forma = (len(lista), n, n)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(forma)) * 8))
+            bloques[n] = (shm, forma)
+            destino = np.ndarray(forma, dtype=np.float64, buffer=shm.buf)
+            for k, arr in enumerate(lista):
+                destino[k] = arr
+            del destino
+
+        tareas = []
+        for idx, (metodo, mu, Sigma, params) in enumerate(preparados):
+            if isinstance(Sigma, sfl.CovarianzaFactorial):
+                fuente = Sigma
+            else:
+                n, k = ubicacion[id(Sigma)]
+                fuente = (bloques[n][0].name, k)
+            tareas.append((idx, metodo, mu, fuente, params))
+
+        info_bloques = [(shm.name, forma) for shm, forma in bloques.values()]
+        n_tramos = min(m, n_jobs * 4)
+        tramos = [tareas[i::n_tramos] for i in range(n_tramos)]
+
+        pesos, diagnosticos = [None] * m, [None] * m
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            for salida in pool.map(_resolver_tramo_compartido,
+                                   [(info_bloques, t) for t in tramos]):
+                for idx, w, diag in salida:
+                    pesos[idx], diagnosticos[idx] = w, diag
+    finally:
+        for shm, _ in bloques.values():
+            shm.close()
+            shm.unlink()
+
+    return pesos, diagnosticos
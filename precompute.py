@@ -0,0 +1,192 @@
+"""
+Precálculo en segundo plano de los universos de la app.
+
+Un hilo revisa periódicamente la huella de los datos de cada universo
+(sf_library.huella_datos) y, cuando cambia, recalcula el panel alineado, los
+momentos y los portafolios estándar: mínima varianza, máximo Sharpe con
+rf = 0 y una frontera eficiente por defecto. Las sesiones consultan los
+resultados con `obtener`, que nunca bloquea: si algo aún no está listo (o
+corresponde a datos viejos) regresa None y la app calcula por su cuenta.
+
+Uso:
+    p = Precalculador({"Regiones": sfl.TICKERS_REGIONES,
+                       "Sectores": sfl.TICKERS_SECTORES})
+    p.iniciar()
+    listo = p.obtener(sfl.TICKERS_REGIONES, sfl.huella_datos(sfl.TICKERS_REGIONES))
+"""
+
+import logging
+import threading
+from datetime import datetime
+
+import sf_library as sfl
+from instrumentation import timer
+
+logger = logging.getLogger(__name__)
+
+UNIVERSOS = {
+    "Regiones": sfl.TICKERS_REGIONES,
+    "Sectores": sfl.TICKERS_SECTORES,
+}
+
+
+def precalcular_universo(tickers, data_dir="MarketData", anualizar=252, n_puntos=30):
+    """
+    Panel, momentos y portafolios estándar de un universo.
+
+    mu y Σ se anualizan con `anualizar` antes de optimizar (igual que la app).
+    Las métricas se calculan con rf = 0 sobre los rendimientos diarios.
+
+    Retorna
+    -------
+    dict con "momentos" (df, mu, Sigma, corr de obtener_momentos_desde_csv),
+    "min_variance" y "max_sharpe" ((w, exito, metricas) cada uno) y
+    "frontera" (salida de efficient_frontier).
+    """
+    import optimization as opt
+
+    df, mu, Sigma, corr = sfl.obtener_momentos_desde_csv(list(tickers), data_dir=data_dir)
+    returns = df.drop(columns="date")
+    mu_vals = mu.values * anualizar
+    Sigma_vals = Sigma.values * anualizar
+
+    portafolios = {}
+    for nombre, func in (("min_variance", opt.optimize_min_variance),
+                         ("max_sharpe", opt.optimize_max_sharpe)):
+        w, res = func(mu_vals, Sigma_vals, short=False)
+        metricas = sfl.compute_portfolio_metrics(returns, w, rf=0.0)
+        portafolios[nombre] = (w, bool(res.success), metricas)
+
+    frontera = opt.efficient_frontier(mu_vals, Sigma_vals, n_puntos=n_puntos)
+
+    return {"momentos": (df, mu, Sigma, corr), "frontera": frontera, **portafolios}
+
+
+class Precalculador:
+    """
+    Hilo de fondo que mantiene precalculados los universos.
+
+    Parámetros
+    ----------
+    universos : dict[str, list[str]], opcional
+        Nombre → tickers. Por defecto Regiones y Sectores.
+    data_dir : str
+        Carpeta de datos.
+    intervalo : float
+        Segundos entre revisiones de la huella de los datos.
+    n_puntos : int
+        Puntos de la frontera eficiente por defecto.
+    """
+
+    def __init__(self, universos=None, data_dir="MarketData", intervalo=60.0, n_puntos=30):
+        self.universos = {k: tuple(v) for k, v in (universos or UNIVERSOS).items()}
+        self.data_dir = data_dir
+        self.intervalo = intervalo
+        self.n_puntos = n_puntos
+
+        self._lock = threading.Lock()
+        self._resultados = {}     # nombre -> {"huella", "tickers", "calculado", ...}
+        self._errores = {}
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    # -------------------- ciclo de fondo --------------------
+
+    def iniciar(self):
+        """Arranca el hilo (una sola vez); regresa self."""
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._detener.clear()
+                self._hilo = threading.Thread(target=self._ciclo, name="precalculador",
+                                              daemon=True)
+                self._hilo.start()
+        return self
+
+    def detener(self, timeout=None):
+        """Pide al hilo que termine y espera hasta `timeout` segundos."""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def refrescar(self, forzar=False):
+        """
+        Pide una revisión inmediata (p. ej. justo después de descargar).
+
+        Solo se recalculan los universos cuya huella cambió; con `forzar`
+        se descartan los resultados actuales y se recalculan todos.
+        """
+        if forzar:
+            with self._lock:
+                self._resultados.clear()
+        self._despertar.set()
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            self.actualizar()
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def actualizar(self):
+        """
+        Recalcula los universos cuya huella cambió. Regresa los nombres
+        recalculados. Se puede llamar directamente (sin hilo).
+        """
+        recalculados = []
+        for nombre, tickers in self.universos.items():
+            if self._detener.is_set():
+                break
+            huella = sfl.huella_datos(tickers, data_dir=self.data_dir)
+            with self._lock:
+                actual = self._resultados.get(nombre)
+            if actual is not None and actual["huella"] == huella:
+                continue
+
+            try:
+                with timer(f"precalculo.{nombre}"):
+                    resultado = precalcular_universo(tickers, data_dir=self.data_dir,
+                                                     n_puntos=self.n_puntos)
+            except Exception as e:
+                logger.warning("No se pudo precalcular %s: %s", nombre, e)
+                with self._lock:
+                    self._errores[nombre] = f"{type(e).__name__}: {e}"
+                continue
+
+            resultado.update(huella=huella, tickers=tickers, calculado=datetime.now())
+            with self._lock:
+                self._resultados[nombre] = resultado
+                self._errores.pop(nombre, None)
+            recalculados.append(nombre)
+        return recalculados
+
+    # -------------------- consulta desde las sesiones --------------------
+
+    def obtener(self, tickers, huella=None):
+        """
+        Resultado precalculado del universo con esos `tickers`, o None si no
+        está listo. Si se da `huella`, solo se regresa si coincide (datos
+        actuales); si no coincide se pide una revisión al hilo.
+        """
+        tickers = tuple(tickers)
+        with self._lock:
+            resultado = next(
+                (r for r in self._resultados.values() if r["tickers"] == tickers), None
+            )
+        if resultado is None:
+            return None
+        if huella is not None and resultado["huella"] != huella:
+            self.refrescar()
+            return None
+        return resultado
+
+    def estado(self):
+        """{nombre: "listo HH:MM:SS" | "pendiente" | mensaje de error}."""
+        with self._lock:
+            estado = {}
+            for nombre in self.universos:
+                if nombre in self._resultados:
+                    estado[nombre] = f"listo {self._resultados[nombre]['calculado']:%H:%M:%S}"
+                else:
+                    estado[nombre] = self._errores.get(nombre, "pendiente")
+        return estado
@@ -0,0 +1,130 @@
+"""
+Análisis exploratorio del universo de ETFs desde la línea de comandos.
+
+Descarga (o actualiza) los precios, sincroniza los rendimientos hasta una
+fecha de corte y exporta el mapa de calor de correlaciones a un archivo.
+Reemplaza el script que antes corría al importar optimization.py.
+
+Uso:
+    python research.py --descargar --heatmap correlaciones.png
+    python research.py --incremental --universo sectores --corte 2019-01-01
+"""
+
+import argparse
+import logging
+
+import sf_library as sfl
+
+logger = logging.getLogger(__name__)
+
+sectores = [
+    'XLK',  # Tecnología
+    'XLF',  # Finanzas
+    'XLV',  # Salud
+    'XLP',  # Consumo básico
+    'XLY',  # Consumo discrecional
+    'XLE',  # Energía
+    'XLI',  # Industrial
+    'XLC',  # Comunicaciones
+    'XLB',  # Materiales
+    'XLU',  # Servicios públicos
+    'XLRE', # Bienes raíces
+]
+
+Regiones = [
+    'EWJ',  # Japón
+    'SPLG',  # Global
+    'EEM',  # Mercados emergentes
+    'IEUR',  # Europa
+    'EWC',  # Canadá
+]
+
+UNIVERSOS = {
+    "sectores": sectores,
+    "regiones": Regiones,
+    "todos": sectores + Regiones,
+}
+
+
+def cargar_rendimientos(tickers, data_dir="MarketData", inicio=None, corte=None):
+    """
+    Rendimientos sincronizados (merge inner) y sus matrices.
+
+    `corte` es exclusivo: solo se conservan las fechas anteriores a él.
+
+    Retorna (df, mtx_var_covar, mtx_correl) como sync_timeseries.
+    """
+    df, _, _ = sfl.sync_timeseries(tickers, data_dir=data_dir, start=inicio)
+    if corte is not None:
+        df = df[df["date"] < corte].reset_index(drop=True)
+
+    returns_only = df.drop(columns="date")
+    mtx_var_covar = returns_only.cov().values
+    mtx_correl = returns_only.corr().values
+    return df, mtx_var_covar, mtx_correl
+
+
+def exportar_heatmap(mtx_correl, tickers, ruta, titulo="Matriz de Correlaciones de Tickers"):
+    """Guarda el mapa de calor de correlaciones en `ruta` (png, pdf, svg...)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig, ax = plt.subplots(figsize=(18, 16))
+    sns.heatmap(
+        mtx_correl,
+        annot=True,        # imprime el valor de correlación en cada celda
+        fmt=".2f",         # 2 decimales
+        cmap="coolwarm",
+        vmin=0, vmax=1,
+        xticklabels=tickers, yticklabels=tickers,
+        ax=ax,
+    )
+    ax.set_title(titulo)
+    fig.tight_layout()
+    fig.savefig(ruta)
+    plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis exploratorio del universo de ETFs.")
+    parser.add_argument("--universo", choices=sorted(UNIVERSOS), default="todos")
+    parser.add_argument("--tickers", nargs="+", help="Lista explícita (reemplaza --universo).")
+    parser.add_argument("--data-dir", default="MarketData")
+    parser.add_argument("--descargar", action="store_true",
+                        help="Descarga el histórico completo antes de analizar.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Solo descarga las fechas nuevas de cada ticker.")
+    parser.add_argument("--inicio", default=None, help="Primera fecha de rendimientos.")
+    parser.add_argument("--corte", default="2019-01-01",
+                        help="Fecha de corte (exclusiva); 'ninguno' para usar todo.")
+    parser.add_argument("--heatmap", default=None, metavar="RUTA",
+                        help="Archivo donde exportar el mapa de calor de correlaciones.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    tickers = args.tickers or UNIVERSOS[args.universo]
+    corte = None if args.corte.lower() == "ninguno" else args.corte
+
+    if args.descargar or args.incremental:
+        errores = sfl.descargar_tickers(tickers, carpeta=args.data_dir,
+                                        incremental=args.incremental)
+        for tic, msg in errores.items():
+            print(f"Error descargando {tic}: {msg}")
+
+    df, _, mtx_correl = cargar_rendimientos(tickers, data_dir=args.data_dir,
+                                            inicio=args.inicio, corte=corte)
+    if df.empty:
+        raise SystemExit("No hay rendimientos en el rango pedido.")
+    print(f"{len(df)} días entre {df['date'].iloc[0]:%Y-%m-%d} y {df['date'].iloc[-1]:%Y-%m-%d}")
+    print(df.head())
+
+    if args.heatmap:
+        exportar_heatmap(mtx_correl, tickers, args.heatmap)
+        print(f"Mapa de calor guardado en {args.heatmap}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,347 @@
-import yfinance as yf
 import pandas as pd
 import os
+import json
+import hashlib
+import logging
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 import numpy as np
 
+from data_providers import descargar_concurrente
+from instrumentation import contar, timed, timer
+
+logger = logging.getLogger(__name__)
+
 TICKERS_REGIONES = ["SPLG", "EWC", "IEUR", "EEM", "EWJ"]
 TICKERS_SECTORES = ["XLC", "XLY", "XLP", "XLE", "XLF","XLV", "XLI", "XLB", "XLRE", "XLK", "XLU"]
 
-def descargar_tickers(tickers, carpeta='MarketData', start='2000-01-01', end=None):
+# ===================== ALMACÉN COLUMNAR DE PRECIOS =====================
+#
+# Todos los cierres viven en un solo panel binario. Cada escritura crea una
+# versión nueva <carpeta>/panel/v<ns>/ con:
+#   - close.npy  : matriz float64 de forma (n_tickers, n_fechas); cada ticker
+#                  ocupa una fila contigua, así que leer un subconjunto de
+#                  tickers solo toca esas filas del archivo.
+#   - dates.npy  : vector datetime64[ns] con la unión de fechas (ordenada).
+#   - index.json : lista de tickers en el orden de las filas de close.npy.
+# y luego reemplaza atómicamente <carpeta>/panel/actual.json, que apunta a la
+# versión vigente. Un lector resuelve el apuntador una vez y lee los tres
+# archivos de la misma versión, así que nunca mezcla escrituras distintas.
+# Las fechas en que un ticker no cotiza quedan como NaN.
+#
+# Los paneles anteriores (los tres archivos directo en <carpeta>/panel) se
+# siguen leyendo mientras no exista actual.json.
+
+PANEL_SUBDIR = "panel"
+PANEL_ACTUAL = "actual.json"
+
+
+def _rutas_panel(carpeta, version=None):
+    """
+    Rutas de los tres archivos que forman el panel de precios, para la
+    versión `version` o (por defecto) la vigente según actual.json.
     """
-    Descarga datos históricos de una lista de tickers usando yfinance
-    y guarda un archivo CSV por cada ticker que tenga datos.
+    base = os.path.join(os.getcwd(), carpeta, PANEL_SUBDIR)
+    apuntador = os.path.join(base, PANEL_ACTUAL)
+    if version is None:
+        try:
+            with open(apuntador, encoding="utf-8") as f:
+                version = json.load(f)["version"]
+        except (FileNotFoundError, ValueError, KeyError):
+            version = None
+    directorio = base if version is None else os.path.join(base, version)
+    return {
+        "base": base,
+        "actual": apuntador,
+        "version": version,
+        "precios": os.path.join(directorio, "close.npy"),
+        "fechas": os.path.join(directorio, "dates.npy"),
+        "indice": os.path.join(directorio, "index.json"),
+    }
+
+
+def _existe_version(rutas):
+    return all(os.path.exists(rutas[k]) for k in ("precios", "fechas", "indice"))
+
+
+def _leer_indice(rutas):
+    with open(rutas["indice"], encoding="utf-8") as f:
+        return json.load(f)["tickers"]
+
+
+def existe_panel(carpeta="MarketData"):
+    """Indica si la carpeta ya tiene un panel columnar de precios."""
+    return _existe_version(_rutas_panel(carpeta))
+
+
+def tickers_en_panel(carpeta="MarketData"):
+    """Lista de tickers guardados en el panel (vacía si no existe)."""
+    rutas = _rutas_panel(carpeta)
+    if not _existe_version(rutas):
+        return []
+    return _leer_indice(rutas)
+
+
+def guardar_panel(precios, carpeta="MarketData"):
+    """
+    Escribe un panel de cierres en formato columnar binario.
+
+    Parámetros
+    ----------
+    precios : pd.DataFrame
+        Índice de fechas y una columna de cierres por ticker.
+    carpeta : str, opcional
+        Carpeta de datos. El panel se guarda en <carpeta>/panel.
+    """
+    anterior = _rutas_panel(carpeta)
+    version = f"v{time.time_ns()}_{os.getpid()}"
+    rutas = _rutas_panel(carpeta, version=version)
+    os.makedirs(os.path.dirname(rutas["precios"]))
+
+    precios = precios.sort_index()
+    fechas = pd.DatetimeIndex(precios.index).values.astype("datetime64[ns]")
+    # (n_tickers, n_fechas) en orden C: una fila contigua por ticker
+    matriz = np.ascontiguousarray(precios.to_numpy(dtype=float).T)
+    tickers = [str(c) for c in precios.columns]
+
+    # La versión nueva se escribe completa en su propio directorio; el panel
+    # solo cambia con el os.replace del apuntador, que es atómico
+    for clave, arr in (("precios", matriz), ("fechas", fechas)):
+        with open(rutas[clave], "wb") as f:
+            np.save(f, arr)
+    with open(rutas["indice"], "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "tickers": tickers}, f)
+
+    tmp = f"{rutas['actual']}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": version}, f)
+    os.replace(tmp, rutas["actual"])
+
+    _podar_versiones(rutas["base"], conservar={version, anterior["version"]})
+
+
+def _podar_versiones(base, conservar):
+    """
+    Borra las versiones del panel que no están en `conservar` (la vigente y
+    la anterior, que un lector concurrente puede estar leyendo) y los
+    archivos del formato sin versiones.
+    """
+    for nombre in os.listdir(base):
+        ruta = os.path.join(base, nombre)
+        if nombre.startswith("v") and os.path.isdir(ruta) and nombre not in conservar:
+            shutil.rmtree(ruta, ignore_errors=True)
+        elif None not in conservar and nombre in ("close.npy", "dates.npy", "index.json"):
+            os.remove(ruta)
+
+
+def leer_panel(tickers=None, carpeta="MarketData"):
+    """
+    Lee el panel de cierres sin pasar por pandas.
+
+    Parámetros
+    ----------
+    tickers : list[str], opcional
+        Subconjunto de tickers a leer. Si es None se regresa el panel completo
+        como vista del archivo mapeado en memoria (sin copia).
+    carpeta : str, opcional
+        Carpeta de datos.
+
+    Retorna
+    -------
+    fechas : np.ndarray
+        Vector datetime64[ns] de longitud T.
+    precios : np.ndarray
+        Matriz (T × n) de cierres; NaN donde el ticker no cotiza.
+    tickers : list[str]
+        Tickers en el orden de las columnas de `precios`.
+    """
+    # Una escritura concurrente puede borrar la versión resuelta entre el
+    # apuntador y la lectura; en ese caso se resuelve de nuevo
+    for intento in range(3):
+        rutas = _rutas_panel(carpeta)
+        try:
+            indice = _leer_indice(rutas)
+            fechas = np.load(rutas["fechas"], mmap_mode="r")
+            matriz = np.load(rutas["precios"], mmap_mode="r")
+            break
+        except FileNotFoundError:
+            if intento == 2:
+                raise
+
+    if matriz.shape != (len(indice), len(fechas)):
+        raise ValueError(
+            f"Panel inconsistente en {carpeta}: close.npy tiene forma {matriz.shape} "
+            f"pero hay {len(indice)} tickers y {len(fechas)} fechas."
+        )
+
+    if tickers is None:
+        return fechas, matriz.T, list(indice)
+
+    posicion = {t: i for i, t in enumerate(indice)}
+    faltantes = [t for t in tickers if t not in posicion]
+    if faltantes:
+        raise KeyError(f"Tickers no encontrados en el panel: {faltantes}")
+
+    # Solo se leen las filas (tickers) pedidas
+    filas = [posicion[t] for t in tickers]
+    return fechas, matriz[filas].T, list(tickers)
+
+
+def cargar_panel(tickers=None, carpeta="MarketData"):
+    """
+    Carga el panel de cierres como DataFrame (fechas × tickers).
+
+    Con `tickers=None` el DataFrame envuelve directamente el archivo mapeado
+    en memoria, por lo que es de solo lectura.
+    """
+    fechas, precios, cols = leer_panel(tickers, carpeta=carpeta)
+    return pd.DataFrame(
+        precios,
+        index=pd.DatetimeIndex(fechas, name="Date"),
+        columns=cols,
+        copy=False,
+    )
+
+
+def ultimas_fechas(carpeta="MarketData"):
+    """
+    Última fecha con precio guardada para cada ticker del panel.
+
+    Retorna
+    -------
+    dict[str, pd.Timestamp]
+    """
+    return {tic: fecha for tic, (fecha, _) in _ultimos_cierres(carpeta).items()}
+
+
+def _ultimos_cierres(carpeta="MarketData"):
+    """{ticker: (última fecha con precio, cierre guardado en esa fecha)}."""
+    if not existe_panel(carpeta):
+        return {}
+
+    fechas, precios, tickers = leer_panel(carpeta=carpeta)
+    ultimos = {}
+    for j, tic in enumerate(tickers):
+        validos = np.flatnonzero(~np.isnan(precios[:, j]))
+        if validos.size:
+            ultimos[tic] = (pd.Timestamp(fechas[validos[-1]]), float(precios[validos[-1], j]))
+    return ultimos
+
+
+def _actualizar_panel(series, carpeta="MarketData", anexar=False, escalas=None):
+    """
+    Inserta/reemplaza series de cierres en el panel existente.
+
+    series : dict[str, pd.Series] con índice de fechas.
+    anexar : si es True, las series nuevas se agregan al histórico guardado
+             de cada ticker; en fechas repetidas gana el dato nuevo.
+    escalas : dict[str, float], opcional. Al anexar, el histórico guardado
+              de esos tickers se multiplica por el factor (p. ej. cuando el
+              cierre ajustado cambió de base por un dividendo).
+    """
+    escalas = escalas or {}
+    if existe_panel(carpeta):
+        panel = cargar_panel(carpeta=carpeta).copy()
+    else:
+        panel = pd.DataFrame(dtype=float)
+
+    if anexar:
+        combinadas = {}
+        for tic, nueva in series.items():
+            if tic in panel.columns:
+                guardada = panel[tic].dropna() * escalas.get(tic, 1.0)
+                nueva = pd.concat([guardada, nueva])
+                nueva = nueva[~nueva.index.duplicated(keep="last")].sort_index()
+            combinadas[tic] = nueva
+        series = combinadas
+
+    # Los tickers existentes conservan su posición; los nuevos van al final
+    nuevas = pd.DataFrame(series)
+    fechas = panel.index.union(nuevas.index) if len(panel.columns) else nuevas.index
+    panel = panel.reindex(fechas)
+    for tic in nuevas.columns:
+        panel[tic] = nuevas[tic].reindex(fechas)
+
+    # Fechas sin ningún precio no aportan nada
+    panel = panel.dropna(how="all")
+    guardar_panel(panel, carpeta=carpeta)
+
+    # Los momentos memoizados de esta carpeta ya no corresponden a los datos
+    limpiar_cache(carpeta)
+
+
+def migrar_csv_a_panel(carpeta="MarketData", tickers=None):
+    """
+    Migración única: convierte los CSV por ticker (<carpeta>/<TICKER>.csv)
+    al panel columnar. Los CSV originales no se borran.
+
+    Parámetros
+    ----------
+    carpeta : str, opcional
+        Carpeta que contiene los CSV.
+    tickers : list[str], opcional
+        Tickers a migrar. Por defecto todos los CSV de la carpeta.
+
+    Retorna
+    -------
+    list[str]
+        Tickers migrados.
+    """
+    ruta = os.path.join(os.getcwd(), carpeta)
+    if tickers is None:
+        tickers = sorted(
+            os.path.splitext(f)[0] for f in os.listdir(ruta) if f.endswith(".csv")
+        )
+
+    series = {}
+    for tic in tickers:
+        df = _leer_csv(tic, carpeta)
+        df["close"] = pd.to_numeric(df["close"], errors="coerce")
+        series[tic] = df.dropna(subset=["close"]).set_index("date")["close"]
+
+    if series:
+        _actualizar_panel(series, carpeta=carpeta)
+
+    return list(series)
+
+
+def descargar_tickers(tickers, carpeta='MarketData', start='2000-01-01', end=None,
+                      incremental=False, fuente=None, tam_lote=8, max_workers=4,
+                      reintentos=2, tol_ajuste=1e-6):
+    """
+    Descarga datos históricos de una lista de tickers (por defecto con yfinance)
+    y los guarda en el panel columnar de precios (<carpeta>/panel).
+
+    Las descargas se hacen por lotes de varios tickers en un pool de hilos
+    (ver data_providers.descargar_concurrente).
 
     Parámetros:
     - tickers: lista de símbolos (ej. ['AAPL', 'MSFT', '^GSPC'])
-    - carpeta: carpeta donde se guardarán los CSV
+    - carpeta: carpeta donde se guardará el panel
     - start: fecha de inicio (YYYY-MM-DD)
     - end: fecha de fin (YYYY-MM-DD, opcional)
+    - incremental: si es True, para cada ticker ya guardado solo se pide el
+      rango desde su última fecha hasta `end` y se anexa al histórico
+      (las filas traslapadas se reemplazan por las nuevas). El cierre del
+      día traslapado se compara con el guardado: si difiere más que
+      `tol_ajuste` (relativo), el Close ajustado cambió de base (dividendo
+      o split) y todo el histórico guardado se re-escala por ese factor; si
+      el día traslapado no llegó, se descarga el histórico completo.
+    - fuente: proveedor de datos (data_providers.DataProvider) o función
+      fuente(ticker, start, end) -> DataFrame con índice de fechas y columna
+      'Close' (mismo formato que yf.download). Por defecto yfinance; permite
+      probar sin red con una fuente falsa o con data_providers.LocalProvider.
+    - tam_lote: tickers por llamada al proveedor
+    - max_workers: llamadas simultáneas al proveedor
+    - reintentos: reintentos por lote ante fallos
+    - tol_ajuste: tolerancia relativa para detectar un cambio de base
+
+    Regresa:
+    - dict {ticker: mensaje} con los tickers que no se pudieron descargar
     """
     # Si no se especifica fecha final, usa la fecha actual
     if end is None:
@@ -25,39 +350,100 @@ def descargar_tickers(tickers, carpeta='MarketData', start='2000-01-01', end=Non
     # Crear carpeta si no existe
     os.makedirs(carpeta, exist_ok=True)
 
-    for tic in tickers:
-        print(f"Descargando datos de {tic}...")
-        try:
-            data = yf.download(tic, start=start, end=end, progress=False)
+    starts, guardados = {}, {}
+    if incremental:
+        guardados = _ultimos_cierres(carpeta)
+        pendientes = []
+        for tic in tickers:
+            if tic in guardados:
+                # Se vuelve a pedir la última fecha guardada para detectar
+                # cambios de base del cierre ajustado; el traslape se
+                # elimina al anexar
+                ultima = guardados[tic][0]
+                if ultima >= pd.Timestamp(end):
+                    logger.info("%s ya está actualizado.", tic)
+                    continue
+                starts[tic] = ultima.strftime('%Y-%m-%d')
+            pendientes.append(tic)
+        tickers = pendientes
 
-            # Si no hay datos, saltar
-            if data.empty:
-                print(f"⚠️ No se encontraron datos para {tic}, se omite.")
-                continue
+    series, errores = descargar_concurrente(
+        tickers, proveedor=fuente, start=start, end=end, starts=starts,
+        tam_lote=tam_lote, max_workers=max_workers, reintentos=reintentos,
+    )
 
-            # Dejar solo las columnas necesarias
-            df = data.reset_index()[['Date', 'Close']]
+    escalas, completos = {}, []
+    for tic in starts:
+        if tic not in series:
+            continue
+        ultima, previo = guardados[tic]
+        if ultima not in series[tic].index:
+            completos.append(tic)
+            continue
+        factor = float(series[tic][ultima]) / previo
+        if abs(factor - 1.0) > tol_ajuste:
+            logger.info("%s: el cierre ajustado cambió de base (factor %.6f); "
+                        "se re-escala el histórico guardado.", tic, factor)
+            escalas[tic] = factor
 
-            # Guardar archivo CSV
-            ruta = os.path.join(carpeta, f"{tic}.csv")
-            df.to_csv(ruta, index=False)
+    if completos:
+        # Sin el día traslapado no se puede medir el factor: histórico completo
+        logger.info("Sin traslape para %s; se descarga el histórico completo.", completos)
+        historicos, errores_hist = descargar_concurrente(
+            completos, proveedor=fuente, start=start, end=end,
+            tam_lote=tam_lote, max_workers=max_workers, reintentos=reintentos,
+        )
+        for tic in completos:
+            if tic in historicos:
+                series[tic] = historicos[tic]
+            else:
+                series.pop(tic)
+                errores[tic] = errores_hist.get(tic, "sin datos")
+
+    # Una sola escritura del panel para todos los tickers descargados. Los
+    # históricos completos reemplazan lo guardado al anexar (gana lo nuevo)
+    if series:
+        _actualizar_panel(series, carpeta=carpeta, anexar=incremental, escalas=escalas)
+
+    return errores
+
+
+def _leer_csv(ticker, data_dir="MarketData"):
+    """Lee <data_dir>/<ticker>.csv y regresa columnas ['date', 'close']."""
+    # Ruta del archivo
+    file_path = os.path.join(os.getcwd(), data_dir, f"{ticker}.csv")
+
+    # Leer las columnas necesarias
+    df = pd.read_csv(
+        file_path,
+        usecols=["Date", "Close"],
+        parse_dates=["Date"]
+    )
+    return df.rename(columns={"Date": "date", "Close": "close"})
 
-        except Exception as e:
-            print(f"Error descargando {tic}: {e}")
-            continue
 
+def _leer_close(ticker, data_dir="MarketData"):
+    """
+    Regresa un DataFrame ['date', 'close'] leyendo del panel columnar si el
+    ticker está ahí, o del CSV legado en caso contrario.
+    """
+    if ticker in tickers_en_panel(data_dir):
+        fechas, precios, _ = leer_panel([ticker], carpeta=data_dir)
+        return pd.DataFrame({"date": fechas, "close": precios[:, 0]})
+    return _leer_csv(ticker, data_dir)
 
 
+@timed("daily_return")
 def daily_return(ticker, data_dir="MarketData"):
     """
-    Carga una serie temporal desde un archivo CSV y calcula los rendimientos diarios.
+    Carga una serie temporal (panel columnar o CSV) y calcula los rendimientos diarios.
 
     Parámetros
     ----------
     ticker : str
         Símbolo del activo (por ejemplo: 'AAPL').
     data_dir : str, opcional
-        Directorio donde se encuentran los archivos CSV. Por defecto 'MarketData'.
+        Directorio donde se encuentran los datos. Por defecto 'MarketData'.
 
     Retorna
     -------
@@ -65,21 +451,11 @@ def daily_return(ticker, data_dir="MarketData"):
         DataFrame con columnas: ['date', 'close', 'return']
     """
 
-    # Ruta del archivo
-    file_path = os.path.join(os.getcwd(), data_dir, f"{ticker}.csv")
-
-    # Leer las columnas necesarias
-    df = pd.read_csv(
-        file_path,
-        usecols=["Date", "Close"],
-        parse_dates=["Date"]
-    )
+    # Leer fecha y cierre
+    df = _leer_close(ticker, data_dir=data_dir)
 
     # Limpiar y preparar
-    df = (
-        df.sort_values("Date")
-          .rename(columns={"Date": "date", "Close": "close"})
-    )
+    df = df.sort_values("date")
 
     # Convertir a numérico (por si hay texto como 'N/A')
     df["close"] = pd.to_numeric(df["close"], errors="coerce")
@@ -95,7 +471,106 @@ def daily_return(ticker, data_dir="MarketData"):
 
     return df
 
-def sync_timeseries(tickers, data_dir="MarketData"):
+@timed("_leer_cierres")
+def _leer_cierres(tickers, data_dir="MarketData"):
+    """
+    Lee los cierres de varios tickers alineados sobre la unión de fechas.
+
+    Si todos están en el panel columnar se leen de una sola vez; si no, se
+    leen los CSV y se alinean con un único concat.
+
+    Retorna (fechas, cierres) con cierres de forma (T × n) y NaN donde el
+    ticker no cotiza.
+    """
+    if set(tickers) <= set(tickers_en_panel(data_dir)):
+        fechas, cierres, _ = leer_panel(tickers, carpeta=data_dir)
+        return pd.DatetimeIndex(fechas), np.asarray(cierres, dtype=float)
+
+    series = []
+    for tic in tickers:
+        df = _leer_close(tic, data_dir=data_dir)
+        df["close"] = pd.to_numeric(df["close"], errors="coerce")
+        s = df.dropna(subset=["close"]).drop_duplicates("date", keep="last")
+        series.append(s.set_index("date")["close"].rename(tic))
+
+    cierres = pd.concat(series, axis=1, join="outer").sort_index()
+    return pd.DatetimeIndex(cierres.index), cierres.to_numpy(dtype=float)
+
+
+@timed("construir_panel_alineado")
+def construir_panel_alineado(tickers, data_dir="MarketData", alineacion="inner",
+                             start=None, end=None):
+    """
+    Construye en una sola pasada el panel de rendimientos diarios alineados.
+
+    Parámetros
+    ----------
+    tickers : list[str]
+        Lista de símbolos.
+    data_dir : str, opcional
+        Directorio de datos. Por defecto 'MarketData'.
+    alineacion : {'inner', 'ffill', 'outer'}
+        - 'inner': solo fechas en que todos los tickers tienen rendimiento
+          (mismo resultado que el merge inner encadenado).
+        - 'ffill': unión de fechas; un día sin precio se toma como precio
+          sin cambio (rendimiento 0). Se descartan las fechas anteriores al
+          inicio del ticker más reciente.
+        - 'outer': unión de fechas, con NaN donde falta el rendimiento.
+    start, end : str, opcional
+        Recorte de fechas (inclusive) aplicado a los rendimientos.
+
+    Retorna
+    -------
+    fechas : pd.DatetimeIndex
+        Fechas de los rendimientos (longitud T).
+    R : np.ndarray
+        Matriz (T × n) float64 contigua, una columna por ticker.
+    """
+    if alineacion not in ("inner", "ffill", "outer"):
+        raise ValueError("alineacion debe ser 'inner', 'ffill' u 'outer'.")
+
+    fechas, C = _leer_cierres(tickers, data_dir=data_dir)
+
+    # Último precio válido hasta cada fecha (forward fill por columna)
+    idx = np.where(~np.isnan(C), np.arange(C.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    F = C[idx, np.arange(C.shape[1])]
+
+    # Rendimiento contra el último precio válido anterior, igual que
+    # pct_change sobre la serie de cada ticker sin sus huecos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        R = C[1:] / F[:-1] - 1.0
+    fechas = fechas[1:]
+
+    if alineacion == "ffill":
+        R[np.isnan(C[1:]) & ~np.isnan(F[:-1])] = 0.0
+        filas = ~np.isnan(R).any(axis=1)
+    elif alineacion == "inner":
+        filas = ~np.isnan(R).any(axis=1)
+    else:
+        filas = ~np.isnan(R).all(axis=1)
+
+    if start is not None:
+        filas &= fechas >= pd.Timestamp(start)
+    if end is not None:
+        filas &= fechas <= pd.Timestamp(end)
+
+    return fechas[filas], np.ascontiguousarray(R[filas])
+
+
+def _matrices(R):
+    """Covarianza y correlación muestrales (ddof=1) de un panel sin NaN."""
+    # Con un solo ticker np.cov regresa un escalar 0-d
+    mtx_var_covar = np.atleast_2d(np.cov(R, rowvar=False))
+    std = np.sqrt(np.diag(mtx_var_covar))
+    mtx_correl = mtx_var_covar / np.outer(std, std)
+    np.fill_diagonal(mtx_correl, 1.0)
+    return mtx_var_covar, mtx_correl
+
+
+@timed("sync_timeseries")
+def sync_timeseries(tickers, data_dir="MarketData", alineacion="inner", verbose=False,
+                    start=None, end=None):
     """
     Carga y sincroniza series temporales de retornos diarios para varios tickers.
 
@@ -104,7 +579,13 @@ def sync_timeseries(tickers, data_dir="MarketData"):
     tickers : list[str]
         Lista de símbolos (por ejemplo: ['XLK', 'XLF', 'XLV']).
     data_dir : str, opcional
-        Directorio donde se encuentran los archivos CSV. Por defecto 'MarketData'.
+        Directorio donde se encuentran los datos. Por defecto 'MarketData'.
+    alineacion : str, opcional
+        Cómo alinear fechas (ver construir_panel_alineado). Por defecto 'inner'.
+    verbose : bool, opcional
+        Si es True imprime el inicio del DataFrame y ambas matrices.
+    start, end : str, opcional
+        Recorte de fechas (inclusive).
 
     Retorna
     -------
@@ -115,133 +596,872 @@ def sync_timeseries(tickers, data_dir="MarketData"):
     mtx_correl : np.ndarray
         Matriz de correlaciones.
     """
+    fechas, R = construir_panel_alineado(
+        tickers, data_dir=data_dir, alineacion=alineacion, start=start, end=end
+    )
 
-    # Cargar y preparar todas las series de retornos
-    all_returns = []
-
-    for ticker in tickers:
-        t = daily_return(ticker, data_dir=data_dir)
-        t = t[['date', 'return']].rename(columns={'return': ticker})
-        all_returns.append(t)
-
-    # Unir todas las series por la columna 'date' (intersección automática)
-    df = all_returns[0]
-    for t in all_returns[1:]:
-        df = pd.merge(df, t, on='date', how='inner')
-
-    # Limpiar y ordenar
-    df = df.dropna().sort_values('date').reset_index(drop=True)
+    df = pd.DataFrame(R, columns=list(tickers))
+    df.insert(0, "date", fechas)
 
     # Calcular matrices
-    returns_only = df.drop(columns='date')
-    mtx_var_covar = returns_only.cov().values
-    mtx_correl = returns_only.corr().values
+    if np.isnan(R).any():
+        # Con huecos ('outer') se usa el cálculo por pares de pandas
+        returns_only = df.drop(columns='date')
+        mtx_var_covar = returns_only.cov().values
+        mtx_correl = returns_only.corr().values
+    else:
+        with timer("momentos"):
+            mtx_var_covar, mtx_correl = _matrices(R)
 
     # Mostrar resultados
-    print("Primeras filas del DataFrame sincronizado:")
-    print(df.head(), "\n")
+    if verbose:
+        print("Primeras filas del DataFrame sincronizado:")
+        print(df.head(), "\n")
 
-    print("Matriz Varianza-Covarianza:")
-    print(mtx_var_covar, "\n")
+        print("Matriz Varianza-Covarianza:")
+        print(mtx_var_covar, "\n")
 
-    print("Matriz de Correlaciones:")
-    print(mtx_correl, "\n")
+        print("Matriz de Correlaciones:")
+        print(mtx_correl, "\n")
 
     return df, mtx_var_covar, mtx_correl
     
-def obtener_momentos_desde_csv(tickers, data_dir="MarketData"):
+# ===================== CACHÉ DE MOMENTOS =====================
+#
+# obtener_momentos_desde_csv se memoiza en dos niveles:
+#   - memoria: LRU acotado por bytes (_CACHE_MAX_BYTES)
+#   - disco:   <data_dir>/.cache/momentos_<hash>.pkl, acotado por bytes
+#              (_CACHE_DISCO_MAX_BYTES); se borran los de mtime más viejo
+# La llave incluye la huella (mtime/tamaño) de los archivos de origen, así que
+# cualquier escritura de datos nuevos invalida la entrada automáticamente.
+# El estado en memoria se protege con _cache_lock (la app y el precalculador
+# lo consultan desde hilos distintos).
+
+CACHE_SUBDIR = ".cache"
+_CACHE_MAX_BYTES = 256 * 1024 ** 2
+_CACHE_DISCO_MAX_BYTES = 1024 ** 3
+
+_cache_lock = threading.Lock()
+_cache_memoria = OrderedDict()
+_cache_bytes = 0
+_cache_stats = {"hits_memoria": 0, "hits_disco": 0, "misses": 0, "evicciones": 0,
+                "evicciones_disco": 0}
+
+
+def huella_datos(tickers, data_dir="MarketData"):
+    """
+    Huella de los archivos de los que se leerían `tickers`, igual que en
+    _leer_close: la versión vigente del panel (si algún ticker está en él)
+    más el CSV de cada ticker que no está en el panel. Cada archivo aporta
+    (nombre, mtime_ns, tamaño).
     """
-    Usa sync_timeseries para:
+    rutas = _rutas_panel(data_dir)
+    en_panel = set(_leer_indice(rutas)) if _existe_version(rutas) else set()
+
+    archivos = []
+    if en_panel & set(tickers):
+        archivos += [rutas["precios"], rutas["fechas"], rutas["indice"]]
+    archivos += [os.path.join(os.getcwd(), data_dir, f"{t}.csv")
+                 for t in tickers if t not in en_panel]
+
+    huella = [("panel", rutas["version"])] if en_panel & set(tickers) else []
+    for ruta in archivos:
+        try:
+            st = os.stat(ruta)
+            huella.append((os.path.basename(ruta), st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            huella.append((os.path.basename(ruta), None, None))
+    return tuple(huella)
+
+
+def _ruta_cache(data_dir, llave):
+    h = hashlib.sha1(repr(llave).encode()).hexdigest()
+    return os.path.join(os.getcwd(), data_dir, CACHE_SUBDIR, f"momentos_{h}.pkl")
+
+
+def _tamano_entrada(valor):
+    df, mu, Sigma, corr = valor
+    return int(df.memory_usage(index=True).sum()) + mu.nbytes + Sigma.size * 8 + corr.size * 8
+
+
+def _expulsar_viejas():
+    # Se expulsan las entradas usadas hace más tiempo (llamar con _cache_lock)
+    global _cache_bytes
+    while _cache_memoria and _cache_bytes > _CACHE_MAX_BYTES:
+        _, (_, tam_viejo) = _cache_memoria.popitem(last=False)
+        _cache_bytes -= tam_viejo
+        _cache_stats["evicciones"] += 1
+
+
+def _guardar_en_memoria(llave, valor):
+    global _cache_bytes
+    tam = _tamano_entrada(valor)
+    with _cache_lock:
+        if tam > _CACHE_MAX_BYTES:
+            return
+        if llave in _cache_memoria:
+            _cache_bytes -= _cache_memoria.pop(llave)[1]
+        _cache_memoria[llave] = (valor, tam)
+        _cache_bytes += tam
+        _expulsar_viejas()
+
+
+def _archivos_cache_disco(data_dir):
+    """(ruta, mtime, tamaño) de los pickles de momentos en <data_dir>/.cache."""
+    carpeta = os.path.join(os.getcwd(), data_dir, CACHE_SUBDIR)
+    if not os.path.isdir(carpeta):
+        return []
+    archivos = []
+    for f in os.listdir(carpeta):
+        if f.startswith("momentos_") and f.endswith(".pkl"):
+            ruta = os.path.join(carpeta, f)
+            try:
+                st = os.stat(ruta)
+            except FileNotFoundError:
+                continue
+            archivos.append((ruta, st.st_mtime_ns, st.st_size))
+    return archivos
+
+
+def _podar_disco(data_dir):
+    """
+    Borra los pickles de mtime más viejo hasta que el caché en disco de
+    `data_dir` quepa en _CACHE_DISCO_MAX_BYTES. Un hit en disco renueva el
+    mtime del archivo, así que se expulsan los usados hace más tiempo.
+    """
+    archivos = sorted(_archivos_cache_disco(data_dir), key=lambda a: a[1])
+    total = sum(a[2] for a in archivos)
+    for ruta, _, tam in archivos:
+        if total <= _CACHE_DISCO_MAX_BYTES:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tam
+        with _cache_lock:
+            _cache_stats["evicciones_disco"] += 1
+
+
+def configurar_cache(max_bytes, max_bytes_disco=None):
+    """
+    Cambia el tamaño máximo (en bytes) del caché en memoria y, si se da
+    `max_bytes_disco`, el de cada carpeta .cache en disco (se aplica en la
+    siguiente escritura).
+    """
+    global _CACHE_MAX_BYTES, _CACHE_DISCO_MAX_BYTES
+    with _cache_lock:
+        _CACHE_MAX_BYTES = int(max_bytes)
+        if max_bytes_disco is not None:
+            _CACHE_DISCO_MAX_BYTES = int(max_bytes_disco)
+        _expulsar_viejas()
+
+
+def limpiar_cache(data_dir=None):
+    """
+    Vacía el caché de momentos.
+
+    Si se da `data_dir` solo se borran las entradas (memoria y disco) de esa
+    carpeta; si no, se vacía la memoria completa.
+    """
+    global _cache_bytes
+    with _cache_lock:
+        for llave in list(_cache_memoria):
+            if data_dir is None or llave[0] == data_dir:
+                _cache_bytes -= _cache_memoria.pop(llave)[1]
+
+    if data_dir is not None:
+        for ruta, _, _ in _archivos_cache_disco(data_dir):
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+
+def cache_stats():
+    """Contadores del caché: hits (memoria/disco), misses, evicciones y tamaño."""
+    with _cache_lock:
+        return dict(_cache_stats, entradas=len(_cache_memoria), bytes=_cache_bytes)
+
+
+def _copiar(valor):
+    df, mu, Sigma, corr = valor
+    return df.copy(), mu.copy(), Sigma.copy(), corr.copy()
+
+
+@timed("obtener_momentos_desde_csv")
+def obtener_momentos_desde_csv(tickers, data_dir="MarketData", alineacion="inner",
+                               start=None, end=None, usar_cache=True):
+    """
+    Usa el panel alineado de rendimientos para:
       - sincronizar los retornos de los tickers
       - calcular el vector de medias (mu)
       - calcular la matriz de varianza-covarianza (Sigma)
 
+    El resultado se memoiza en memoria y en disco (ver cache_stats); la
+    entrada se invalida sola cuando cambian los archivos de datos.
+
     Regresa:
       - df: DataFrame con fecha y retornos
       - mu: Series con el rendimiento promedio de cada ticker
       - Sigma: DataFrame con la matriz de varianza-covarianza
+      - corr: DataFrame con la matriz de correlaciones
     """
-    df, _, _ = sync_timeseries(tickers, data_dir=data_dir)
+    llave = None
+    if usar_cache:
+        llave = (data_dir, tuple(tickers), alineacion, start, end,
+                 huella_datos(tickers, data_dir=data_dir))
+
+        with _cache_lock:
+            entrada = _cache_memoria.get(llave)
+            if entrada is not None:
+                _cache_memoria.move_to_end(llave)
+                _cache_stats["hits_memoria"] += 1
+        if entrada is not None:
+            contar("obtener_momentos_desde_csv", "cache_hits_memoria")
+            return _copiar(entrada[0])
+
+        ruta = _ruta_cache(data_dir, llave)
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, "rb") as f:
+                    llave_disco, valor = pickle.load(f)
+            except Exception as e:
+                logger.warning("Caché en disco ilegible (%s): %s", ruta, e)
+            else:
+                if llave_disco == llave:
+                    with _cache_lock:
+                        _cache_stats["hits_disco"] += 1
+                    try:
+                        os.utime(ruta)      # renueva su turno en la poda por mtime
+                    except OSError:
+                        pass
+                    contar("obtener_momentos_desde_csv", "cache_hits_disco")
+                    _guardar_en_memoria(llave, valor)
+                    return _copiar(valor)
+
+        with _cache_lock:
+            _cache_stats["misses"] += 1
+        contar("obtener_momentos_desde_csv", "cache_misses")
+
+    df, mtx_var_covar, mtx_correl = sync_timeseries(
+        tickers, data_dir=data_dir, alineacion=alineacion, start=start, end=end
+    )
 
-    returns_only = df.drop(columns="date")
-    mu = returns_only.mean()
-    Sigma = returns_only.cov()
-    corr=returns_only.corr()
+    cols = list(tickers)
+    mu = df[cols].mean()
+    Sigma = pd.DataFrame(mtx_var_covar, index=cols, columns=cols)
+    corr = pd.DataFrame(mtx_correl, index=cols, columns=cols)
+
+    if usar_cache:
+        valor = (df, mu, Sigma, corr)
+        _guardar_en_memoria(llave, valor)
+        ruta = _ruta_cache(data_dir, llave)
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            # Temporal propio de cada hilo/proceso para no pisarse al escribir
+            tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump((llave, valor), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, ruta)
+            _podar_disco(data_dir)
+        except OSError as e:
+            logger.warning("No se pudo escribir el caché en disco: %s", e)
+        return _copiar(valor)
 
     return df, mu, Sigma, corr
 
-def compute_portfolio_metrics(returns_df, weights, rf=0.0, market_col="SPLG"):
+# ===================== MOMENTOS INCREMENTALES =====================
+
+class MomentosIncrementales:
     """
-    Calcula métricas de desempeño para un portafolio.
+    Media y covarianza muestral actualizables fila por fila (Welford / Chan).
+
+    Guarda el número de observaciones, el vector de medias y la matriz de
+    co-momentos M2 = sum (x - media)(x - media)'. Agregar o retirar una fila
+    cuesta O(n²), así que un día nuevo no obliga a recalcular todo.
 
     Parámetros
     ----------
-    returns_df : pd.DataFrame
-        DataFrame con rendimientos de los activos (columnas = tickers).
-    weights : array-like
-        Pesos del portafolio (se normalizan para que sumen 1).
-    rf : float
-        Tasa libre de riesgo por periodo.
-    market_col : str
-        Columna a usar como índice de mercado para el cálculo de beta.
+    n : int
+        Número de activos.
+    tickers : list[str], opcional
+        Nombres de las columnas (para regresar Series/DataFrame).
+    ventana : int, opcional
+        Si se da, se mantienen solo las últimas `ventana` filas: al agregar
+        filas nuevas se retiran las más viejas (ventana deslizante).
+    """
 
-    Regresa
+    def __init__(self, n, tickers=None, ventana=None):
+        self.n = int(n)
+        self.tickers = list(tickers) if tickers is not None else None
+        self.ventana = ventana
+        self.count = 0
+        self.media = np.zeros(self.n)
+        self.M2 = np.zeros((self.n, self.n))
+        self.ultima_fecha = None
+        # Filas dentro de la ventana; hacen falta para poder retirarlas
+        self._buffer = np.empty((0, self.n))
+
+    def _combinar(self, X, signo):
+        """Suma (signo=1) o resta (signo=-1) el bloque de filas X."""
+        nb = X.shape[0]
+        if nb == 0:
+            return
+        mb = X.mean(axis=0)
+        Xc = X - mb
+        M2b = Xc.T @ Xc
+
+        if signo > 0:
+            na = self.count
+            n_tot = na + nb
+            delta = mb - self.media
+            self.media = self.media + delta * (nb / n_tot)
+            self.M2 = self.M2 + M2b + np.outer(delta, delta) * (na * nb / n_tot)
+            self.count = n_tot
+        else:
+            n_tot = self.count
+            na = n_tot - nb
+            if na < 0:
+                raise ValueError("Se intentan retirar más filas de las acumuladas.")
+            if na == 0:
+                self.count = 0
+                self.media = np.zeros(self.n)
+                self.M2 = np.zeros((self.n, self.n))
+                return
+            media_a = (n_tot * self.media - nb * mb) / na
+            delta = mb - media_a
+            self.M2 = self.M2 - M2b - np.outer(delta, delta) * (na * nb / n_tot)
+            self.media = media_a
+            self.count = na
+
+    def actualizar(self, filas, fechas=None):
+        """
+        Agrega filas de rendimientos (m × n o vector de n).
+
+        Si hay ventana, las filas más viejas que queden fuera se retiran.
+        `fechas` (opcional) registra la fecha de la última fila agregada.
+        """
+        X = np.atleast_2d(np.asarray(filas, dtype=float))
+        if X.shape[1] != self.n:
+            raise ValueError("Las filas no tienen el número de activos esperado.")
+
+        self._combinar(X, +1)
+
+        if self.ventana is not None:
+            self._buffer = np.vstack([self._buffer, X])
+            exceso = self._buffer.shape[0] - self.ventana
+            if exceso > 0:
+                self._combinar(self._buffer[:exceso], -1)
+                self._buffer = self._buffer[exceso:]
+
+        if fechas is not None and len(fechas):
+            self.ultima_fecha = pd.Timestamp(np.asarray(fechas)[-1])
+
+    def retirar(self, filas):
+        """
+        Retira (down-date) filas que se habían agregado antes.
+
+        Con ventana solo se pueden retirar las filas más viejas que siguen
+        dentro de ella (en el mismo orden), y también salen del buffer para
+        que `actualizar` no las vuelva a retirar.
+        """
+        X = np.atleast_2d(np.asarray(filas, dtype=float))
+        if self.ventana is not None:
+            m = X.shape[0]
+            if m > self._buffer.shape[0] or not np.array_equal(self._buffer[:m], X):
+                raise ValueError(
+                    "Con ventana solo se pueden retirar las filas más viejas de la ventana."
+                )
+            self._combinar(X, -1)
+            self._buffer = self._buffer[m:]
+            return
+        self._combinar(X, -1)
+
+    def cov(self, ddof=1):
+        """Matriz de covarianza muestral (igual que DataFrame.cov con ddof=1)."""
+        if self.count <= ddof:
+            return np.full((self.n, self.n), np.nan)
+        return self.M2 / (self.count - ddof)
+
+    def corr(self):
+        """Matriz de correlaciones."""
+        S = self.cov()
+        std = np.sqrt(np.diag(S))
+        C = S / np.outer(std, std)
+        np.fill_diagonal(C, 1.0)
+        return C
+
+    def momentos(self):
+        """(mu, Sigma) como Series/DataFrame si hay tickers, o arrays."""
+        if self.tickers is None:
+            return self.media.copy(), self.cov()
+        mu = pd.Series(self.media, index=self.tickers)
+        Sigma = pd.DataFrame(self.cov(), index=self.tickers, columns=self.tickers)
+        return mu, Sigma
+
+    # ---------- persistencia ----------
+
+    def guardar(self, ruta):
+        """Guarda el estado en un archivo .npz."""
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        ultima = np.datetime64("NaT") if self.ultima_fecha is None \
+            else np.datetime64(self.ultima_fecha, "ns")
+        tmp = ruta + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                count=self.count,
+                media=self.media,
+                M2=self.M2,
+                tickers=np.array(self.tickers if self.tickers is not None else [], dtype=str),
+                ventana=-1 if self.ventana is None else self.ventana,
+                ultima_fecha=ultima,
+                buffer=self._buffer,
+            )
+        os.replace(tmp, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Reconstruye el estado guardado con `guardar`."""
+        with np.load(ruta) as z:
+            tickers = [str(t) for t in z["tickers"]] or None
+            ventana = int(z["ventana"])
+            obj = cls(z["media"].shape[0], tickers=tickers,
+                      ventana=None if ventana < 0 else ventana)
+            obj.count = int(z["count"])
+            obj.media = z["media"].copy()
+            obj.M2 = z["M2"].copy()
+            obj._buffer = z["buffer"].copy()
+            ultima = z["ultima_fecha"][()]
+            obj.ultima_fecha = None if np.isnat(ultima) else pd.Timestamp(ultima)
+        return obj
+
+    @classmethod
+    def desde_panel(cls, tickers, data_dir="MarketData", ventana=None):
+        """Inicializa el estado con todo el panel alineado de `tickers`."""
+        obj = cls(len(tickers), tickers=tickers, ventana=ventana)
+        obj.sincronizar(data_dir)
+        return obj
+
+    def sincronizar(self, data_dir="MarketData"):
+        """
+        Agrega las fechas del panel posteriores a `ultima_fecha`.
+
+        Regresa el número de filas nuevas.
+        """
+        if self.tickers is None:
+            raise ValueError("Se necesitan los tickers para leer el panel.")
+
+        fechas, R = construir_panel_alineado(self.tickers, data_dir=data_dir)
+        if self.ultima_fecha is not None:
+            nuevas = fechas > self.ultima_fecha
+            fechas, R = fechas[nuevas], R[nuevas]
+
+        self.actualizar(R, fechas=fechas)
+        return R.shape[0]
+
+
+def ruta_momentos(tickers, carpeta="MarketData", ventana=None):
+    """Ruta estándar del estado de MomentosIncrementales junto al panel."""
+    h = hashlib.sha1(repr((tuple(tickers), ventana)).encode()).hexdigest()[:16]
+    return os.path.join(_rutas_panel(carpeta)["base"], f"momentos_{h}.npz")
+
+
+# ===================== COVARIANZA FACTORIAL =====================
+
+class CovarianzaFactorial:
+    """
+    Matriz de covarianza de bajo rango más diagonal:
+
+        Σ = B F B' + diag(D)
+
+    con B (n × k) cargas, F (k × k) covarianza de los factores y D (n,)
+    varianzas idiosincráticas. Productos Σx y formas cuadráticas w'Σw
+    cuestan O(n·k) en vez de O(n²), y nunca se forma la matriz n × n.
+
+    Se comporta como matriz para los optimizadores: soporta `Σ @ x`,
+    `x @ Σ`, multiplicación por escalar y `np.asarray(Σ)` (densifica).
+    """
+
+    # Hace que `ndarray @ Σ` delegue en __rmatmul__ en vez de densificar
+    __array_ufunc__ = None
+
+    def __init__(self, B, F, D, tickers=None):
+        self.B = np.asarray(B, dtype=float)
+        self.F = np.atleast_2d(np.asarray(F, dtype=float))
+        self.D = np.asarray(D, dtype=float).reshape(-1)
+        n, k = self.B.shape
+        if self.F.shape != (k, k) or self.D.shape != (n,):
+            raise ValueError("Dimensiones incompatibles entre B, F y D.")
+        self.tickers = list(tickers) if tickers is not None else None
+
+    # ---------- estimación ----------
+
+    @classmethod
+    def desde_rendimientos(cls, R, k=3, tickers=None, piso=1e-12):
+        """
+        Estima el modelo por componentes principales del panel de rendimientos
+        (T × n, p. ej. el df de sync_timeseries). Los k primeros componentes
+        son los factores (F = I) y D es la varianza que no explican.
+        """
+        if isinstance(R, pd.DataFrame):
+            R = R.drop(columns="date", errors="ignore")
+            tickers = list(R.columns) if tickers is None else tickers
+            R = R.to_numpy(dtype=float)
+        R = np.asarray(R, dtype=float)
+        T = R.shape[0]
+
+        Rc = R - R.mean(axis=0)
+        _, sv, Vt = np.linalg.svd(Rc, full_matrices=False)
+        k = min(k, sv.size)
+        B = Vt[:k].T * (sv[:k] / np.sqrt(T - 1))
+        var_total = (Rc ** 2).sum(axis=0) / (T - 1)
+        D = np.maximum(var_total - (B ** 2).sum(axis=1), piso)
+        return cls(B, np.eye(k), D, tickers=tickers)
+
+    @classmethod
+    def desde_factores(cls, R, factores, tickers=None, piso=1e-12):
+        """
+        Estima el modelo regresando cada activo contra factores dados
+        (T × k): B son las betas, F la covarianza de los factores y D la
+        varianza de los residuos.
+        """
+        if isinstance(R, pd.DataFrame):
+            R = R.drop(columns="date", errors="ignore")
+            tickers = list(R.columns) if tickers is None else tickers
+            R = R.to_numpy(dtype=float)
+        R = np.asarray(R, dtype=float)
+        X = np.asarray(factores, dtype=float)
+        if X.ndim == 1:
+            X = X[:, None]
+        T = R.shape[0]
+
+        Xc = X - X.mean(axis=0)
+        Rc = R - R.mean(axis=0)
+        betas = np.linalg.lstsq(Xc, Rc, rcond=None)[0]       # (k × n)
+        resid = Rc - Xc @ betas
+        F = np.atleast_2d(np.cov(X, rowvar=False))
+        D = np.maximum((resid ** 2).sum(axis=0) / (T - 1), piso)
+        return cls(betas.T, F, D, tickers=tickers)
+
+    # ---------- álgebra ----------
+
+    @property
+    def shape(self):
+        n = self.D.shape[0]
+        return (n, n)
+
+    ndim = 2
+
+    @property
+    def T(self):
+        return self
+
+    def __matmul__(self, x):
+        """Σ x para x de forma (n,) o (n × m)."""
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            return self.B @ (self.F @ (self.B.T @ x)) + self.D * x
+        return self.B @ (self.F @ (self.B.T @ x)) + self.D[:, None] * x
+
+    def __rmatmul__(self, x):
+        """x Σ para x de forma (n,) o (m × n) (Σ es simétrica)."""
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            return self @ x
+        return (self @ x.T).T
+
+    def __mul__(self, c):
+        if not np.isscalar(c):
+            return NotImplemented
+        return CovarianzaFactorial(self.B, self.F * c, self.D * c, tickers=self.tickers)
+
+    __rmul__ = __mul__
+
+    def cuadratica(self, w):
+        """w'Σw para w (n,) o para cada fila de W (m × n)."""
+        W = np.asarray(w, dtype=float)
+        BW = W @ self.B
+        if W.ndim == 1:
+            return float(BW @ self.F @ BW + (self.D * W * W).sum())
+        return np.einsum("ik,kl,il->i", BW, self.F, BW) + (W * W) @ self.D
+
+    def resolver(self, x):
+        """
+        Σ⁻¹ x por la identidad de Woodbury, en O(n·k²):
+            Σ⁻¹ = D⁻¹ - D⁻¹ B (F⁻¹ + B' D⁻¹ B)⁻¹ B' D⁻¹
+        """
+        x = np.asarray(x, dtype=float)
+        Dinv = 1.0 / self.D
+        DinvB = self.B * Dinv[:, None]
+        Lf = np.linalg.cholesky(self.F)
+        Finv = np.linalg.solve(Lf.T, np.linalg.solve(Lf, np.eye(self.F.shape[0])))
+        capacidad = Finv + self.B.T @ DinvB
+        Dx = Dinv * x if x.ndim == 1 else Dinv[:, None] * x
+        return Dx - DinvB @ np.linalg.solve(capacidad, self.B.T @ Dx)
+
+    def diag(self):
+        """Varianzas de cada activo."""
+        return np.einsum("ik,kl,il->i", self.B, self.F, self.B) + self.D
+
+    def to_dense(self):
+        """Matriz n × n completa (solo para universos chicos o diagnósticos)."""
+        return self.B @ self.F @ self.B.T + np.diag(self.D)
+
+    def __array__(self, dtype=None, copy=None):
+        denso = self.to_dense()
+        return denso if dtype is None else denso.astype(dtype)
+
+    def to_frame(self):
+        """Versión densa como DataFrame con los tickers como etiquetas."""
+        return pd.DataFrame(self.to_dense(), index=self.tickers, columns=self.tickers)
+
+
+# ===================== MOMENTOS MÓVILES =====================
+
+def _momentos_directos(R, fin, ventanas, ddof):
+    """Momentos de las ventanas que terminan en `fin` con un producto matricial."""
+    res = {}
+    for W in ventanas:
+        if fin - W + 1 < 0:
+            res[W] = (np.full(R.shape[1], np.nan), np.full((R.shape[1],) * 2, np.nan))
+            continue
+        X = R[fin - W + 1:fin + 1]
+        mu = X.mean(axis=0)
+        Xc = X - mu
+        res[W] = (mu, Xc.T @ Xc / (W - ddof))
+    return res
+
+
+def momentos_moviles(R, ventanas, fines=None, paso=1, max_bytes=64 * 1024 ** 2, ddof=1):
+    """
+    Generador de medias y covarianzas móviles para varias ventanas a la vez.
+
+    Las sumas de cada ventana se obtienen como diferencias de sumas acumuladas
+    (de x y de x x'), así que el costo por fecha no depende del largo de la
+    ventana. El cálculo se hace por bloques de fechas finales para que la
+    memoria quede acotada por `max_bytes`; cada bloque se emite en cuanto está
+    listo.
+
+    Parámetros
+    ----------
+    R : np.ndarray o pd.DataFrame
+        Panel de rendimientos (T × n) sin NaN (p. ej. de construir_panel_alineado).
+    ventanas : int o list[int]
+        Longitudes de ventana (p. ej. [63, 126, 252, 756]).
+    fines : array-like de int, opcional
+        Índices (filas) donde termina cada ventana, inclusive, en orden no
+        decreciente (calcular_momentos_moviles acepta cualquier orden). Por
+        defecto cada `paso` filas desde la primera ventana completa más corta.
+    paso : int
+        Separación entre fechas finales cuando no se dan `fines`.
+    max_bytes : int
+        Memoria aproximada máxima por bloque. Cuenta las sumas acumuladas
+        y sus productos externos (2 × filas × n²), la salida de todas las ventanas (c × n² cada una) y los
+        temporales de las diferencias. Una sola fecha final cuyo cálculo no
+        cabe se resuelve con un producto matricial directo (~W × n + n²).
+    ddof : int
+        Grados de libertad (1 = covarianza muestral, como pandas).
+
+    Genera
+    ------
+    fines_bloque : np.ndarray
+        Índices finales del bloque (longitud c).
+    momentos : dict[int, tuple[np.ndarray, np.ndarray]]
+        Para cada ventana W: (mu de forma (c, n), Sigma de forma (c, n, n)).
+        Las ventanas sin historia suficiente quedan en NaN.
+    """
+    if isinstance(R, pd.DataFrame):
+        R = R.drop(columns="date", errors="ignore").to_numpy(dtype=float)
+    R = np.asarray(R, dtype=float)
+    T, n = R.shape
+
+    ventanas = sorted({int(W) for W in np.atleast_1d(ventanas)})
+    if ventanas[0] <= ddof:
+        raise ValueError("Cada ventana debe ser mayor que ddof.")
+    W_max = ventanas[-1]
+
+    if fines is None:
+        fines = np.arange(ventanas[0] - 1, T, paso)
+    fines = np.asarray(fines, dtype=int).reshape(-1)
+    if fines.size and (fines.min() < 0 or fines.max() >= T):
+        raise IndexError("Índices finales fuera del panel.")
+    if np.any(np.diff(fines) < 0):
+        raise ValueError("fines debe estar en orden no decreciente "
+                         "(calcular_momentos_moviles acepta cualquier orden).")
+
+    bytes_fila = 8 * (n * n + n)
+    # Por fecha final: la salida de cada ventana más ~6 temporales c × n × n
+    # (P2[b], P2[a], su diferencia, el producto externo de las medias y la
+    # asignación con máscara)
+    por_fin = len(ventanas) + 6
+
+    def _bytes_bloque(i, j):
+        filas = min(fines[j], T - 1) - max(0, fines[i] - W_max + 1) + 2
+        # P2 y el temporal de productos externos: 2 × filas × n²
+        return bytes_fila * (2 * filas + por_fin * (j - i + 1))
+
+    i = 0
+    while i < fines.size:
+        # Bloque más grande cuyas sumas acumuladas y salidas caben en max_bytes
+        j = i + 1
+        while j < fines.size and _bytes_bloque(i, j) <= max_bytes:
+            j += 1
+        bloque = fines[i:j]
+        lo = max(0, bloque[0] - W_max + 1)
+        hi = bloque[-1] + 1
+        filas = hi - lo
+
+        c = bloque.size
+        salida = {W: (np.full((c, n), np.nan), np.full((c, n, n), np.nan)) for W in ventanas}
+
+        if _bytes_bloque(i, j - 1) > max_bytes or filas > c * W_max:
+            # Ventana enorme o fechas muy espaciadas: producto matricial directo
+            for k, fin in enumerate(bloque):
+                for W, (mu, S) in _momentos_directos(R, fin, ventanas, ddof).items():
+                    salida[W][0][k] = mu
+                    salida[W][1][k] = S
+        else:
+            X = R[lo:hi]
+            # Centrar en la media del bloque reduce la cancelación numérica
+            centro = X.mean(axis=0)
+            Xc = X - centro
+            P1 = np.zeros((filas + 1, n))
+            np.cumsum(Xc, axis=0, out=P1[1:])
+            P2 = np.zeros((filas + 1, n, n))
+            np.cumsum(Xc[:, :, None] * Xc[:, None, :], axis=0, out=P2[1:])
+
+            k_fin = bloque - lo + 1
+            for W in ventanas:
+                validos = bloque - W + 1 >= 0
+                if not validos.any():
+                    continue
+                a, b = k_fin[validos] - W, k_fin[validos]
+                S1 = P1[b] - P1[a]
+                S2 = P2[b] - P2[a]
+                m = S1 / W
+                salida[W][0][validos] = m + centro
+                salida[W][1][validos] = (S2 - W * m[:, :, None] * m[:, None, :]) / (W - ddof)
+
+        yield bloque, salida
+        i = j
+
+
+def calcular_momentos_moviles(R, ventanas, fines=None, paso=1, max_bytes=64 * 1024 ** 2, ddof=1):
+    """
+    Versión no perezosa de momentos_moviles: junta todos los bloques.
+
+    `fines` puede venir en cualquier orden; la salida respeta ese orden.
+
+    Retorna
     -------
-    dict con métricas (media, volatilidad, Sharpe, Sortino, VaR, etc.)
+    fines : np.ndarray
+    momentos : dict[int, tuple[np.ndarray, np.ndarray]]
+        mu (m × n) y Sigma (m × n × n) por ventana.
     """
-    w = np.asarray(weights, dtype=float)
-    if w.sum() == 0:
-        raise ValueError("La suma de los pesos es 0.")
-    w = w / w.sum()
+    orden = None
+    if fines is not None:
+        fines = np.asarray(fines, dtype=int).reshape(-1)
+        if np.any(np.diff(fines) < 0):
+            orden = np.argsort(fines, kind="stable")
+            fines = fines[orden]
 
-    # Serie de rendimientos del portafolio
-    port_ret = returns_df.dot(w)
+    fines_tot, partes = [], {}
+    for bloque, salida in momentos_moviles(R, ventanas, fines=fines, paso=paso,
+                                           max_bytes=max_bytes, ddof=ddof):
+        fines_tot.append(bloque)
+        for W, (mu, S) in salida.items():
+            partes.setdefault(W, ([], []))
+            partes[W][0].append(mu)
+            partes[W][1].append(S)
 
-    # Media y volatilidad
-    mu = port_ret.mean()
-    sigma = port_ret.std()
+    if not fines_tot:
+        return np.empty(0, dtype=int), {}
 
-    # Sharpe
-    sharpe = (mu - rf) / sigma if sigma > 0 else np.nan
+    fines_tot = np.concatenate(fines_tot)
+    momentos = {W: (np.concatenate(mus), np.concatenate(Ss)) for W, (mus, Ss) in partes.items()}
+    if orden is not None:
+        # Regresar al orden en que el usuario pidió las fechas
+        inversa = np.empty_like(orden)
+        inversa[orden] = np.arange(orden.size)
+        fines_tot = fines_tot[inversa]
+        momentos = {W: (mu[inversa], S[inversa]) for W, (mu, S) in momentos.items()}
+    return fines_tot, momentos
 
-    # Sortino (solo desviación de rendimientos por debajo de rf)
-    downside = port_ret[port_ret < rf]
-    downside_std = downside.std()
-    sortino = (mu - rf) / downside_std if downside_std > 0 else np.nan
 
-    # Max drawdown
-    cum = (1 + port_ret).cumprod()
-    running_max = cum.cummax()
-    drawdown = cum / running_max - 1.0
-    max_dd = drawdown.min()
+def _metricas_bloque(P, m, rf):
+    """
+    Métricas de un bloque de portafolios.
 
-    # Skewness y kurtosis
-    skew = port_ret.skew()
-    kurt = port_ret.kurtosis()
+    P : (T × c) rendimientos de c portafolios; m : rendimientos del mercado
+    (T,) o None. Replica las convenciones de pandas (ddof=1, skew/kurtosis
+    ajustadas por sesgo, cuantil lineal).
+    """
+    T = P.shape[0]
+    nan = np.full(P.shape[1], np.nan)
 
-    # Alpha simple
-    alpha = mu - rf
+    # Media y volatilidad
+    mu = P.mean(axis=0)
+    D = P - mu
+    D2 = D * D
+    m2 = D2.sum(axis=0)
+    sigma = np.sqrt(m2 / (T - 1)) if T > 1 else nan.copy()
 
-    # VaR y CVaR al 95%
-    q95 = port_ret.quantile(0.05)
-    var_95 = -q95
-    cvar_95 = -port_ret[port_ret <= q95].mean()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Sharpe
+        sharpe = np.where(sigma > 0, (mu - rf) / sigma, np.nan)
 
-    # Beta vs mercado (si existe esa columna)
-    beta = np.nan
-    if market_col in returns_df.columns:
-        mkt = returns_df[market_col]
-        cov = np.cov(port_ret, mkt)[0, 1]
-        var_mkt = mkt.var()
-        if var_mkt > 0:
-            beta = cov / var_mkt
+        # Sortino (solo desviación de rendimientos por debajo de rf)
+        abajo = P < rf
+        cnt = abajo.sum(axis=0)
+        media_abajo = np.where(abajo, P, 0.0).sum(axis=0) / cnt
+        Da = np.where(abajo, P - media_abajo, 0.0)
+        ss_abajo = (Da * Da).sum(axis=0)
+        downside_std = np.where(cnt > 1, np.sqrt(ss_abajo / (cnt - 1)), np.nan)
+        sortino = np.where(downside_std > 0, (mu - rf) / downside_std, np.nan)
+
+        # Max drawdown
+        cum = np.cumprod(1.0 + P, axis=0)
+        running_max = np.maximum.accumulate(cum, axis=0)
+        max_dd = (cum / running_max - 1.0).min(axis=0)
+
+        # Skewness y kurtosis (mismos estimadores que pandas)
+        m3 = (D2 * D).sum(axis=0)
+        m4 = (D2 * D2).sum(axis=0)
+        if T >= 3:
+            skew = (T * np.sqrt(T - 1) / (T - 2)) * m3 / m2 ** 1.5
+            skew = np.where(m2 == 0, 0.0, skew)
+        else:
+            skew = nan.copy()
+        if T >= 4:
+            num = T * (T + 1) * (T - 1) * m4
+            den = (T - 2) * (T - 3) * m2 ** 2
+            adj = 3 * (T - 1) ** 2 / ((T - 2) * (T - 3))
+            kurt = np.where(den == 0, 0.0, num / den - adj)
+        else:
+            kurt = nan.copy()
+
+        # VaR y CVaR al 95%
+        q95 = np.quantile(P, 0.05, axis=0)
+        var_95 = -q95
+        cola = P <= q95
+        cvar_95 = -np.where(cola, P, 0.0).sum(axis=0) / cola.sum(axis=0)
+
+        # Beta vs mercado
+        beta = nan.copy()
+        if m is not None:
+            mc = m - m.mean()
+            var_mkt = (mc ** 2).sum() / (T - 1)
+            if var_mkt > 0:
+                beta = (D * mc[:, None]).sum(axis=0) / (T - 1) / var_mkt
 
     return {
         "Media": mu,
         "Volatilidad": sigma,
         "Sharpe": sharpe,
         "Sortino": sortino,
-        "α (retorno - rf)": alpha,
+        "α (retorno - rf)": mu - rf,
         "Skewness": skew,
         "Kurtosis": kurt,
         "Max Drawdown": max_dd,
@@ -249,3 +1469,88 @@ def compute_portfolio_metrics(returns_df, weights, rf=0.0, market_col="SPLG"):
         "CVaR 95%": cvar_95,
         "Beta vs mercado": beta,
     }
+
+
+@timed("compute_portfolio_metrics_batch")
+def compute_portfolio_metrics_batch(returns_df, weights, rf=0.0, market_col="SPLG",
+                                    max_bytes=64 * 1024 ** 2, Sigma=None):
+    """
+    Calcula las métricas de compute_portfolio_metrics para muchos portafolios.
+
+    Parámetros
+    ----------
+    returns_df : pd.DataFrame
+        DataFrame con rendimientos de los activos (columnas = tickers), sin NaN.
+    weights : array-like
+        Matriz de pesos (k × n); cada fila se normaliza para que sume 1.
+    rf : float
+        Tasa libre de riesgo por periodo.
+    market_col : str
+        Columna a usar como índice de mercado para el cálculo de beta.
+    max_bytes : int
+        Memoria aproximada por bloque de portafolios (la matriz T × k de
+        rendimientos se procesa por bloques de columnas).
+    Sigma : array-like o CovarianzaFactorial, opcional
+        Si se da, se agrega la "Volatilidad ex-ante" sqrt(w'Σw).
+
+    Regresa
+    -------
+    dict con las mismas llaves que compute_portfolio_metrics; cada valor es
+    un np.ndarray de longitud k.
+    """
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    sumas = W.sum(axis=1)
+    if np.any(sumas == 0):
+        raise ValueError("La suma de los pesos es 0.")
+    W = W / sumas[:, None]
+
+    X = returns_df.to_numpy(dtype=float)
+    m = None
+    if market_col in returns_df.columns:
+        m = returns_df[market_col].to_numpy(dtype=float)
+
+    T, k = X.shape[0], W.shape[0]
+    # Varias matrices temporales T × c viven a la vez en _metricas_bloque
+    c = max(1, int(max_bytes // (8 * 6 * max(T, 1))))
+
+    partes = [
+        _metricas_bloque(X @ W[i:i + c].T, m, rf)
+        for i in range(0, k, c)
+    ]
+    metricas = {llave: np.concatenate([p[llave] for p in partes]) for llave in partes[0]}
+
+    if Sigma is not None:
+        if not isinstance(Sigma, CovarianzaFactorial):
+            Sigma = np.asarray(Sigma, dtype=float)
+        # (W Σ) ∘ W sumado por filas = w'Σw de cada portafolio
+        metricas["Volatilidad ex-ante"] = np.sqrt(((W @ Sigma) * W).sum(axis=1))
+
+    return metricas
+
+
+@timed("compute_portfolio_metrics")
+def compute_portfolio_metrics(returns_df, weights, rf=0.0, market_col="SPLG", Sigma=None):
+    """
+    Calcula métricas de desempeño para un portafolio.
+
+    Parámetros
+    ----------
+    returns_df : pd.DataFrame
+        DataFrame con rendimientos de los activos (columnas = tickers).
+    weights : array-like
+        Pesos del portafolio (se normalizan para que sumen 1).
+    rf : float
+        Tasa libre de riesgo por periodo.
+    market_col : str
+        Columna a usar como índice de mercado para el cálculo de beta.
+    Sigma : array-like o CovarianzaFactorial, opcional
+        Si se da, se agrega la "Volatilidad ex-ante" sqrt(w'Σw).
+
+    Regresa
+    -------
+    dict con métricas (media, volatilidad, Sharpe, Sortino, VaR, etc.)
+    """
+    w = np.asarray(weights, dtype=float).reshape(1, -1)
+    metricas = compute_portfolio_metrics_batch(returns_df, w, rf=rf, market_col=market_col,
+                                               Sigma=Sigma)
+    return {llave: float(v[0]) for llave, v in metricas.items()}
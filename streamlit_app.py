@@ -1,23 +1,171 @@
+import time
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
 
 from sf_library import (
     TICKERS_REGIONES,
     TICKERS_SECTORES,
     obtener_momentos_desde_csv,
     compute_portfolio_metrics,
+    huella_datos,
+    limpiar_cache,
 )
+from instrumentation import registrar_tiempo, reporte, timer
+from precompute import Precalculador
 
 from optimization import (
     optimize_min_variance,
     optimize_max_sharpe,
     optimize_markowitz_target,
     optimize_BL_target,
+    efficient_frontier,
 )
 
+_inicio_script = time.perf_counter()
+
+# ===================== CACHÉ DE LA APP =====================
+#
+# Streamlit vuelve a ejecutar todo el script en cada interacción. La carga
+# del universo, el mapa de calor y los resultados de los optimizadores se
+# memoizan; la llave incluye la huella de los archivos de precios
+# (huella_datos), así que cuando llegan datos nuevos las entradas viejas ya
+# no se usan. El TTL es una cota extra para liberar memoria.
+
+CACHE_TTL = 60 * 60  # segundos
+
+# Portafolios que el precalculador deja listos (solo con rf = 0)
+PRECALCULADOS = {"Mínima Varianza": "min_variance", "Máximo Sharpe": "max_sharpe"}
+
+
+@st.cache_resource
+def precalculador():
+    """
+    Hilo de fondo, uno por servidor, que precalcula Regiones y Sectores y
+    los recalcula cuando cambian los datos.
+    """
+    return Precalculador().iniciar()
+
+
+@st.cache_resource(ttl=CACHE_TTL, show_spinner="Cargando universo...")
+def cargar_universo(tickers, huella):
+    """
+    Panel sincronizado y momentos del universo (compartidos entre sesiones,
+    sin copiar; no se modifican). `huella` solo forma parte de la llave.
+    """
+    listo = precalculador().obtener(tickers, huella)
+    if listo is not None:
+        return listo["momentos"]
+    return obtener_momentos_desde_csv(list(tickers))
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def heatmap_correlaciones(tickers, huella):
+    """
+    Mapa de calor de correlaciones como (datos en formato largo, spec de
+    Vega-Lite). Lo dibuja el navegador: no hace falta matplotlib/seaborn.
+    """
+    _, _, _, corr = cargar_universo(tickers, huella)
+
+    datos = (
+        corr.rename_axis(index="fila", columns="columna")
+        .stack()
+        .rename("correlacion")
+        .reset_index()
+    )
+    orden = list(tickers)
+    ejes = {
+        "x": {"field": "columna", "type": "nominal", "sort": orden, "title": None},
+        "y": {"field": "fila", "type": "nominal", "sort": orden, "title": None},
+    }
+    spec = {
+        "encoding": ejes,
+        "layer": [
+            {
+                "mark": "rect",
+                "encoding": {
+                    "color": {
+                        "field": "correlacion",
+                        "type": "quantitative",
+                        # Equivalente a cmap="coolwarm", vmin=0, vmax=1
+                        "scale": {"scheme": "redblue", "reverse": True, "domain": [0, 1]},
+                        "title": "ρ",
+                    },
+                },
+            },
+            {
+                "mark": {"type": "text", "fontSize": 11},
+                "encoding": {
+                    "text": {"field": "correlacion", "type": "quantitative", "format": ".2f"},
+                },
+            },
+        ],
+        "height": 28 * len(orden),
+    }
+    return datos, spec
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner="Optimizando...")
+def resolver_portafolio(tickers, huella, metodo, rf=0.0, r_target=None,
+                        P=None, Q=None, Omega=None):
+    """
+    Pesos óptimos y métricas de un portafolio optimizado.
+
+    La llave es (universo, huella, método, rf, r_target, vistas P/Q/Ω).
+    Regresa (w_opt, exito, metricas).
+    """
+    if metodo in PRECALCULADOS and rf == 0:
+        listo = precalculador().obtener(tickers, huella)
+        if listo is not None:
+            return listo[PRECALCULADOS[metodo]]
+
+    df, mu, Sigma, _ = cargar_universo(tickers, huella)
+    mu_vals = mu.values*252 #anualizado
+    Sigma_vals = Sigma.values*252 #anualizado
+
+    if metodo == "Mínima Varianza":
+        w_opt, res = optimize_min_variance(mu_vals, Sigma_vals, short=False)
+    elif metodo == "Máximo Sharpe":
+        w_opt, res = optimize_max_sharpe(mu_vals, Sigma_vals, rf=rf, short=False)
+    elif metodo == "Markowitz":
+        w_opt, res = optimize_markowitz_target(mu_vals, Sigma_vals, r_target, short=False)
+    else:
+        w_opt, res = optimize_BL_target(mu_vals, Sigma_vals, r_target, P, Q, Omega, short=False)
+
+    metricas = compute_portfolio_metrics(df.drop(columns="date"), w_opt, rf=rf)
+    return w_opt, bool(res.success), metricas
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner="Calculando frontera eficiente...")
+def frontera_eficiente(tickers, huella):
+    """
+    Frontera eficiente sin cortos (μ y Σ anualizados) como DataFrame con
+    columnas Volatilidad y Rendimiento. Usa la del precalculador si está
+    lista; si no, la calcula con la misma malla.
+    """
+    listo = precalculador().obtener(tickers, huella)
+    if listo is not None:
+        frontera = listo["frontera"]
+    else:
+        _, mu, Sigma, _ = cargar_universo(tickers, huella)
+        frontera = efficient_frontier(mu.values*252, Sigma.values*252,
+                                      n_puntos=precalculador().n_puntos)
+
+    ok = frontera["success"]
+    return pd.DataFrame({
+        "Volatilidad": frontera["vols"][ok],
+        "Rendimiento": frontera["returns"][ok],
+    })
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def metricas_portafolio(tickers, huella, pesos, rf):
+    """Métricas de un portafolio con pesos dados (tupla) sobre el universo."""
+    df, _, _, _ = cargar_universo(tickers, huella)
+    return compute_portfolio_metrics(df.drop(columns="date"), np.asarray(pesos), rf=rf)
+
+
 # ===================== CONFIGURACIÓN DE LA APP =====================
 
 st.set_page_config(
@@ -35,6 +183,17 @@ La plataforma ofrece tablas con parámetros ajustables y guías claras en cada s
 para que puedas evaluar tus decisiones de inversión de forma sencilla y eficiente.
 '''
 
+with st.sidebar:
+    if st.button("Limpiar caché"):
+        st.cache_data.clear()
+        cargar_universo.clear()
+        limpiar_cache(data_dir="MarketData")
+        precalculador().refrescar(forzar=True)
+        st.success(
+            "Caché vaciado (memoria y disco); los datos se vuelven a leer y el "
+            "precálculo se rehace en segundo plano."
+        )
+
 # ===================== TABLAS DE ETFs =====================
 ETF_Regionales=["SPLG", "EWC", "IEUR", "EEM", "EWJ"]
 
@@ -95,8 +254,9 @@ else:
     st.session_state.n_assets_arbitrary=11
     tickers_universo = TICKERS_SECTORES
 
-df_universo, mu_universo, Sigma_universo, corr = obtener_momentos_desde_csv(tickers_universo)
-returns_universo = df_universo.drop(columns="date")  # solo rendimientos
+tickers_llave = tuple(tickers_universo)
+huella = huella_datos(tickers_universo)
+df_universo, mu_universo, Sigma_universo, corr = cargar_universo(tickers_llave, huella)
 
 st.write("Tickers del universo seleccionado:", tickers_universo)
 
@@ -109,377 +269,357 @@ with col_sigma:
     st.markdown("**Matriz de varianza–covarianza Σ:**")
     st.dataframe(Sigma_universo)
 
-fig, ax = plt.subplots(figsize=(18, 16))
-
-sns.heatmap(
-    corr,
-    annot=True,     
-    fmt=".2f",      
-    cmap="coolwarm",
-    vmin=0,
-    vmax=1,
-    ax=ax           
-)
-
 st.markdown("**Matriz de Correlaciones")
-st.pyplot(fig)
-
-# ===================== TIPO DE ANÁLISIS =====================
-
-tipo_portafolio = st.selectbox(
-    "Por favor, seleccione el tipo de Análisis del Portafolio que desea usar:",
-    ("Arbitrario", "Optimizado", "Black-Litterman"),
-    index=None,
-    placeholder="Seleccione método de análisis...",
-)
-
-# ===================== PORTAFOLIO ARBITRARIO =====================
-
-if tipo_portafolio == "Arbitrario":
+datos_corr, spec_corr = heatmap_correlaciones(tickers_llave, huella)
+st.vega_lite_chart(datos_corr, spec_corr, use_container_width=True)
 
-    st.subheader("Análisis de Portafolio Arbitrario")
-    st.markdown("Define el peso (en %) de cada ETF del portafolio.")
-
-    temp_weights = {}
-
-    # Pesos regionales
-    if universo == "Regiones":
-        for i in range(1, st.session_state.n_assets_arbitrary + 1):
-            temp_weights[f"Activo {i}"] = st.slider(
-                f"Peso Activo {ETF_Regionales[i-1]}",
-                min_value=0.0,
-                max_value=1.0,
-                value=0.0 if st.session_state.weights_arbitrary is None
-                    else st.session_state.weights_arbitrary.get(f"Activo {i}", 0.0),
-                step=0.01,
-                key=f"slider_activo_{i}"
-            )
-    # Pesos sectoriales
-    else:
-         for i in range(1, st.session_state.n_assets_arbitrary + 1):
-            temp_weights[f"Activo {i}"] = st.slider(
-                f"Peso Activo {ETF_Sectoriales[i-1]}",
-                min_value=0.0,
-                max_value=1.0,
-                value=0.0 if st.session_state.weights_arbitrary is None
-                    else st.session_state.weights_arbitrary.get(f"Activo {i}", 0.0),
-                step=0.01,
-                key=f"slider_activo_{i}"
-            )
+# ===================== MÉTRICAS =====================
 
-    rf_arbitrario = st.number_input(
-        "Tasa libre de riesgo (rf, por periodo) para el análisis del portafolio arbitrario",
-        value=0.0,
-        step=0.001,
-        format="%.4f",
-    )
+def mostrar_metricas(metricas, titulo):
+    """Tarjetas con las métricas de compute_portfolio_metrics."""
+    v=pd.Series(metricas, name="Valor")
+    v=v.round(6)
 
-    if st.button("Calcular Análisis del Portafolio Arbitrario"):
-        tickers_all = TICKERS_REGIONES + TICKERS_SECTORES
+    st.markdown(f"## 📊 {titulo}")
+    col1, col2, col3 = st.columns(3)
 
-        weights = {k: v / 100 for k, v in temp_weights.items()}
-        st.session_state.weights_arbitrary = weights
+    col1.metric("Retorno Medio", v["Media"])
+    col2.metric("Volatilidad", v["Volatilidad"])
+    col3.metric("Sharpe Ratio", v["Sharpe"])
 
-        w = np.array(list(st.session_state.weights_arbitrary.values()))*100
+    st.markdown("### ⚙️ Riesgo Ajustado")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Sortino Ratio", v["Sortino"])
+    col2.metric("α (Retorno – rf)", v["α (retorno - rf)"])
+    col3.metric("Max Drawdown", v["Max Drawdown"])
 
-        if not np.isclose(w.sum(), 1.0):
-            st.warning(f"Los pesos suman {w.sum():.2f}. Se recomienda que la suma sea 1 (100%).")
-        else:
+    st.markdown("### 📐 Distribución y Riesgo Extremo")
 
-            df_pesos=pd.DataFrame({"Ticker": tickers_universo, "Peso": w}).set_index("Ticker")
+    col1, col2, col3 = st.columns(3)
 
-            metrics = compute_portfolio_metrics(returns_universo, w, rf=rf_arbitrario)
+    col1.metric("Skewness", v["Skewness"])
+    col2.metric("Kurtosis", v["Kurtosis"])
+    col3.metric("VaR 95%", v["VaR 95%"])
 
-            v=pd.Series(metrics, name="Valor")
-            v=v.round(6)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("CVaR 95%", v["CVaR 95%"])
+    col2.metric("Beta vs Mercado", v["Beta vs mercado"])
 
-            st.markdown("## Distribución del Portafolio")
-            st.scatter_chart(df_pesos)
 
-            st.markdown("## 📊 Métricas del Portafolio Arbitrario")
-            col1, col2, col3 = st.columns(3)
+# ===================== PORTAFOLIO ARBITRARIO =====================
+#
+# Cada sección es un fragmento: sus widgets solo vuelven a ejecutar la
+# sección, no las tablas, el universo ni el mapa de calor de arriba. Los
+# parámetros van en formularios, así que nada se recalcula hasta enviarlos.
+# Cada sección muestra al final su propio tiempo de render: la tabla de la
+# barra lateral solo se redibuja en una ejecución completa del script, así
+# que tras una re-ejecución del fragmento seguiría mostrando la anterior.
+
+def mostrar_tiempo_render(nombre):
+    """Pie de sección con el tiempo de la última ejecución de `nombre`."""
+    t = reporte(top_perfil=0)["timers"].get(nombre)
+    if t is not None:
+        st.caption(f"⏱ Sección dibujada en {1000 * t['ultimo_s']:.0f} ms "
+                   f"(media {1000 * t['media_s']:.0f} ms en {t['llamadas']} ejecuciones).")
+
+
+@st.fragment
+def seccion_arbitrario(universo, tickers_llave, huella):
+    with timer("app.arbitrario"):
+        st.subheader("Análisis de Portafolio Arbitrario")
+        st.markdown("Define el peso (en %) de cada ETF del portafolio.")
+
+        etfs = ETF_Regionales if universo == "Regiones" else ETF_Sectoriales
+
+        with st.form("form_arbitrario"):
+            temp_weights = {}
+            for i in range(1, st.session_state.n_assets_arbitrary + 1):
+                temp_weights[f"Activo {i}"] = st.slider(
+                    f"Peso Activo {etfs[i-1]}",
+                    min_value=0.0,
+                    max_value=1.0,
+                    value=0.0 if st.session_state.weights_arbitrary is None
+                        else st.session_state.weights_arbitrary.get(f"Activo {i}", 0.0),
+                    step=0.01,
+                    key=f"slider_activo_{i}"
+                )
+
+            rf_arbitrario = st.number_input(
+                "Tasa libre de riesgo (rf, por periodo) para el análisis del portafolio arbitrario",
+                value=0.0,
+                step=0.001,
+                format="%.4f",
+            )
 
-            col1.metric("Retorno Medio", v["Media"])
-            col2.metric("Volatilidad", v["Volatilidad"])
-            col3.metric("Sharpe Ratio", v["Sharpe"])
+            enviado = st.form_submit_button("Calcular Análisis del Portafolio Arbitrario")
 
-            st.markdown("### ⚙️ Riesgo Ajustado")
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Sortino Ratio", v["Sortino"])
-            col2.metric("α (Retorno – rf)", v["α (retorno - rf)"])
-            col3.metric("Max Drawdown", v["Max Drawdown"])
+        if enviado:
+            weights = {k: v / 100 for k, v in temp_weights.items()}
+            st.session_state.weights_arbitrary = weights
 
-            st.markdown("### 📐 Distribución y Riesgo Extremo")
+            w = np.array(list(st.session_state.weights_arbitrary.values()))*100
 
-            col1, col2, col3 = st.columns(3)
+            if not np.isclose(w.sum(), 1.0):
+                st.warning(f"Los pesos suman {w.sum():.2f}. Se recomienda que la suma sea 1 (100%).")
+            else:
+                df_pesos=pd.DataFrame({"Ticker": list(tickers_llave), "Peso": w}).set_index("Ticker")
 
-            col1.metric("Skewness", v["Skewness"])
-            col2.metric("Kurtosis", v["Kurtosis"])
-            col3.metric("VaR 95%", v["VaR 95%"])
+                metrics = metricas_portafolio(tickers_llave, huella, tuple(w), rf_arbitrario)
 
-            col1, col2, col3 = st.columns(3)
-            col1.metric("CVaR 95%", v["CVaR 95%"])
-            col2.metric("Beta vs Mercado", v["Beta vs mercado"])
+                st.markdown("## Distribución del Portafolio")
+                st.scatter_chart(df_pesos)
 
+                mostrar_metricas(metrics, "Métricas del Portafolio Arbitrario")
 
+    mostrar_tiempo_render("app.arbitrario")
 
 
 # ===================== PORTAFOLIO OPTIMIZADO =====================
 
-if tipo_portafolio == "Optimizado":
-    st.subheader("Análisis de Portafolio Optimizado")
-    '''
-    Seleccione el método deseado y ajuste los parámetros según sus preferencias para obtener recomendaciones personalizadas.
-    '''
-    metodo_optimizado = st.selectbox(
-        "Por favor, seleccione el método de optimización:",
-        ("Mínima Varianza", "Máximo Sharpe", "Markowitz"),
-        index=None,
-        placeholder="Seleccione método de optimización...",
-    )
-
-    # Solo mostramos inputs y botón si ya eligió un método
-    if metodo_optimizado is not None:
-        rf = st.number_input(
-            "Tasa libre de riesgo (rf, por periodo)",
-            value=0.0,
-            step=0.001,
-            format="%.4f",
+@st.fragment
+def seccion_optimizado(tickers_llave, huella, mu_media):
+    with timer("app.optimizado"):
+        st.subheader("Análisis de Portafolio Optimizado")
+        st.markdown(
+            "Seleccione el método deseado y ajuste los parámetros según sus preferencias "
+            "para obtener recomendaciones personalizadas."
         )
 
-        r_target = None
-        if metodo_optimizado == "Markowitz":
-            r_target = st.number_input(
-                "Rendimiento objetivo (misma base temporal que μ)",
-                value=float(mu_universo.mean()),
+        with st.form("form_optimizado"):
+            metodo_optimizado = st.selectbox(
+                "Por favor, seleccione el método de optimización:",
+                ("Mínima Varianza", "Máximo Sharpe", "Markowitz"),
+                index=0,
+            )
+
+            rf = st.number_input(
+                "Tasa libre de riesgo (rf, por periodo)",
+                value=0.0,
                 step=0.001,
                 format="%.4f",
             )
 
-        if st.button("Calcular Análisis del Portafolio Optimizado"):
-            mu_vals = mu_universo.values*252 #anualizado
-            Sigma_vals = Sigma_universo.values*252 #anualizado
+            # Solo se usa con Markowitz
+            r_target = st.number_input(
+                "Rendimiento objetivo para Markowitz (misma base temporal que μ)",
+                value=mu_media,
+                step=0.001,
+                format="%.4f",
+            )
 
-            if metodo_optimizado == "Mínima Varianza":
-                w_opt, res = optimize_min_variance(mu_vals, Sigma_vals, short=False)
-            elif metodo_optimizado == "Máximo Sharpe":
-                w_opt, res = optimize_max_sharpe(mu_vals, Sigma_vals, rf=rf, short=False)
-            else:
-                w_opt, res = optimize_markowitz_target(mu_vals, Sigma_vals, r_target, short=False)
+            enviado = st.form_submit_button("Calcular Análisis del Portafolio Optimizado")
 
-            metrics_opt = compute_portfolio_metrics(returns_universo, w_opt, rf=rf)
+        if enviado:
+            w_opt, _, metrics_opt = resolver_portafolio(
+                tickers_llave, huella, metodo_optimizado, rf=rf,
+                r_target=r_target if metodo_optimizado == "Markowitz" else None
+            )
 
             st.markdown("### Pesos óptimos del portafolio")
-            df_pesos=pd.DataFrame({"Ticker": tickers_universo, "Peso": w_opt}).set_index("Ticker")
+            df_pesos=pd.DataFrame({"Ticker": list(tickers_llave), "Peso": w_opt}).set_index("Ticker")
             st.dataframe(
                 df_pesos
             )
-            
-            st.scatter_chart(df_pesos)
 
-            v=pd.Series(metrics_opt, name="Valor")
-            v=v.round(6)
-
-            st.markdown("## 📊 Métricas del Portafolio Optimizado")
-            col1, col2, col3 = st.columns(3)
-
-            col1.metric("Retorno Medio", v["Media"])
-            col2.metric("Volatilidad", v["Volatilidad"])
-            col3.metric("Sharpe Ratio", v["Sharpe"])
-
-            st.markdown("### ⚙️ Riesgo Ajustado")
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Sortino Ratio", v["Sortino"])
-            col2.metric("α (Retorno – rf)", v["α (retorno - rf)"])
-            col3.metric("Max Drawdown", v["Max Drawdown"])
-
-            st.markdown("### 📐 Distribución y Riesgo Extremo")
-
-            col1, col2, col3 = st.columns(3)
+            st.scatter_chart(df_pesos)
 
-            col1.metric("Skewness", v["Skewness"])
-            col2.metric("Kurtosis", v["Kurtosis"])
-            col3.metric("VaR 95%", v["VaR 95%"])
+            # Frontera eficiente (precalculada) con el portafolio elegido encima
+            _, mu, Sigma, _ = cargar_universo(tickers_llave, huella)
+            punto = pd.DataFrame({
+                "Volatilidad": [float(np.sqrt(w_opt @ Sigma.values @ w_opt * 252))],
+                "Rendimiento": [float(w_opt @ mu.values * 252)],
+                "Serie": [metodo_optimizado],
+            })
+            frontera = frontera_eficiente(tickers_llave, huella).assign(Serie="Frontera eficiente")
+            st.markdown("### Frontera eficiente (anualizada, sin cortos)")
+            st.scatter_chart(
+                pd.concat([frontera, punto], ignore_index=True),
+                x="Volatilidad", y="Rendimiento", color="Serie",
+            )
 
-            col1, col2, col3 = st.columns(3)
-            col1.metric("CVaR 95%", v["CVaR 95%"])
-            col2.metric("Beta vs Mercado", v["Beta vs mercado"])
+            mostrar_metricas(metrics_opt, "Métricas del Portafolio Optimizado")
 
+    mostrar_tiempo_render("app.optimizado")
 
 
 # ===================== PORTAFOLIO Black Litterman =====================
 
-if tipo_portafolio == "Black-Litterman":
-    
-    if universo == "Regiones":
-        assets=["SPLG", "EWC", "IEUR", "EEM", "EWJ"]
-    else:
-        assets = ["XLC", "XLY", "XLP", "XLE", "XLF", "XLV", "XLI", "XLB", "XLRE", "XLK", "XLU"]
-    
-    n_assets=len(assets)
-
-    st.subheader("Análisis de Portafolio bajo Black Litterman")
-
-    st.markdown("""En esta sección puedes definir **vistas absolutas o relativas**, junto con tu **nivel de confianza**.""")
-    
-    rf = st.number_input(
-        "Tasa libre de riesgo (rf, por periodo)",
-        value=0.0,
-        step=0.001,
-        format="%.4f",
-    )
+@st.fragment
+def seccion_black_litterman(universo, tickers_llave, huella, mu_media):
+    with timer("app.black_litterman"):
+        assets = list(tickers_llave)
+        n_assets=len(assets)
 
-    r_target_bl = st.number_input(
-        "Rendimiento objetivo (misma base temporal que μ)",
-        value=float(mu_universo.mean()),
-        step=0.001,
-        format="%.4f",
-    )
+        st.subheader("Análisis de Portafolio bajo Black Litterman")
 
-    
-    if universo == "Regiones":
-        # Número de vistas
-        k = st.number_input(
-            "Número de vistas",
-            min_value=1,
-            max_value=4,
-            value=1,
-            step=1
-        )
-    else:
-        # Número de vistas
+        st.markdown("""En esta sección puedes definir **vistas absolutas o relativas**, junto con tu **nivel de confianza**.""")
+
+        # Número de vistas (fuera del formulario: cambia cuántas filas hay)
         k = st.number_input(
             "Número de vistas",
             min_value=1,
-            max_value=10,
+            max_value=4 if universo == "Regiones" else 10,
             value=1,
             step=1
         )
 
-    P = np.zeros((k, n_assets))
-    Q = np.zeros(k)
-    Omega = np.zeros((k, k))
+        P = np.zeros((k, n_assets))
+        Q = np.zeros(k)
+        Omega = np.zeros((k, k))
 
-    # Definición de vistas
-    st.markdown("## Definición de vistas")
+        with st.form("form_black_litterman"):
+            rf = st.number_input(
+                "Tasa libre de riesgo (rf, por periodo)",
+                value=0.0,
+                step=0.001,
+                format="%.4f",
+            )
 
-    for i in range(k):
-        st.markdown(f"### Vista {i + 1}")
+            r_target_bl = st.number_input(
+                "Rendimiento objetivo (misma base temporal que μ)",
+                value=mu_media,
+                step=0.001,
+                format="%.4f",
+            )
 
-        col1, col2, col3 = st.columns(3)
+            # Definición de vistas
+            st.markdown("## Definición de vistas")
+
+            for i in range(k):
+                st.markdown(f"### Vista {i + 1}")
+
+                col1, col2, col3, col4 = st.columns(4)
+
+                with col1:
+                    view_type = st.selectbox(
+                        "Tipo de vista",
+                        ["Absoluta", "Relativa"],
+                        key=f"type_{i}"
+                    )
+
+                with col2:
+                    asset_1 = st.selectbox(
+                        "Activo principal",
+                        assets,
+                        key=f"a1_{i}"
+                    )
+
+                with col3:
+                    # Dentro del formulario no se puede mostrar condicionalmente:
+                    # solo se usa si la vista es relativa
+                    asset_2 = st.selectbox(
+                        "Activo de comparación (vistas relativas)",
+                        assets,
+                        key=f"a2_{i}"
+                    )
+
+                with col4:
+                    confidence = st.slider(
+                        "Confianza en la vista (%)",
+                        min_value=1,
+                        max_value=100,
+                        value=50,
+                        key=f"conf_{i}"
+                    )
+
+                expected_return = st.number_input(
+                    "Retorno esperado de la vista (ej. 0.03 = 3%)",
+                    value=0.02,
+                    step=0.005,
+                    format="%.4f",
+                    key=f"q_{i}"
+                )
+
+                # Construcción de P y Q
+                idx_1 = assets.index(asset_1)
+                P[i, idx_1] = 1
+
+                if view_type == "Relativa":
+                    idx_2 = assets.index(asset_2)
+                    P[i, idx_2] = -1
+
+                Q[i] = expected_return
+
+                # Incertidumbre Ω
+                # (menor confianza → mayor varianza)
+                Omega[i, i] = (1 - confidence / 100) ** 2
+
+            enviado = st.form_submit_button("Calcular Análisis del Portafolio bajo Black-Litterman")
+
+        # Resultados
+        st.markdown("## Matrices Resultantes")
+
+        df_P = pd.DataFrame(P, columns=assets)
+        df_Q = pd.DataFrame(Q, columns=["Q"])
+        df_Omega = pd.DataFrame(Omega)
 
+        col1, col2, col3 = st.columns(3)
         with col1:
-            view_type = st.selectbox(
-                "Tipo de vista",
-                ["Absoluta", "Relativa"],
-                key=f"type_{i}"
-            )
+            st.markdown("### Matriz P")
+            st.dataframe(df_P)
 
         with col2:
-            asset_1 = st.selectbox(
-                "Activo principal",
-                assets,
-                key=f"a1_{i}"
-            )
+            st.markdown("### Vector Q")
+            st.dataframe(df_Q)
 
         with col3:
-            confidence = st.slider(
-                "Confianza en la vista (%)",
-                min_value=1,
-                max_value=100,
-                value=50,
-                key=f"conf_{i}"
-            )
+            st.markdown("### Matriz Ω")
+            st.dataframe(df_Omega)
 
-        if view_type == "Relativa":
-            asset_2 = st.selectbox(
-                "Activo de comparación",
-                assets,
-                key=f"a2_{i}"
+        if enviado:
+            w_opt, _, metrics_opt = resolver_portafolio(
+                tickers_llave, huella, "Black-Litterman", rf=rf, r_target=r_target_bl,
+                P=P, Q=Q, Omega=Omega
             )
 
-        expected_return = st.number_input(
-            "Retorno esperado de la vista (ej. 0.03 = 3%)",
-            value=0.02,
-            step=0.005,
-            format="%.4f",
-            key=f"q_{i}"
-        )
-
-        # Construcción de P y Q
-        idx_1 = assets.index(asset_1)
-        P[i, idx_1] = 1
-
-        if view_type == "Relativa":
-            idx_2 = assets.index(asset_2)
-            P[i, idx_2] = -1
-
-        Q[i] = expected_return
-
-        # Incertidumbre Ω
-        # (menor confianza → mayor varianza)
-        Omega[i, i] = (1 - confidence / 100) ** 2
-
-    # Resultados
-    st.markdown("## Matrices Resultantes")
-
-    df_P = pd.DataFrame(P, columns=assets)
-    df_Q = pd.DataFrame(Q, columns=["Q"])
-    df_Omega = pd.DataFrame(Omega)
-
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown("### Matriz P")
-        st.dataframe(df_P)
-
-    with col2:
-        st.markdown("### Vector Q")
-        st.dataframe(df_Q)
-
-    with col3:
-        st.markdown("### Matriz Ω")
-        st.dataframe(df_Omega)
-
-    if st.button("Calcular Análisis del Portafolio bajo Black-Litterman"):
-            mu_vals = mu_universo.values*252 #anualizado
-            Sigma_vals = Sigma_universo.values*252 #anualizado
-
-            w_opt, res = optimize_BL_target(mu_vals, Sigma_vals, r_target_bl, df_P, df_Q, df_Omega, short=False)
-            metrics_opt = compute_portfolio_metrics(returns_universo, w_opt, rf=rf)
-            
             st.markdown("### Pesos óptimos del portafolio")
-            df_pesos=pd.DataFrame({"Ticker": tickers_universo, "Peso": w_opt}).set_index("Ticker")
+            df_pesos=pd.DataFrame({"Ticker": assets, "Peso": w_opt}).set_index("Ticker")
             st.dataframe(
                 df_pesos
             )
             st.scatter_chart(df_pesos)
 
-            v=pd.Series(metrics_opt, name="Valor")
-            v=v.round(6)
+            mostrar_metricas(metrics_opt, "Métricas del Portafolio Optimizado")
 
-            st.markdown("## 📊 Métricas del Portafolio Optimizado")
-            col1, col2, col3 = st.columns(3)
+    mostrar_tiempo_render("app.black_litterman")
 
-            col1.metric("Retorno Medio", v["Media"])
-            col2.metric("Volatilidad", v["Volatilidad"])
-            col3.metric("Sharpe Ratio", v["Sharpe"])
 
-            st.markdown("### ⚙️ Riesgo Ajustado")
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Sortino Ratio", v["Sortino"])
-            col2.metric("α (Retorno – rf)", v["α (retorno - rf)"])
-            col3.metric("Max Drawdown", v["Max Drawdown"])
+# ===================== TIPO DE ANÁLISIS =====================
+
+tipo_portafolio = st.selectbox(
+    "Por favor, seleccione el tipo de Análisis del Portafolio que desea usar:",
+    ("Arbitrario", "Optimizado", "Black-Litterman"),
+    index=None,
+    placeholder="Seleccione método de análisis...",
+)
+
+if tipo_portafolio == "Arbitrario":
+    seccion_arbitrario(universo, tickers_llave, huella)
+elif tipo_portafolio == "Optimizado":
+    seccion_optimizado(tickers_llave, huella, float(mu_universo.mean()))
+elif tipo_portafolio == "Black-Litterman":
+    seccion_black_litterman(universo, tickers_llave, huella, float(mu_universo.mean()))
 
-            st.markdown("### 📐 Distribución y Riesgo Extremo")
 
-            col1, col2, col3 = st.columns(3)
+# ===================== TIEMPOS DE RENDER =====================
 
-            col1.metric("Skewness", v["Skewness"])
-            col2.metric("Kurtosis", v["Kurtosis"])
-            col3.metric("VaR 95%", v["VaR 95%"])
+registrar_tiempo("app.script", time.perf_counter() - _inicio_script)
 
-            col1, col2, col3 = st.columns(3)
-            col1.metric("CVaR 95%", v["CVaR 95%"])
-            col2.metric("Beta vs Mercado", v["Beta vs mercado"])
+with st.sidebar:
+    with st.expander("Precálculo en segundo plano"):
+        st.write(precalculador().estado())
 
-            
+    with st.expander("Tiempos de render"):
+        st.caption(
+            "app.script: ejecución completa (cualquier widget fuera de una sección); "
+            "app.<sección>: solo el fragmento que cambió. Esta tabla se actualiza "
+            "solo en ejecuciones completas; el tiempo de cada interacción dentro "
+            "de una sección aparece al pie de esa sección."
+        )
+        tiempos = {
+            nombre: {"llamadas": t["llamadas"], "último (ms)": 1000 * t["ultimo_s"],
+                     "media (ms)": 1000 * t["media_s"]}
+            for nombre, t in reporte(top_perfil=0)["timers"].items()
+            if nombre.startswith("app.")
+        }
+        st.dataframe(pd.DataFrame(tiempos).T)
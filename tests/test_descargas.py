@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sf_library as sfl
+from data_providers import LocalProvider
+
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+@pytest.fixture(autouse=True)
+def carpeta_temporal(tmp_path, monkeypatch):
+    # descargar_tickers y el panel trabajan relativo al directorio actual
+    monkeypatch.chdir(tmp_path)
+    sfl.limpiar_cache()
+
+
+def _panel():
+    return sfl.cargar_panel(carpeta="MarketData")
+
+
+def test_incremental_igual_a_descarga_completa():
+    fuente = LocalProvider(seed=1, inicio_historia="2020-01-01")
+    errores = sfl.descargar_tickers(TICKERS, start="2020-01-01", end="2021-01-01",
+                                    fuente=fuente, reintentos=0)
+    assert errores == {}
+    errores = sfl.descargar_tickers(TICKERS, start="2020-01-01", end="2021-07-01",
+                                    fuente=fuente, incremental=True, reintentos=0)
+    assert errores == {}
+    incremental = _panel()
+
+    sfl.descargar_tickers(TICKERS, carpeta="Completo", start="2020-01-01", end="2021-07-01",
+                          fuente=fuente, reintentos=0)
+    completo = sfl.cargar_panel(carpeta="Completo")
+
+    # Sin fechas repetidas y con los mismos cierres que una descarga completa
+    assert incremental.index.is_unique
+    pd.testing.assert_frame_equal(incremental[TICKERS], completo[TICKERS])
+
+
+def test_incremental_conserva_orden_de_columnas():
+    fuente = LocalProvider(seed=1, inicio_historia="2020-01-01")
+    sfl.descargar_tickers(TICKERS, start="2020-01-01", end="2020-06-01", fuente=fuente)
+    sfl.descargar_tickers(["CCC", "DDD"], start="2020-01-01", end="2020-09-01",
+                          fuente=fuente, incremental=True)
+    assert sfl.tickers_en_panel("MarketData") == TICKERS + ["DDD"]
+
+
+def test_incremental_reescala_tras_dividendo():
+    sfl.descargar_tickers(["AAA"], start="2020-01-01", end="2021-01-01", reintentos=0,
+                          fuente=LocalProvider(seed=2, inicio_historia="2020-01-01"))
+    # Dividendo del 2% con fecha ex posterior a la última fecha guardada
+    fuente = LocalProvider(seed=2, inicio_historia="2020-01-01",
+                           dividendos={"AAA": [("2021-02-01", 0.02)]})
+    sfl.descargar_tickers(["AAA"], start="2020-01-01", end="2021-06-01",
+                          fuente=fuente, incremental=True, reintentos=0)
+
+    esperado = fuente._serie("AAA", "2020-01-01", "2021-06-01")
+    guardado = _panel()["AAA"].dropna()
+    np.testing.assert_allclose(guardado.to_numpy(), esperado.to_numpy(), rtol=1e-12)
+
+
+def test_ya_actualizado_no_descarga():
+    fuente = LocalProvider(seed=1, inicio_historia="2020-01-01")
+    sfl.descargar_tickers(TICKERS, start="2020-01-01", end="2020-06-01", fuente=fuente)
+    llamadas = fuente.llamadas
+    ultima = max(sfl.ultimas_fechas("MarketData").values())
+    sfl.descargar_tickers(TICKERS, end=ultima.strftime("%Y-%m-%d"), fuente=fuente,
+                          incremental=True)
+    assert fuente.llamadas == llamadas
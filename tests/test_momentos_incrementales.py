@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import sf_library as sfl
+
+
+@pytest.fixture
+def X():
+    rng = np.random.default_rng(0)
+    return rng.normal(0.0005, 0.01, size=(300, 4))
+
+
+def test_sin_ventana_igual_a_numpy(X):
+    m = sfl.MomentosIncrementales(4)
+    for bloque in np.array_split(X, 7):
+        m.actualizar(bloque)
+    assert m.count == 300
+    np.testing.assert_allclose(m.media, X.mean(axis=0), atol=1e-14)
+    np.testing.assert_allclose(m.cov(), np.cov(X, rowvar=False), atol=1e-14)
+
+
+def test_retirar_sin_ventana(X):
+    m = sfl.MomentosIncrementales(4)
+    m.actualizar(X)
+    m.retirar(X[:50])
+    assert m.count == 250
+    np.testing.assert_allclose(m.cov(), np.cov(X[50:], rowvar=False), atol=1e-14)
+
+
+def test_ventana_deslizante(X):
+    m = sfl.MomentosIncrementales(4, ventana=100)
+    for i in range(0, 300, 13):
+        m.actualizar(X[i:i + 13])
+    assert m.count == 100
+    np.testing.assert_allclose(m.cov(), np.cov(X[200:], rowvar=False), atol=1e-13)
+
+
+def test_ventana_y_retirar(X):
+    m = sfl.MomentosIncrementales(4, ventana=100)
+    m.actualizar(X[:100])
+    m.retirar(X[:10])
+    m.actualizar(X[100:101])
+    assert m.count == 91
+    np.testing.assert_allclose(m.cov(), np.cov(X[10:101], rowvar=False), atol=1e-13)
+
+    # La ventana sigue deslizándose desde las filas que quedaron
+    m.actualizar(X[101:120])
+    assert m.count == 100
+    np.testing.assert_allclose(m.cov(), np.cov(X[20:120], rowvar=False), atol=1e-13)
+
+
+def test_ventana_rechaza_filas_que_no_son_las_mas_viejas(X):
+    m = sfl.MomentosIncrementales(4, ventana=100)
+    m.actualizar(X[:100])
+    with pytest.raises(ValueError):
+        m.retirar(X[5:10])
+    assert m.count == 100
+
+
+def test_guardar_y_cargar(X, tmp_path):
+    m = sfl.MomentosIncrementales(4, ventana=50)
+    m.actualizar(X[:120])
+    ruta = str(tmp_path / "estado.npz")
+    m.guardar(ruta)
+    c = sfl.MomentosIncrementales.cargar(ruta)
+    c.actualizar(X[120:130])
+    np.testing.assert_allclose(c.cov(), np.cov(X[80:130], rowvar=False), atol=1e-13)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import optimization as opt
+import sf_library as sfl
+
+
+@pytest.fixture
+def momentos():
+    rng = np.random.default_rng(3)
+    n = 8
+    R = rng.normal(0.0004, 0.01, size=(750, n)) + rng.normal(0, 0.008, size=(750, 1))
+    return R.mean(axis=0) * 252, np.cov(R, rowvar=False) * 252
+
+
+def _varianza(w, Sigma):
+    return float(w @ Sigma @ w)
+
+
+@pytest.mark.parametrize("short", [False, True])
+def test_min_variance_qp_igual_a_slsqp(momentos, short):
+    mu, Sigma = momentos
+    w_qp, r_qp = opt.optimize_min_variance(mu, Sigma, short=short, engine="qp")
+    w_sl, r_sl = opt.optimize_min_variance(mu, Sigma, short=short, engine="slsqp")
+    assert r_qp.success and r_sl.success
+    assert w_qp.sum() == pytest.approx(1.0, abs=1e-10)
+    # El QP es exacto: nunca peor que SLSQP (que para con ftol=1e-6)
+    assert _varianza(w_qp, Sigma) <= _varianza(w_sl, Sigma) + 1e-10
+    assert _varianza(w_qp, Sigma) == pytest.approx(_varianza(w_sl, Sigma), rel=1e-4)
+    np.testing.assert_allclose(w_qp, w_sl, atol=1e-2)
+
+
+@pytest.mark.parametrize("short", [False, True])
+def test_max_sharpe_qp_igual_a_slsqp(momentos, short):
+    mu, Sigma = momentos
+    w_qp, r_qp = opt.optimize_max_sharpe(mu, Sigma, rf=0.0, short=short, engine="qp")
+    w_sl, r_sl = opt.optimize_max_sharpe(mu, Sigma, rf=0.0, short=short, engine="slsqp")
+    assert r_qp.success and r_sl.success
+    assert r_qp.fun <= r_sl.fun + 1e-8
+
+
+@pytest.mark.parametrize("short", [False, True])
+def test_markowitz_qp_igual_a_slsqp(momentos, short):
+    mu, Sigma = momentos
+    r_target = float(np.quantile(mu, 0.7))
+    w_qp, r_qp = opt.optimize_markowitz_target(mu, Sigma, r_target, short=short, engine="qp")
+    w_sl, r_sl = opt.optimize_markowitz_target(mu, Sigma, r_target, short=short, engine="slsqp")
+    assert r_qp.success and r_sl.success
+    assert w_qp @ mu == pytest.approx(r_target, abs=1e-10)
+    assert _varianza(w_qp, Sigma) <= _varianza(w_sl, Sigma) + 1e-10
+    assert _varianza(w_qp, Sigma) == pytest.approx(_varianza(w_sl, Sigma), rel=1e-4)
+    np.testing.assert_allclose(w_qp, w_sl, atol=1e-2)
+
+
+def test_markowitz_objetivo_fuera_de_rango_sin_cortos(momentos):
+    mu, Sigma = momentos
+    _, res = opt.optimize_markowitz_target(mu, Sigma, mu.max() + 0.05, engine="qp")
+    assert not res.success
+
+
+@pytest.mark.parametrize("short", [False, True])
+def test_mu_iguales_con_otro_objetivo_es_infactible(short):
+    mu = np.full(4, 0.08)
+    Sigma = np.diag([0.04, 0.05, 0.06, 0.07])
+    _, res = opt.optimize_markowitz_target(mu, Sigma, 0.12, short=short, engine="qp")
+    assert not res.success
+
+
+def test_qp_con_covarianza_factorial(momentos):
+    rng = np.random.default_rng(5)
+    R = rng.normal(0.0004, 0.01, size=(500, 30)) + rng.normal(0, 0.01, size=(500, 1))
+    F = sfl.CovarianzaFactorial.desde_rendimientos(R, k=2) * 252
+    mu = R.mean(axis=0) * 252
+    for short in (False, True):
+        w_f, r_f = opt.optimize_min_variance(mu, F, short=short, engine="qp")
+        w_d, r_d = opt.optimize_min_variance(mu, F.to_dense(), short=short, engine="qp")
+        assert r_f.success and r_d.success
+        np.testing.assert_allclose(w_f, w_d, atol=1e-10)
@@ -0,0 +1,79 @@
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_providers as dp
+
+
+def test_reintenta_lote_que_falla():
+    fuente = dp.LocalProvider(seed=0, fallos={"AAA": 2}, inicio_historia="2020-01-01")
+    series, errores = dp.descargar_concurrente(
+        ["AAA", "BBB"], proveedor=fuente, start="2020-01-01", end="2020-03-01",
+        reintentos=2, backoff=0.0,
+    )
+    assert errores == {}
+    assert set(series) == {"AAA", "BBB"}
+
+
+def test_reporta_error_propio_de_cada_ticker():
+    fuente = dp.LocalProvider(seed=0, fallos={"AAA": 10}, sin_datos={"CCC"},
+                              inicio_historia="2020-01-01")
+    series, errores = dp.descargar_concurrente(
+        ["AAA", "BBB", "CCC"], proveedor=fuente, start="2020-01-01", end="2020-03-01",
+        reintentos=1, backoff=0.0,
+    )
+    # El fallo de AAA no arrastra a BBB; CCC no tiene datos y no se reintenta
+    assert set(series) == {"BBB"}
+    assert errores["AAA"].startswith("ConnectionError")
+    assert errores["CCC"] == "sin datos"
+    assert "BBB" not in errores
+
+
+def test_fuente_funcion_con_fallo_parcial():
+    intentos = {"AAA": 0}
+
+    def fuente(tic, start, end):
+        if tic == "AAA":
+            intentos["AAA"] += 1
+            if intentos["AAA"] == 1:
+                raise TimeoutError("tarde")
+        fechas = pd.bdate_range(start, end)
+        return pd.DataFrame({"Close": np.linspace(10, 11, len(fechas))}, index=fechas)
+
+    series, errores = dp.descargar_concurrente(
+        ["AAA", "BBB"], proveedor=fuente, start="2020-01-01", end="2020-02-01",
+        reintentos=1, backoff=0.0,
+    )
+    assert errores == {}
+    assert set(series) == {"AAA", "BBB"}
+    assert intentos["AAA"] == 2
+
+
+def test_yfinance_reintenta_columnas_vacias(monkeypatch):
+    llamadas = []
+
+    def download(tickers, **kwargs):
+        llamadas.append(list(tickers))
+        fechas = pd.bdate_range("2020-01-01", periods=5)
+        datos = {t: np.arange(5, dtype=float) + 1 for t in tickers}
+        if len(llamadas) == 1 and "BBB" in datos:
+            datos["BBB"] = np.full(5, np.nan)        # fallo silencioso de yfinance
+        close = pd.DataFrame(datos, index=fechas)
+        return pd.concat({"Close": close}, axis=1)
+
+    monkeypatch.setitem(sys.modules, "yfinance", types.SimpleNamespace(download=download))
+    series, errores = dp.descargar_concurrente(
+        ["AAA", "BBB"], proveedor=dp.YFinanceProvider(), start="2020-01-01",
+        end="2020-02-01", reintentos=1, backoff=0.0,
+    )
+    assert errores == {}
+    assert set(series) == {"AAA", "BBB"}
+    assert llamadas == [["AAA", "BBB"], ["BBB"]]
+
+
+def test_como_proveedor_rechaza_tipos_invalidos():
+    with pytest.raises(TypeError):
+        dp.como_proveedor(42)